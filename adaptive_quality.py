@@ -0,0 +1,153 @@
+"""Picks each video's resolution from the measured download speed, so it fits a time budget.
+
+    advisor = QualityAdvisor(budget=300)   # seconds per item
+    engine = DownloadEngine(..., adaptive=advisor)
+
+The job's quality becomes a ceiling. When yt-dlp selects formats, the
+format string of every quality from the ceiling down (see QUALITIES) is run
+on the item's formats and the highest one whose size downloads within the
+budget at the estimated speed is taken; if none does, the smallest.
+
+The estimate is a rolling average over the downloads of all jobs: each one
+adds a sample PROBE_SECONDS (or PROBE_FRAGMENTS fragments) after it starts
+and another when it finishes. With no estimate yet the first item starts at
+the ceiling; when its probe shows it would overrun the budget by more than
+SLACK, it is stopped (Downshift) and started again at the quality that fits.
+Only the bytes still to fetch are judged, so a resumed item near its end
+keeps its .part, and an item is never restarted lower when the whole lower
+quality is more than what is left.
+The speed measured is what one download gets while the others run beside
+it, which is the speed the budget is spent at.
+"""
+import threading
+from collections import deque
+
+from downloader_core import QUALITIES, load_yt_dlp, build_format_spec
+from format_planner import format_size
+
+PROBE_SECONDS = 3.0 # Measured this long into a download before judging it
+PROBE_FRAGMENTS = 3 # Or this many fragments, whichever comes first
+MIN_SAMPLE_BYTES = 256 * 1024 # Smaller samples say more about latency than speed
+SMOOTHING = 0.3 # Weight of a new sample in the rolling estimate
+SLACK = 0.25 # A running download is only restarted lower if it would overrun the budget by more than this
+RECENT = 32 # Samples kept in QualityAdvisor.recent
+
+
+class Downshift(Exception):
+    """Raised from the progress hook when an item will not make its time budget; start it again at `quality`."""
+
+    def __init__(self, quality, filenames):
+        super().__init__(f"Too slow for the time budget; starting again at {quality}.")
+        self.quality = quality
+        self.filenames = filenames # Files the abandoned attempt started
+
+
+class QualityAdvisor:
+    """The rolling speed estimate and the time budget per item. Safe to share between job threads.
+
+    `budget` (seconds) may be changed while jobs run; it applies from the
+    next item on. `estimate` is bytes/s, None until the first sample.
+    """
+
+    def __init__(self, budget, estimate=None):
+        self.budget = budget
+        self._estimate = estimate
+        self.recent = deque(maxlen=RECENT) # Latest samples, bytes/s
+        self._lock = threading.Lock()
+
+    @property
+    def estimate(self):
+        return self._estimate
+
+    def record(self, rate):
+        """Adds one speed sample (bytes/s) to the estimate."""
+        if not rate or rate <= 0: return
+        with self._lock:
+            self._estimate = rate if self._estimate is None else SMOOTHING * rate + (1 - SMOOTHING) * self._estimate
+            self.recent.append(rate)
+
+    def pick(self, sizes, rate=None):
+        """The highest of `sizes` ((quality, bytes or None), from the ceiling down) that downloads within the budget.
+
+        At `rate` bytes/s if given, else at the estimate. Without either, or
+        without any known size, the ceiling.
+        """
+        rate = rate or self._estimate
+        known = [(quality, size) for quality, size in sizes if size is not None]
+        if rate is None or not known: return sizes[0][0]
+        for quality, size in known:
+            if size / rate <= self.budget: return quality
+        return min(known, key=lambda option: option[1])[0]
+
+    def item(self, download_type, ceiling):
+        """Format selection and probing for one item, at most at `ceiling`."""
+        return AdaptiveItem(self, download_type, ceiling)
+
+
+class AdaptiveItem:
+    """One item's adaptive download: pass `select_formats` as yt-dlp's "format" and add `progress_hook`, then `attach(ydl)`."""
+
+    def __init__(self, advisor, download_type, ceiling):
+        self.advisor = advisor
+        self.download_type = download_type
+        self.ladder = QUALITIES[QUALITIES.index(ceiling):] if ceiling in QUALITIES else (ceiling,)
+        self.duration = None
+        self.quality = None # Picked when yt-dlp selects formats
+        self.options = [] # (quality, bytes or None) the pick was made from, from the ceiling down
+        self._ydl = None
+        self._probed = False
+        self._started = {} # filename -> (downloaded bytes, elapsed) at its first report
+        self._done = {} # filename -> downloaded bytes, including what a paused run left
+        self._lock = threading.Lock()
+
+    def attach(self, ydl):
+        # The format selector only sees the formats; the duration (for sizes from bitrates) comes through a processor
+        yt_dlp = load_yt_dlp()
+        item = self
+
+        class AdaptiveQualityPP(yt_dlp.postprocessor.PostProcessor):
+            def run(self, info):
+                item.duration = info.get("duration")
+                return [], info
+
+        self._ydl = ydl
+        ydl.add_post_processor(AdaptiveQualityPP(ydl), when="pre_process")
+
+    def select_formats(self, ctx):
+        """A yt-dlp format selector: what the picked quality's format string selects."""
+        choices = []
+        for quality in self.ladder:
+            chosen = list(self._ydl.build_format_selector(build_format_spec(self.download_type, quality))(ctx))
+            if chosen: choices.append((quality, chosen[0]))
+        if not choices: return
+        self.options = [(quality, _size(chosen, self.duration)) for quality, chosen in choices]
+        self.quality = self.advisor.pick(self.options)
+        yield dict(choices)[self.quality]
+
+    def progress_hook(self, d):
+        filename, done, elapsed = d.get("filename"), d.get("downloaded_bytes") or 0, d.get("elapsed")
+        if elapsed is None: return
+        with self._lock: # Concurrent fragments report from several threads
+            started = self._started.setdefault(filename, (done, elapsed)) # Resumed bytes are not this run's speed
+            nbytes, seconds = done - started[0], elapsed - started[1]
+            self._done[filename] = max(done, self._done.get(filename, 0))
+            if d.get("status") == "finished":
+                if nbytes >= MIN_SAMPLE_BYTES and seconds > 0: self.advisor.record(nbytes / seconds)
+                return
+            if d.get("status") != "downloading" or self._probed or seconds <= 0: return
+            if seconds < PROBE_SECONDS and ((d.get("fragment_index") or 0) < PROBE_FRAGMENTS or nbytes < MIN_SAMPLE_BYTES): return
+            self._probed = True
+            rate = nbytes / seconds
+            left = dict(self.options).get(self.quality)
+            if left is not None: left -= sum(self._done.values()) # A resumed item only has the rest to fetch
+        self.advisor.record(rate)
+        if left is None or left / rate <= self.advisor.budget * (1 + SLACK): return
+        better = self.advisor.pick(self.options, rate) # This download's own speed, not the average
+        if self.ladder.index(better) <= self.ladder.index(self.quality): return
+        if left <= (dict(self.options).get(better) or 0): return # Starting over lower would take longer than finishing
+        raise Downshift(better, list(self._started))
+
+
+def _size(chosen, duration):
+    sizes = [format_size(f, duration)[0] for f in chosen.get("requested_formats") or [chosen]]
+    return None if None in sizes else sum(sizes)
@@ -0,0 +1,190 @@
+"""Shared bandwidth limit for every download the app makes.
+
+    limiter = BandwidthLimiter(*parse_limit("09:00-18:00=2M, 8M"))
+    channel = limiter.channel(PRIORITY_WEIGHTS["High"])
+    ydl_opts["progress_hooks"].append(channel.hook(job.cancel_event))
+
+One token bucket refilled at the current cap is shared by all channels (one
+per job, one for the FFmpeg bootstrap). Channels that are waiting for tokens
+are served in weighted fair order, so under contention a channel of weight 4
+gets four times the bytes of a channel of weight 1, while a channel alone
+gets the whole cap. Cap, schedule and weights can all be changed while
+downloads run.
+"""
+import itertools
+import re
+import threading
+import time
+import weakref
+
+from download_queue import PRIORITIES
+
+PRIORITY_WEIGHTS = dict(zip(PRIORITIES, (8, 2, 1))) # Share of the cap under contention
+
+BURST_SECONDS = 0.25 # Tokens saved up while idle, in seconds of the cap
+MIN_BURST = 64 * 1024
+RECHECK_INTERVAL = 0.25 # Waiters look at the cap and schedule at least this often
+IDLE_RESET = 1.0 # Seconds without traffic after which a channel loses what it was owed
+MAX_DEBT_SECONDS = 2.0 # The bucket never owes more than this many seconds of the cap
+HOLD = 0.02 # Seconds freed tokens are kept for a channel that is owed them but is between two reads
+
+_RATE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?(?:/s)?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+_RULE_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(.+)$")
+
+
+def parse_rate(text):
+    """Bytes per second from text like "500K", "2M" or "1.5MB/s"; 0 means unlimited."""
+    mobj = _RATE_RE.match(text)
+    if not mobj: raise ValueError(f"Not a rate: {text!r} (try 500K, 2M or 0 for unlimited)")
+    return int(float(mobj.group(1)) * _UNITS[mobj.group(2).lower()])
+
+
+def parse_limit(text):
+    """Parses "[HH:MM-HH:MM=RATE, ...] [RATE]" into (cap, schedule).
+
+    Each rule applies from its start time up to its end time, local time,
+    wrapping past midnight when the end is earlier. The bare rate, if any, is
+    the cap outside all rules. Empty text means no limit at all.
+    """
+    cap, schedule = 0, []
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        mobj = _RULE_RE.match(item)
+        if mobj is None:
+            cap = parse_rate(item)
+            continue
+        start_h, start_m, end_h, end_m = map(int, mobj.group(1, 2, 3, 4))
+        if start_h > 23 or end_h > 24 or start_m > 59 or end_m > 59: raise ValueError(f"Not a time range: {item!r}")
+        schedule.append((start_h * 60 + start_m, end_h * 60 + end_m, parse_rate(mobj.group(5))))
+    return cap, schedule
+
+
+def scheduled_cap(schedule, default, now=None):
+    """The cap in force at `now` (a time.struct_time, default local time): the first matching rule wins."""
+    now = now or time.localtime()
+    minute = now.tm_hour * 60 + now.tm_min
+    for start, end, rate in schedule:
+        if start <= minute < end if start <= end else (minute >= start or minute < end): return rate
+    return default
+
+
+class Channel:
+    """One consumer of a BandwidthLimiter. `weight` may be changed at any time."""
+
+    def __init__(self, limiter, weight):
+        self.limiter = limiter
+        self.weight = weight
+        self.pass_ = 0.0 # Virtual time: bytes granted so far divided by weight
+        self.last_active = 0.0
+        self.waiting = 0 # Threads of this channel blocked in consume()
+
+    def consume(self, nbytes, cancel_event=None):
+        self.limiter.consume(self, nbytes, cancel_event)
+
+    def hook(self, cancel_event=None):
+        """A yt-dlp progress hook that charges every downloaded byte to this channel.
+
+        Blocking in the hook is what slows the download down: yt-dlp calls it
+        from the thread that reads the socket, between blocks. The first report
+        of each file is only a baseline: after a resume it already counts the
+        .part file (or fragments) from before, which were fetched long ago.
+        """
+        seen = {}
+        lock = threading.Lock()
+
+        def progress_hook(d):
+            if d.get("status") != "downloading": return
+            done = d.get("downloaded_bytes") or 0
+            with lock: # Concurrent fragments report from several threads, not always in order
+                last = seen.get(d.get("filename"))
+                seen[d.get("filename")] = max(done, last or 0)
+            if last is not None and done > last: self.consume(done - last, cancel_event)
+        return progress_hook
+
+
+class BandwidthLimiter:
+    """Token bucket shared by all channels; `cap` bytes/s, 0 for no limit.
+
+    `schedule` is a list of (start minute, end minute, bytes/s) rules, see
+    parse_limit; while one matches, its rate replaces `cap`.
+    """
+
+    def __init__(self, cap=0, schedule=None):
+        self._cond = threading.Condition()
+        self._cap = cap
+        self._schedule = list(schedule or [])
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._vtime = 0.0
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._channels = weakref.WeakSet()
+
+    def configure(self, cap=0, schedule=None):
+        """Replaces the cap and schedule; waiting downloads pick it up right away."""
+        with self._cond:
+            self._cap = cap
+            self._schedule = list(schedule or [])
+            self._cond.notify_all()
+
+    def current_cap(self):
+        return scheduled_cap(self._schedule, self._cap) if self._schedule else self._cap
+
+    def channel(self, weight=PRIORITY_WEIGHTS["Normal"]):
+        channel = Channel(self, weight)
+        with self._cond: self._channels.add(channel)
+        return channel
+
+    def _refill(self, cap):
+        now = time.monotonic()
+        burst = max(cap * BURST_SECONDS, MIN_BURST)
+        self._tokens = min(burst, self._tokens + (now - self._updated) * cap)
+        self._updated = now
+
+    def _held_for(self, ticket, now):
+        # How long to keep tokens for a channel with a lower pass that was granted some a moment ago
+        # and will be back as soon as it has read its next block; without this, channels making
+        # small requests lose every race to the ones always waiting
+        held = [HOLD - (now - channel.last_active) for channel in self._channels
+                if not channel.waiting and channel.pass_ < ticket[0] and now - channel.last_active < HOLD]
+        return max(held, default=0)
+
+    def consume(self, channel, nbytes, cancel_event=None):
+        """Blocks until `nbytes` may be charged to `channel`, or `cancel_event` is set.
+
+        The bucket may go into debt by one request; later requests then wait
+        until it is paid off, so large blocks are limited correctly on average.
+        Debt beyond MAX_DEBT_SECONDS of the cap is forgiven, so one huge
+        request cannot stall every channel for minutes.
+        """
+        if nbytes <= 0: return
+        with self._cond:
+            cap = self.current_cap()
+            if not cap:
+                self._updated = time.monotonic()
+                return
+            if time.monotonic() - channel.last_active > IDLE_RESET: # No credit for time spent idle
+                channel.pass_ = max(channel.pass_, self._vtime)
+            ticket = [channel.pass_, next(self._tickets)]
+            self._waiting.append(ticket)
+            channel.waiting += 1
+            try:
+                while True:
+                    self._refill(cap)
+                    held = 0
+                    if self._tokens > 0 and min(self._waiting) is ticket:
+                        held = self._held_for(ticket, time.monotonic())
+                        if not held: break
+                    if cancel_event is not None and cancel_event.is_set(): return
+                    wait = held or (-self._tokens / cap if self._tokens <= 0 else RECHECK_INTERVAL)
+                    self._cond.wait(min(max(wait, 0.001), RECHECK_INTERVAL))
+                    cap = self.current_cap()
+                    if not cap: return
+            finally:
+                self._waiting.remove(ticket)
+                channel.waiting -= 1
+                self._cond.notify_all()
+            self._tokens = max(self._tokens - nbytes, -cap * MAX_DEBT_SECONDS)
+            self._vtime = max(self._vtime, channel.pass_)
+            channel.last_active = time.monotonic()
+            channel.pass_ += nbytes / max(channel.weight, 1e-6)
@@ -0,0 +1,226 @@
+"""End-to-end download benchmark against a local media server; nothing leaves the machine.
+
+    python benchmarks/bench_end_to_end.py --videos 20 --size-mb 8 --jobs 3
+    python benchmarks/bench_end_to_end.py --json after.json --compare before.json
+
+Synthetic progressive videos, HLS streams and a paged playlist are served
+by local_http.LocalServer and extracted by stub_extractor.StubMediaIE, then
+downloaded through the real DownloadQueue / DownloadEngine.download path,
+with the GUI's update path (on_update -> ProgressAggregator) driven by a
+fake Tk root. Per scenario it reports items per minute, MB/s, the time
+spent in yt-dlp progress hooks, engine updates and UI callbacks. The memory
+figure is the high-water mark of the whole benchmark process so far, so a
+scenario shows its own peak only if it raised it; --tracemalloc gives a
+per-scenario peak of Python allocations. --json keeps the results,
+--compare prints them next to an earlier run (e.g. from another version of
+the repo). Downloaded files are deleted after each scenario.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_progress_callbacks import FakeRoot
+from local_http import LocalServer
+from stub_extractor import StubCatalog, register_stub_extractor
+from download_queue import DownloadQueue, DownloadJob, JOB_DONE
+from downloader_core import DownloadEngine, load_yt_dlp
+from progress_aggregator import ProgressAggregator, DEFAULT_UI_FPS
+from ydl_session import SessionPool
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+# Compared between runs; True when higher is better
+HEADLINE = {"items_per_min": True, "mb_per_s": True, "hook_us_per_call": False, "hook_share": False,
+            "ui_callbacks": False, "cpu_s": False, "process_rss_peak_mb": False}
+
+
+class HookTimer:
+    """Times every call yt-dlp makes into the progress hooks (ours, the tuner's, the limiter's...)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._original = None
+
+    def install(self):
+        from yt_dlp.downloader.common import FileDownloader
+        original = self._original = FileDownloader._hook_progress
+        timer = self
+
+        def timed_hook_progress(downloader, status, info_dict):
+            start = time.perf_counter()
+            try: return original(downloader, status, info_dict)
+            finally:
+                elapsed = time.perf_counter() - start
+                with timer._lock:
+                    timer.calls += 1
+                    timer.seconds += elapsed
+        FileDownloader._hook_progress = timed_hook_progress
+
+    def uninstall(self):
+        from yt_dlp.downloader.common import FileDownloader
+        FileDownloader._hook_progress = self._original
+
+
+def process_rss_peak_mb():
+    # Since the process started, not per scenario: ru_maxrss never goes down
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (MB if sys.platform == "darwin" else 1024), 1) # Bytes on macOS, KB elsewhere
+
+
+def run_scenario(name, server, urls, args, download_type="Video", playlist_workers=1):
+    """Downloads `urls` through a DownloadQueue like the GUI does; returns the measurements."""
+    root = FakeRoot()
+    ui = ProgressAggregator(root, args.fps)
+    engine_updates = [0]
+
+    def refresh_row(job): pass
+
+    def on_update(job):
+        # The same two posts the GUI makes per job update
+        engine_updates[0] += 1
+        ui.post(("job", job.id), refresh_row, job)
+        ui.post("summary", lambda: None)
+
+    output_dir = tempfile.TemporaryDirectory(prefix=f"bench-e2e-{name}-")
+    output = output_dir.name
+    engine = DownloadEngine(on_update=on_update, extra_opts={"quiet": True, "no_warnings": True, "noprogress": True, "fixup": "never"},
+                            connections=args.connections, sessions=None if args.no_sessions else SessionPool())
+    queue = DownloadQueue(engine.download, args.jobs, on_update=on_update)
+    jobs = [DownloadJob(url, output, download_type, "Best", playlist_workers) for url in urls]
+    hooks = HookTimer()
+    hooks.install()
+    server.reset_counters()
+    if args.tracemalloc: tracemalloc.start()
+    ui.start()
+    cpu_start, start = time.process_time(), time.perf_counter()
+    for job in jobs: queue.submit(job)
+    last = start
+    while any(not job.finished for job in jobs):
+        time.sleep(0.01)
+        now = time.perf_counter()
+        root.advance((now - last) * 1000) # Runs the aggregator's frames in real time, on this thread like Tk would
+        last = now
+    wall, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    root.advance(ui.interval_ms)
+    ui.stop()
+    hooks.uninstall()
+    if engine.sessions is not None: engine.sessions.close()
+    traced_peak = None
+    if args.tracemalloc:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+        tracemalloc.stop()
+
+    # Counted from the outside, so runs of older versions of the engine compare fairly
+    failed = [job for job in jobs if job.state != JOB_DONE or job.failures]
+    items = sum(not filename.endswith((".part", ".ytdl")) for filename in os.listdir(output))
+    output_dir.cleanup()
+    nbytes = server.bytes_sent
+    return {
+        "items": items, "failed_jobs": len(failed), "errors": [job.error or job.failures[0][2] for job in failed][:3],
+        "wall_s": round(wall, 3), "cpu_s": round(cpu, 3),
+        "items_per_min": round(items / wall * 60, 1), "mb_per_s": round(nbytes / MB / wall, 2), "mb": round(nbytes / MB, 1),
+        "hook_calls": hooks.calls, "hook_s": round(hooks.seconds, 3),
+        "hook_us_per_call": round(hooks.seconds / hooks.calls * 1e6, 1) if hooks.calls else None,
+        "hook_share": round(hooks.seconds / wall, 4),
+        "engine_updates": engine_updates[0], "ui_posts": ui.posted, "ui_callbacks": ui.flushed,
+        "process_rss_peak_mb": process_rss_peak_mb(), "traced_peak_mb": traced_peak,
+    }
+
+
+def version_info():
+    try:
+        rev = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        rev = None
+    return {"git": rev or None, "yt_dlp": load_yt_dlp().version.__version__, "python": sys.version.split()[0], "platform": sys.platform}
+
+
+def print_comparison(results, previous):
+    print(f"\nCompared with {previous.get('version', {}).get('git') or 'the earlier run'}:")
+    changed = sorted(key for key, value in results["params"].items() if key not in ("json", "compare") and previous.get("params", {}).get(key) != value)
+    if changed: print(f"(the runs differ in {', '.join(changed)}; figures may not be comparable)")
+    print(f"{'scenario':<12}{'metric':<20}{'before':>12}{'after':>12}{'change':>10}")
+    for name, figures in results["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before: continue
+        for metric, higher_is_better in HEADLINE.items():
+            old, new = before.get(metric), figures.get(metric)
+            if old is None or new is None: continue
+            change = f"{(new - old) / old:+.0%}" if old else ""
+            better = (new > old) == higher_is_better if new != old else None
+            print(f"{name:<12}{metric:<20}{old:>12}{new:>12}{change:>10}{'' if better is None else ('  better' if better else '  worse')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=20, help="Progressive videos, one job each")
+    parser.add_argument("--size-mb", type=float, default=8, help="Size of each progressive video")
+    parser.add_argument("--hls", type=int, default=6, help="HLS streams, one job each")
+    parser.add_argument("--fragments", type=int, default=30)
+    parser.add_argument("--fragment-kb", type=int, default=256)
+    parser.add_argument("--playlist", type=int, default=60, help="Entries of the playlist job (1 MB progressive videos)")
+    parser.add_argument("--page-size", type=int, default=20, help="Playlist entries per listing page")
+    parser.add_argument("--jobs", type=int, default=3, help="Parallel jobs")
+    parser.add_argument("--playlist-workers", type=int, default=3)
+    parser.add_argument("--connections", type=int, default=4, help="Concurrent fragment downloads")
+    parser.add_argument("--rate-mbps", type=float, default=0, help="Per-connection cap of the fake host, MB/s (0 = none)")
+    parser.add_argument("--no-sessions", action="store_true", help="A new YoutubeDL per download, as without a SessionPool")
+    parser.add_argument("--fps", type=int, default=DEFAULT_UI_FPS)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace Python allocations (slows everything down)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--compare", help="Results of an earlier run (--json) to compare with")
+    args = parser.parse_args()
+
+    catalog = StubCatalog()
+    for i in range(args.videos): catalog.add_video(f"v{i}", int(args.size_mb * MB))
+    for i in range(args.hls): catalog.add_hls(f"h{i}", args.fragments, args.fragment_kb * 1024)
+    for i in range(args.playlist): catalog.add_video(f"p{i}", MB)
+    catalog.add_playlist("list", [f"p{i}" for i in range(args.playlist)], page_size=args.page_size)
+    server = LocalServer(catalog.files(), rate_per_conn=int(args.rate_mbps * MB), content_types=catalog.content_types).start()
+    register_stub_extractor()
+
+    scenarios = {
+        "videos": lambda: run_scenario("videos", server, [server.url(f"/stub/video/v{i}") for i in range(args.videos)], args),
+        "hls": lambda: run_scenario("hls", server, [server.url(f"/stub/hls/h{i}") for i in range(args.hls)], args),
+        "playlist": lambda: run_scenario("playlist", server, [server.url("/stub/playlist/list")], args, "Playlist", args.playlist_workers),
+    }
+    results = {"version": version_info(), "timestamp": time.time(), "params": vars(args), "scenarios": {}}
+    print(f"yt-dlp {results['version']['yt_dlp']}, repo {results['version']['git']}, {args.jobs} jobs, "
+          f"host capped at {args.rate_mbps or 'no'} MB/s per connection\n")
+    print(f"{'scenario':<10}{'items':>6}{'s':>8}{'items/min':>11}{'MB/s':>8}{'hook calls':>12}{'us/call':>9}{'hook %':>8}"
+          f"{'updates':>9}{'UI cb':>7}{'proc RSS MB':>13}")
+    for name, run in scenarios.items():
+        figures = results["scenarios"][name] = run()
+        print(f"{name:<10}{figures['items']:>6}{figures['wall_s']:>8.2f}{figures['items_per_min']:>11.1f}{figures['mb_per_s']:>8.1f}"
+              f"{figures['hook_calls']:>12}{figures['hook_us_per_call'] or 0:>9.1f}{figures['hook_share']:>8.1%}"
+              f"{figures['engine_updates']:>9}{figures['ui_callbacks']:>7}{figures['process_rss_peak_mb'] or 0:>13.0f}")
+        if figures["failed_jobs"]: print(f"{'':<10}{figures['failed_jobs']} job(s) failed: {figures['errors']}")
+    server.stop()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: print_comparison(results, json.load(f))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""First-match latency per extractor class, with and without the persisted pattern cache.
+
+    python benchmarks/bench_pattern_cache.py --runs 5
+    python benchmarks/bench_pattern_cache.py --json patterns.json   # keep results to compare later
+
+Every run is a fresh process that loads this repo's lazy_extractors.py in place
+of the installed one, then times the first suitable() call of each class
+(which includes compiling its _VALID_URL) and the dispatch index build.
+"off" disables the cache, "cold" starts from an empty cache directory (and
+fills it), "warm" reuses what the cold run stored.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints one JSON object with timings in ms
+CHILD_SCRIPT = r"""
+import importlib.util, json, sys, time
+import yt_dlp.utils
+spec = importlib.util.spec_from_file_location("yt_dlp.extractor.lazy_extractors", sys.argv[1])
+le = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = le
+spec.loader.exec_module(le)
+url = "https://www.youtube.com/watch?v=BaW_jenozKc"
+timings = {}
+for name, cls in le._CLASS_LOOKUP.items():
+    start = time.perf_counter()
+    cls.suitable(url)
+    timings[name] = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+le._get_dispatch_index()
+index_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"classes": timings, "index": index_ms}))
+"""
+
+
+def run_child(cache_dir, enabled):
+    env = dict(os.environ, XDG_CACHE_HOME=cache_dir)
+    env.pop("YTDLP_NO_PATTERN_CACHE", None)
+    if not enabled: env["YTDLP_NO_PATTERN_CACHE"] = "1"
+    proc = subprocess.run([sys.executable, "-c", CHILD_SCRIPT, os.path.join(REPO_DIR, "lazy_extractors.py")],
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0: raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "child failed")
+    return json.loads(proc.stdout)
+
+
+def median_runs(runs):
+    return {
+        "classes": {name: statistics.median(run["classes"][name] for run in runs) for name in runs[0]["classes"]},
+        "index": statistics.median(run["index"] for run in runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per mode; the median is reported")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    modes = {"off": [], "cold": [], "warm": []}
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="bench-pattern-cache-") as cache_dir:
+            modes["off"].append(run_child(cache_dir, enabled=False))
+            modes["cold"].append(run_child(cache_dir, enabled=True))
+            modes["warm"].append(run_child(cache_dir, enabled=True))
+    results = {name: median_runs(runs) for name, runs in modes.items()}
+
+    print(f"First suitable() per class, median of {args.runs} fresh processes (ms):\n")
+    print(f"{'class':<30}{'off':>9}{'cold':>9}{'warm':>9}")
+    for name in results["off"]["classes"]:
+        print(f"{name:<30}" + "".join(f"{results[mode]['classes'][name]:9.2f}" for mode in modes))
+    print(f"{'all classes':<30}" + "".join(f"{sum(results[mode]['classes'].values()):9.2f}" for mode in modes))
+    print(f"{'dispatch index build':<30}" + "".join(f"{results[mode]['index']:9.2f}" for mode in modes))
+
+    if args.json:
+        results.update({"python": sys.version.split()[0], "platform": sys.platform, "timestamp": time.time()})
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Counts the Tk callbacks scheduled for a simulated download, before and after
+progress coalescing.
+
+    python benchmarks/bench_progress_callbacks.py --size-mb 1024 --chunk-kb 8 --speed-mbps 40
+
+No window is opened: a fake root with a virtual clock stands in for Tk, so the
+numbers only depend on the chunk count and the simulated transfer time.
+"""
+import argparse
+import heapq
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from download_queue import DownloadJob
+from downloader_core import DownloadEngine
+from progress_aggregator import ProgressAggregator, DEFAULT_UI_FPS
+
+
+class FakeRoot:
+    """Just enough of tk.Tk for root.after(), driven by a virtual millisecond clock."""
+
+    def __init__(self):
+        self.now_ms = 0.0
+        self.scheduled = 0
+        self.executed = 0
+        self._timers = []
+        self._seq = itertools.count()
+
+    def after(self, ms, func, *args):
+        self.scheduled += 1
+        heapq.heappush(self._timers, (self.now_ms + ms, next(self._seq), func, args))
+
+    def winfo_exists(self):
+        return True
+
+    def advance(self, ms):
+        self.now_ms += ms
+        while self._timers and self._timers[0][0] <= self.now_ms:
+            _, _, func, args = heapq.heappop(self._timers)
+            self.executed += 1
+            func(*args)
+
+
+def hook_payloads(size, chunk):
+    downloaded = 0
+    while downloaded < size:
+        downloaded = min(size, downloaded + chunk)
+        yield {"status": "downloading", "downloaded_bytes": downloaded, "total_bytes": size,
+               "_percent_str": f"{downloaded * 100 / size:5.1f}%", "info_dict": {"title": "Synthetic 1 GB video"},
+               "filename": "synthetic.mp4"}
+    yield {"status": "finished", "info_dict": {"title": "Synthetic 1 GB video"}, "filename": "synthetic.mp4"}
+
+
+def simulate_media_before(size, chunk, chunk_ms):
+    # The old progress_hook: one root.after(0, update_ui_dl) per yt-dlp callback
+    root = FakeRoot()
+    state = {}
+    def legacy_hook(d):
+        def update_ui_dl(): state["text"] = d.get("_percent_str")
+        root.after(0, update_ui_dl)
+    for d in hook_payloads(size, chunk):
+        legacy_hook(d)
+        root.advance(chunk_ms)
+    return root
+
+
+def simulate_media_after(size, chunk, chunk_ms, fps):
+    root = FakeRoot()
+    ui = ProgressAggregator(root, fps)
+    job = DownloadJob("https://example.invalid/watch?v=synthetic", os.getcwd())
+    state = {}
+    def refresh_row(job): state["row"] = (job.progress, job.status_text)
+    def on_update(job):
+        # Same two posts the GUI makes per job update
+        ui.post(("job", job.id), refresh_row, job)
+        ui.post("summary", lambda: None)
+    engine = DownloadEngine(on_update=on_update)
+    ui.start()
+    for d in hook_payloads(size, chunk):
+        engine.progress_hook(job, d)
+        root.advance(chunk_ms)
+    root.advance(ui.interval_ms) # Let the last frame land
+    ui.stop()
+    return root
+
+
+def simulate_ffmpeg_before(size, chunk, chunk_ms):
+    # The old FFmpeg bootstrap loop: two root.after lambdas per 8 KB chunk
+    root = FakeRoot()
+    state = {}
+    downloaded = 0
+    while downloaded < size:
+        downloaded = min(size, downloaded + chunk)
+        progress = downloaded * 100 / size
+        root.after(0, lambda p=progress: state.__setitem__("bar", p))
+        root.after(0, lambda p=progress: state.__setitem__("label", f"{p:.0f}%"))
+        root.advance(chunk_ms)
+    return root
+
+
+def simulate_ffmpeg_after(size, chunk, chunk_ms, fps):
+    root = FakeRoot()
+    ui = ProgressAggregator(root, fps)
+    state = {}
+    def set_progress(p): state["bar"], state["label"] = p, f"{p:.0f}%"
+    ui.start()
+    downloaded = 0
+    while downloaded < size:
+        downloaded = min(size, downloaded + chunk)
+        ui.post("ffmpeg", set_progress, downloaded * 100 / size)
+        root.advance(chunk_ms)
+    root.advance(ui.interval_ms)
+    ui.stop()
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--chunk-kb", type=int, default=8, help="Bytes per progress callback (the FFmpeg loop uses 8 KB)")
+    parser.add_argument("--speed-mbps", type=float, default=40.0, help="Simulated link speed in MB/s")
+    parser.add_argument("--fps", type=int, default=DEFAULT_UI_FPS)
+    args = parser.parse_args()
+
+    size, chunk = args.size_mb * 1024 * 1024, args.chunk_kb * 1024
+    chunk_ms = chunk / (args.speed_mbps * 1024 * 1024) * 1000
+    print(f"Simulated download: {args.size_mb} MB in {args.chunk_kb} KB chunks at {args.speed_mbps} MB/s "
+          f"({size / (args.speed_mbps * 1024 * 1024):.1f} s), UI at {args.fps} Hz\n")
+    print(f"{'path':<30}{'callbacks':>12}{'executed':>12}{'cpu s':>9}")
+    for name, before, after in (
+        ("yt-dlp progress_hook", lambda: simulate_media_before(size, chunk, chunk_ms), lambda: simulate_media_after(size, chunk, chunk_ms, args.fps)),
+        ("FFmpeg bootstrap", lambda: simulate_ffmpeg_before(size, chunk, chunk_ms), lambda: simulate_ffmpeg_after(size, chunk, chunk_ms, args.fps)),
+    ):
+        results = []
+        for label, run in (("before", before), ("after", after)):
+            start = time.process_time()
+            root = run()
+            cpu = time.process_time() - start
+            results.append(root.scheduled)
+            print(f"{name + ' ' + label:<30}{root.scheduled:>12}{root.executed:>12}{cpu:>9.2f}")
+        print(f"{'':<30}{results[0] / max(1, results[1]):>11.0f}x fewer callbacks\n")
+
+
+if __name__ == "__main__":
+    main()
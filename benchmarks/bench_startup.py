@@ -0,0 +1,132 @@
+"""Measures GUI startup: time to first paint (cold and warm) and import cost per module.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --json startup.json   # keep results to compare later
+
+"cold" runs use an empty bytecode cache (-X pycache_prefix=<fresh dir>), so
+every module, stdlib included, is compiled from source like on a first
+install. "warm" runs reuse the normal __pycache__ directories. Time to first
+paint is measured from process spawn until the window has been built and
+drawn once (root.update()). It needs a display; without one only the import
+costs are reported. The app runs with its data folder in a temporary home
+directory, so it does not restore your unfinished jobs or touch your
+journal, archive, info cache or metrics.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process: build the window, paint it once, then wait for the yt-dlp warm-up
+CHILD_SCRIPT = r"""
+import sys, time
+import tkinter as tk
+import YouTube_Downloader as app_module
+root = tk.Tk()
+app = app_module.YouTubeDownloader(root)
+root.update()
+print("PAINTED", flush=True)
+warmup = app_module.warm_up_in_background()
+warmup.join()
+print("WARM", flush=True)
+root.destroy()
+"""
+
+WATCHED_MODULES = ("tkinter", "download_queue", "downloader_core", "progress_aggregator", "info_cache", "download_archive",
+                   "connection_tuner", "bandwidth", "postprocess_pool", "metrics", "ydl_session", "process_workers",
+                   "job_journal", "disk_space", "adaptive_quality", "format_planner", "sqlite3", "YouTube_Downloader",
+                   "yt_dlp", "requests", "zipfile", "webbrowser")
+
+
+def have_display():
+    if sys.platform.startswith("linux"): return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+    return True
+
+
+def child_env(home):
+    # get_app_data_dir() lives under the home directory (LOCALAPPDATA on Windows)
+    env = dict(os.environ, HOME=home, USERPROFILE=home, LOCALAPPDATA=home)
+    env.setdefault("XDG_CACHE_HOME", os.path.expanduser("~/.cache")) # Caches, such as the extractor pattern cache, stay warm
+    if "XAUTHORITY" not in env and os.path.exists(os.path.expanduser("~/.Xauthority")):
+        env["XAUTHORITY"] = os.path.expanduser("~/.Xauthority") # X11 looks for it in the home directory
+    return env
+
+
+def time_to_paint(cold):
+    args = [sys.executable]
+    pycache = None
+    if cold:
+        pycache = tempfile.TemporaryDirectory(prefix="bench-pycache-")
+        args += ["-X", f"pycache_prefix={pycache.name}"]
+    home = tempfile.TemporaryDirectory(prefix="bench-home-")
+    start = time.perf_counter()
+    proc = subprocess.Popen(args + ["-c", CHILD_SCRIPT], cwd=REPO_DIR, stdout=subprocess.PIPE, text=True, env=child_env(home.name))
+    marks = {}
+    for line in proc.stdout:
+        marks[line.strip()] = time.perf_counter() - start
+    proc.wait()
+    if pycache: pycache.cleanup()
+    home.cleanup()
+    if proc.returncode != 0 or "PAINTED" not in marks:
+        raise RuntimeError(f"child exited with {proc.returncode}")
+    return marks["PAINTED"], marks.get("WARM")
+
+
+def import_costs(module="YouTube_Downloader"):
+    """Cumulative import time in ms per module, from python -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_DIR,
+                          capture_output=True, text=True)
+    costs = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not parts[0].isdigit(): continue # Header line
+        costs[parts[2]] = int(parts[1]) / 1000
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark for the Tk app.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per mode; the median is reported")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    results = {"python": sys.version.split()[0], "platform": sys.platform, "timestamp": time.time()}
+
+    print("Import cost at startup (cumulative ms, import YouTube_Downloader):")
+    costs = import_costs()
+    results["startup_imports_ms"] = {name: costs.get(name) for name in WATCHED_MODULES}
+    for name in WATCHED_MODULES:
+        cost = costs.get(name)
+        print(f"  {name:<22}{'not imported' if cost is None else f'{cost:8.1f}'}")
+    deferred = import_costs("yt_dlp")
+    results["yt_dlp_import_ms"] = deferred.get("yt_dlp")
+    if deferred.get("yt_dlp") is not None:
+        print(f"  (yt_dlp on its own, now loaded in the background: {deferred['yt_dlp']:.1f} ms)")
+
+    if not have_display():
+        print("\nNo display available; skipping time-to-first-paint.")
+    else:
+        for mode in ("cold", "warm"):
+            if mode == "warm": time_to_paint(cold=False) # Make sure __pycache__ is populated
+            runs = [time_to_paint(cold=(mode == "cold")) for _ in range(args.runs)]
+            paint = statistics.median(run[0] for run in runs)
+            warm = [run[1] for run in runs if run[1] is not None]
+            results[f"{mode}_first_paint_s"] = paint
+            results[f"{mode}_yt_dlp_ready_s"] = statistics.median(warm) if warm else None
+            print(f"\n{mode:>4} start: first paint {paint * 1000:7.1f} ms", end="")
+            if warm: print(f", yt-dlp ready {statistics.median(warm) * 1000:7.1f} ms", end="")
+        print()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""A small threaded HTTP server for offline benchmarks, standing in for real download hosts.
+
+    server = LocalServer({"/ffmpeg.zip": data}, rate_per_conn=2 * 1024 * 1024).start()
+    url = server.url("/ffmpeg.zip")
+    ...
+    server.stop()
+
+Serves in-memory files with ETag, Range / If-Range and HEAD support. Each
+connection can be throttled to `rate_per_conn` bytes/s, like hosts that cap
+single streams, and `ranges=False` makes it ignore Range headers. Request
+and byte counters let benchmarks check how much was actually transferred.
+"""
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+WRITE_SIZE = 64 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head):
+        server = self.server.owner
+        path = self.path.split("?", 1)[0]
+        data = server.files.get(path)
+        with server.lock: server.requests += 1
+        if data is None:
+            self.send_error(404)
+            return
+        etag = server.etags[path]
+        start, end, status = 0, len(data) - 1, 200
+        mobj = _RANGE_RE.match(self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if server.ranges and mobj and (if_range is None or if_range == etag):
+            first, last = mobj.groups()
+            if first: start, end = int(first), min(int(last), len(data) - 1) if last else len(data) - 1
+            else: start = max(0, len(data) - int(last))
+            if start > end or start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        with server.lock: server.range_requests += status == 206
+        self.send_response(status)
+        self.send_header("Content-Type", server.content_types.get(path, "application/octet-stream"))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", etag)
+        if server.ranges: self.send_header("Accept-Ranges", "bytes")
+        if status == 206: self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        if head: return
+        self._send_body(server, data, start, end)
+
+    def _send_body(self, server, data, start, end):
+        began = time.monotonic()
+        sent = 0
+        position = start
+        try:
+            while position <= end:
+                block = data[position:min(end + 1, position + WRITE_SIZE)]
+                self.wfile.write(block)
+                position += len(block)
+                sent += len(block)
+                with server.lock: server.bytes_sent += len(block)
+                if server.rate_per_conn:
+                    ahead = sent / server.rate_per_conn - (time.monotonic() - began)
+                    if ahead > 0: time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The client went away (cancelled); nothing to do
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # Clients dropping connections mid-response is expected (cancel, range windows)
+
+
+class LocalServer:
+    def __init__(self, files, rate_per_conn=0, ranges=True, content_types=None, host="127.0.0.1", port=0):
+        self.files = dict(files)
+        self.etags = {path: f'"{hashlib.md5(data).hexdigest()}"' for path, data in self.files.items()}
+        self.content_types = content_types or {}
+        self.rate_per_conn = rate_per_conn
+        self.ranges = ranges
+        self.lock = threading.Lock()
+        self.requests = self.range_requests = self.bytes_sent = 0
+        self._httpd = _QuietServer((host, port), _Handler)
+        self._httpd.owner = self
+        self._thread = None
+
+    def url(self, path):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def reset_counters(self):
+        with self.lock: self.requests = self.range_requests = self.bytes_sent = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="local-http")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,125 @@
+"""A yt-dlp extractor for synthetic media served by local_http.LocalServer.
+
+    catalog = StubCatalog()
+    catalog.add_video("v1", size=8 * 1024 * 1024)
+    catalog.add_hls("h1", fragments=20, fragment_size=256 * 1024)
+    catalog.add_playlist("p1", ["v1", "h1"], page_size=50)
+    server = LocalServer(catalog.files(), content_types=catalog.content_types).start()
+    register_stub_extractor()
+    url = server.url("/stub/video/v1") # or /stub/hls/h1, /stub/playlist/p1
+
+StubMediaIE is a real InfoExtractor, registered first in yt-dlp's extractor
+registry (where the lazy_extractors classes are registered too), so
+YoutubeDL, the info cache and the download archive treat it like any other
+site. It fetches a small JSON description per video or playlist page from
+the server, like a real extractor fetches its webpage or API, and returns
+progressive or HLS formats pointing back at the server. Playlists are
+paged, so they are listed lazily like large channels. No ffmpeg is needed:
+every video has a single combined format.
+"""
+import json
+import os
+
+STUB_URL_RE = r'https?://(?:127\.0\.0\.1|localhost):\d+/stub/(?P<kind>video|hls|playlist)/(?P<id>[\w-]+)'
+_BLOCK = 1024 * 1024 # Synthetic media is this random block repeated, so large catalogs cost little memory
+_block = None
+
+
+def _media(size):
+    global _block
+    if _block is None: _block = os.urandom(_BLOCK)
+    return (_block * (size // _BLOCK + 1))[:size]
+
+
+class StubCatalog:
+    """Synthetic videos, HLS streams and paged playlists, as the files a LocalServer serves."""
+
+    def __init__(self):
+        self.videos = {} # id -> JSON description
+        self.playlists = {} # id -> (title, entry ids, page size)
+        self._files = {}
+        self.content_types = {}
+
+    def add_video(self, video_id, size, title=None, duration=60):
+        path = f"/media/{video_id}.mp4"
+        self._files[path] = _media(size)
+        self.content_types[path] = "video/mp4"
+        self.videos[video_id] = {"id": video_id, "title": title or f"Stub video {video_id}", "duration": duration, "kind": "video",
+                                 "path": path, "filesize": size}
+
+    def add_hls(self, video_id, fragments, fragment_size, title=None, fragment_seconds=4):
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{fragment_seconds}", "#EXT-X-MEDIA-SEQUENCE:0"]
+        segment = _media(fragment_size)
+        for i in range(fragments):
+            self._files[f"/media/{video_id}/seg{i}.ts"] = segment
+            lines += [f"#EXTINF:{fragment_seconds}.0,", f"seg{i}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        path = f"/media/{video_id}/index.m3u8"
+        self._files[path] = ("\n".join(lines) + "\n").encode()
+        self.content_types[path] = "application/vnd.apple.mpegurl"
+        self.videos[video_id] = {"id": video_id, "title": title or f"Stub stream {video_id}", "duration": fragments * fragment_seconds,
+                                 "kind": "hls", "path": path, "filesize": fragments * fragment_size}
+
+    def add_playlist(self, playlist_id, video_ids, title=None, page_size=100):
+        self.playlists[playlist_id] = (title or f"Stub playlist {playlist_id}", list(video_ids), page_size)
+
+    def files(self):
+        files = dict(self._files)
+        for video_id, video in self.videos.items():
+            files[f"/api/{video['kind']}/{video_id}.json"] = json.dumps(video).encode()
+        for playlist_id, (title, video_ids, page_size) in self.playlists.items():
+            pages = [video_ids[i:i + page_size] for i in range(0, len(video_ids), page_size)] or [[]]
+            for number, page in enumerate(pages):
+                entries = [{"id": video_id, "title": self.videos[video_id]["title"], "kind": self.videos[video_id]["kind"]} for video_id in page]
+                files[f"/api/playlist/{playlist_id}/{number}.json"] = json.dumps({"title": title, "count": len(video_ids), "entries": entries}).encode()
+        return files
+
+
+def stub_extractor_class():
+    """StubMediaIE, built on first use so that importing this module does not import yt-dlp."""
+    from yt_dlp.extractor.common import InfoExtractor
+    from yt_dlp.utils import InAdvancePagedList
+
+    class StubMediaIE(InfoExtractor):
+        IE_NAME = "stubmedia"
+        _VALID_URL = STUB_URL_RE
+
+        def _real_extract(self, url):
+            kind, item_id = self._match_valid_url(url).group("kind", "id")
+            base = url.split("/stub/", 1)[0]
+            if kind == "playlist":
+                first = self._download_json(f"{base}/api/playlist/{item_id}/0.json", item_id, note="Downloading page 1")
+
+                def page(number):
+                    data = first if number == 0 else self._download_json(
+                        f"{base}/api/playlist/{item_id}/{number}.json", item_id, note=f"Downloading page {number + 1}")
+                    for entry in data["entries"]:
+                        yield self.url_result(f"{base}/stub/{entry['kind']}/{entry['id']}", StubMediaIE, entry["id"], entry["title"])
+
+                page_size = max(1, len(first["entries"]))
+                entries = InAdvancePagedList(page, -(-first["count"] // page_size), page_size) # Pages are fetched as they are reached
+                return self.playlist_result(entries, item_id, first["title"], playlist_count=first["count"])
+            video = self._download_json(f"{base}/api/{kind}/{item_id}.json", item_id)
+            if video["kind"] == "hls":
+                formats = [{"format_id": "hls", "url": base + video["path"], "ext": "mp4", "protocol": "m3u8_native",
+                            "vcodec": "avc1.4d401e", "acodec": "mp4a.40.2", "height": 360, "filesize_approx": video["filesize"]}]
+            else:
+                formats = [{"format_id": "mp4", "url": base + video["path"], "ext": "mp4", "vcodec": "avc1.4d401e",
+                            "acodec": "mp4a.40.2", "height": 360, "filesize": video["filesize"]}]
+            return {"id": item_id, "title": video["title"], "duration": video["duration"], "formats": formats}
+
+    return StubMediaIE
+
+
+def register_stub_extractor():
+    """Puts StubMediaIE first in yt-dlp's extractor registry; returns the class. Idempotent."""
+    from yt_dlp.extractor import import_extractors
+    from yt_dlp.globals import extractors
+    import_extractors()
+    registry = extractors.value
+    if "StubMediaIE" in registry: return registry["StubMediaIE"]
+    ie = stub_extractor_class()
+    ordered = {"StubMediaIE": ie, **registry}
+    registry.clear()
+    registry.update(ordered)
+    return ie
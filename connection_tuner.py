@@ -0,0 +1,98 @@
+import threading
+
+MAX_CONNECTIONS = 16
+DEFAULT_HTTP_CHUNK_SIZE = 10 * 1024 * 1024 # Ranged requests this large dodge per-request throttling without many round trips
+MIN_SAMPLE_BYTES = 2 * 1024 * 1024 # Smaller downloads are dominated by request latency, not by the connection count
+SAMPLES_PER_STEP = 2 # Fragmented downloads measured at a setting before deciding to move
+MIN_GAIN = 0.10 # A neighbouring setting must be this much faster to be worth switching to
+SMOOTHING = 0.5 # Weight of a new sample in the running throughput estimate
+REPROBE_AFTER = 8 # Decisions to stay put before neighbours are measured again (the network may have changed)
+
+LADDER = (1, 2, 3, 4, 6, 8, 12, 16)
+
+
+class ConnectionTuner:
+    """Picks the number of concurrent fragment downloads from measured throughput.
+
+    Each finished fragmented download (DASH / HLS) reports its bytes and time
+    through the progress hook returned by `hook(connections)`. Settings are
+    laid out on LADDER; the tuner keeps a smoothed throughput estimate per
+    setting and, every SAMPLES_PER_STEP samples, keeps climbing in the same
+    direction while each step gains at least MIN_GAIN, and steps back when one
+    does not (more connections must be faster, fewer must not be slower). It
+    adapts between downloads, not inside one: yt-dlp fixes the fragment
+    concurrency when a download starts. Safe to share between job threads.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=MAX_CONNECTIONS):
+        self.ladder = tuple(n for n in LADDER if minimum <= n <= maximum) or (max(1, minimum),)
+        self._lock = threading.Lock()
+        self.reset(initial)
+
+    def reset(self, initial):
+        """Starts over from `initial` connections, forgetting all measurements."""
+        with self._lock:
+            self._rung = min(range(len(self.ladder)), key=lambda i: abs(self.ladder[i] - initial))
+            self._throughput = {} # connections -> smoothed bytes/s
+            self._pending = 0 # Samples taken at the current setting since the last decision
+            self._settled = 0
+            self._direction = 1
+
+    @property
+    def connections(self):
+        return self.ladder[self._rung]
+
+    def estimates(self):
+        with self._lock: return dict(self._throughput)
+
+    def record(self, connections, nbytes, seconds):
+        """Adds one measurement: a download of `nbytes` over `connections` took `seconds`."""
+        if nbytes < MIN_SAMPLE_BYTES or not seconds or seconds <= 0: return
+        rate = nbytes / seconds
+        with self._lock:
+            previous = self._throughput.get(connections)
+            self._throughput[connections] = rate if previous is None else SMOOTHING * rate + (1 - SMOOTHING) * previous
+            if connections != self.connections: return # Finished after we had already moved on
+            self._pending += 1
+            if self._pending >= SAMPLES_PER_STEP: self._step()
+
+    def _step(self):
+        self._pending = 0
+        here = self._throughput[self.connections]
+        ahead, behind = self._rung + self._direction, self._rung - self._direction
+        measured = lambda i: 0 <= i < len(self.ladder) and self.ladder[i] in self._throughput
+        rate = lambda i: self._throughput[self.ladder[i]]
+        if measured(behind):
+            # The last move must have paid off; extra connections also have to earn their keep
+            needed = rate(behind) * (1 + MIN_GAIN) if self._direction > 0 else rate(behind) / (1 + MIN_GAIN)
+            if here < needed:
+                self._move(behind)
+                return
+        if 0 <= ahead < len(self.ladder) and (not measured(ahead) or rate(ahead) > here * (1 + MIN_GAIN)):
+            self._move(ahead)
+            return
+        if not measured(behind) and 0 <= behind < len(self.ladder): # At the end of the ladder with nothing behind us yet
+            self._move(behind)
+            return
+        self._settled += 1
+        if self._settled >= REPROBE_AFTER:
+            for i in (ahead, behind):
+                if measured(i): del self._throughput[self.ladder[i]]
+            self._settled = 0
+
+    def _move(self, rung):
+        self._direction = 1 if rung > self._rung else -1
+        self._rung = rung
+        self._settled = 0
+
+    def hook(self, connections):
+        """A yt-dlp progress hook that records fragmented downloads made with `connections`."""
+        fragmented = set()
+
+        def progress_hook(d):
+            filename = d.get("filename")
+            if d.get("status") == "downloading":
+                if d.get("fragment_count") or d.get("fragment_index"): fragmented.add(filename)
+            elif d.get("status") == "finished" and filename in fragmented:
+                self.record(connections, d.get("total_bytes") or d.get("downloaded_bytes") or 0, d.get("elapsed"))
+        return progress_hook
@@ -0,0 +1,117 @@
+"""Free-space admission and preallocation for what we write to disk.
+
+    budget = DiskBudget()
+    claim = budget.claim()             # one per download, before it starts
+    claim.reserve(path, nbytes, title) # raises NotEnoughSpace instead of filling the disk
+    ...                                # claim.progress_hook lowers the claim as bytes land
+    claim.release()
+
+Downloads running side by side each claim what they still have to write, so
+the second of two large videos is refused up front rather than both
+running out of space halfway. A claim shrinks as its bytes are written
+(free space already counts those), and MIN_FREE is always left over.
+"""
+import os
+import shutil
+import threading
+
+MIN_FREE = 256 * 1024 * 1024 # Left free for the system and for files whose size we cannot know
+MB = 1024 * 1024
+
+
+class NotEnoughSpace(Exception):
+    pass
+
+
+def free_space(path):
+    """Free bytes on the filesystem `path` is (or will be) on."""
+    return shutil.disk_usage(_existing(path)).free
+
+
+def _existing(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path: path = os.path.dirname(path)
+    return path
+
+
+def same_filesystem(path, other):
+    """True if both paths are (or will be) on one filesystem, so moving between them is a rename."""
+    return os.stat(_existing(path)).st_dev == os.stat(_existing(other)).st_dev
+
+
+def preallocate(f, size):
+    """Allocates `size` bytes for the open file `f` up front: one contiguous extent where the filesystem can, and no ENOSPC halfway.
+
+    Falls back to a sparse file where posix_fallocate is missing (Windows, macOS) or not supported.
+    """
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError as e:
+            if e.errno == 28: raise NotEnoughSpace(f"Not enough disk space for {size / MB:.0f} MB.") from e # ENOSPC
+    f.truncate(size)
+
+
+class DiskClaim:
+    """Space one download still needs on one filesystem. Thread-safe."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.device = None
+        self.reserved = 0
+        self.written = 0
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        return max(0, self.reserved - self.written)
+
+    def reserve(self, path, nbytes, title=None):
+        """Claims `nbytes` on the filesystem of `path`; raises NotEnoughSpace if they are not there."""
+        self.budget._reserve(self, path, nbytes, title)
+
+    def progress_hook(self, d):
+        # Bytes on disk now count as used in free_space; stop claiming them
+        if d.get("status") != "downloading": return
+        done = d.get("downloaded_bytes") or 0
+        with self._lock: # Concurrent fragments report from several threads
+            last = self._seen.get(d.get("filename"))
+            self._seen[d.get("filename")] = max(done, last or 0)
+            if last is not None and done > last: self.written += done - last
+
+    def release(self):
+        self.budget._release(self)
+
+
+class DiskBudget:
+    """The claims of all running downloads, checked against the free space of their filesystems."""
+
+    def __init__(self, min_free=MIN_FREE):
+        self.min_free = min_free
+        self._claims = set()
+        self._lock = threading.Lock()
+
+    def claim(self):
+        return DiskClaim(self)
+
+    def _reserve(self, claim, path, nbytes, title):
+        device = os.stat(_existing(path)).st_dev
+        with self._lock:
+            others = sum(other.remaining for other in self._claims if other.device == device and other is not claim)
+            free = free_space(path)
+            if free - others - self.min_free < nbytes:
+                raise NotEnoughSpace(f"Not enough disk space for {title or os.path.basename(path)}: needs {nbytes / MB:.0f} MB, "
+                                     f"{max(0, free - others) / MB:.0f} MB free on that drive after running downloads "
+                                     f"(keeping {self.min_free / MB:.0f} MB spare).")
+            claim.device, claim.reserved, claim.written = device, nbytes, 0
+            self._claims.add(claim)
+
+    def _release(self, claim):
+        with self._lock: self._claims.discard(claim)
+
+    def claimed(self, path):
+        """Bytes running downloads still claim on the filesystem of `path`."""
+        device = os.stat(_existing(path)).st_dev
+        with self._lock: return sum(claim.remaining for claim in self._claims if claim.device == device)
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+def format_key(download_type, quality):
+    """What was downloaded, as stored in the archive: each audio format and each video quality count separately."""
+    if download_type == "Audio": return "audio:mp3" if quality == "Best" else f"audio:{quality.lower()}" # "Best" is how MP3 jobs used to be stored
+    return f"video:{quality.lower()}"
+
+
+class DownloadArchive:
+    """Index of finished downloads: (extractor key, video ID, format) -> output file.
+
+    Backed by SQLite so the GUI and CLI runs share it, with an in-memory set in
+    front so the common "already have it" check is a set lookup. Rows added by
+    another process since we opened the archive are still found, through the
+    primary key index, and then remembered.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS archive (extractor TEXT NOT NULL, video_id TEXT NOT NULL, format TEXT NOT NULL,"
+                " output_path TEXT, title TEXT, downloaded_at REAL, PRIMARY KEY (extractor, video_id, format))")
+            self._known = {row[:3]: row[3] for row in self._db.execute("SELECT extractor, video_id, format, output_path FROM archive")}
+
+    def __len__(self):
+        return len(self._known)
+
+    def lookup(self, extractor, video_id, fmt):
+        """Output path recorded for this item, or None if it was never downloaded."""
+        key = (extractor, video_id, fmt)
+        with self._lock:
+            if key in self._known: return self._known[key]
+            row = self._db.execute("SELECT output_path FROM archive WHERE extractor=? AND video_id=? AND format=?", key).fetchone()
+            if row is None: return None
+            self._known[key] = row[0]
+            return row[0]
+
+    def has(self, extractor, video_id, fmt):
+        """True if the item was downloaded and its file is still there."""
+        path = self.lookup(extractor, video_id, fmt)
+        return path is not None and os.path.exists(path)
+
+    def add(self, extractor, video_id, fmt, output_path, title=None):
+        key = (extractor, video_id, fmt)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?, ?)", key + (output_path, title, time.time()))
+            self._known[key] = output_path
+
+    def remove(self, extractor, video_id, fmt):
+        key = (extractor, video_id, fmt)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM archive WHERE extractor=? AND video_id=? AND format=?", key)
+            self._known.pop(key, None)
+
+    def close(self):
+        with self._lock: self._db.close()
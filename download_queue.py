@@ -0,0 +1,228 @@
+import itertools
+import threading
+from collections import deque
+
+# Job states, in the order a job normally moves through them
+JOB_QUEUED = "Queued"
+JOB_RUNNING = "Running"
+JOB_DONE = "Done"
+JOB_FAILED = "Failed"
+JOB_CANCELLED = "Cancelled"
+JOB_PAUSED = "Paused" # Stopped with its partial files kept; DownloadQueue.resume continues it
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+DEFAULT_MAX_WORKERS = 3
+MAX_WORKERS_LIMIT = 8
+DEFAULT_PLAYLIST_WORKERS = 4
+PRIORITIES = ("High", "Normal", "Low") # Queued jobs start in this order; see also bandwidth.PRIORITY_WEIGHTS
+
+_job_ids = itertools.count(1)
+
+
+class DownloadJob:
+    """One URL plus the options it is downloaded with, and its live state."""
+
+    def __init__(self, url, output_path, download_type="Video", quality="Best", playlist_workers=DEFAULT_PLAYLIST_WORKERS, priority="Normal"):
+        self.id = next(_job_ids)
+        self.url = url
+        self.output_path = output_path
+        self.download_type = download_type
+        self.quality = quality
+        self.playlist_workers = max(1, min(MAX_WORKERS_LIMIT, int(playlist_workers)))
+        self.priority = priority if priority in PRIORITIES else "Normal"
+        self.title = url
+        self.state = JOB_QUEUED
+        self.progress = 0.0
+        self.status_text = "Queued."
+        self.error = None
+        self.failures = [] # Playlist mode: (index, title, error) per failed entry
+        self.postprocessed = [] # Audio: (output file, "kept" / "copied" / "transcoded") per file
+        self.metrics = None # metrics.JobMetrics, once the job has started
+        self.cancel_event = threading.Event()
+        self.pause_requested = False # Stopping through cancel_event means pause, not cancel
+        self.on_transfers_done = None # Set by the DownloadQueue running the job, see transfers_done
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def cancel(self):
+        self.pause_requested = False
+        self.cancel_event.set()
+
+    def pause(self):
+        # The engine stops the same way as for a cancel; yt-dlp leaves .part files and fragment state behind
+        self.pause_requested = True
+        self.cancel_event.set()
+
+    def transfers_done(self):
+        """Called by the worker once only local work (e.g. audio conversion) is left; the queue may start its next job meanwhile."""
+        callback = self.on_transfers_done
+        if callback is not None: callback()
+
+
+class DownloadQueue:
+    """Bounded worker pool running `worker(job)` for every submitted job.
+
+    `worker` does the actual download and may update the job's progress/status;
+    it signals failure by raising. `on_update(job)` is called from worker
+    threads whenever a job changes state, so GUI callers must marshal it.
+    Queued jobs start in priority order (see PRIORITIES), then first come first served.
+    A job whose worker calls job.transfers_done() stops counting against
+    `max_workers`: it keeps running (and stays Running) until the worker
+    returns, while the next queued job already starts.
+    """
+
+    def __init__(self, worker, max_workers=DEFAULT_MAX_WORKERS, on_update=None):
+        self._worker = worker
+        self._on_update = on_update
+        self._max_workers = self._clamp(max_workers)
+        self._pending = deque()
+        self._jobs = []
+        self._active_workers = 0
+        self._running = 0
+        self._detached = 0 # Running jobs that called transfers_done; their threads exit after them
+        self._lock = threading.Condition()
+
+    @staticmethod
+    def _clamp(value):
+        return max(1, min(MAX_WORKERS_LIMIT, int(value)))
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    def set_max_workers(self, value):
+        """Change concurrency while running; extra workers retire after their current job."""
+        with self._lock:
+            self._max_workers = self._clamp(value)
+            self._spawn_workers()
+            self._lock.notify_all()
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def is_busy(self):
+        with self._lock:
+            return bool(self._pending) or self._running > 0
+
+    def submit(self, job):
+        """Adds a job; one that is already paused (e.g. restored from a JobJournal) waits for `resume`."""
+        with self._lock:
+            self._jobs.append(job)
+            if job.state != JOB_PAUSED:
+                self._pending.append(job)
+                self._spawn_workers()
+                self._lock.notify()
+        self.notify(job)
+        return job
+
+    def cancel(self, job):
+        with self._lock:
+            if job in self._pending: # Never started, drop it right away
+                self._pending.remove(job)
+                job.state, job.status_text = JOB_CANCELLED, "Cancelled before start."
+            elif job.state == JOB_PAUSED:
+                job.state, job.status_text = JOB_CANCELLED, "Cancelled while paused."
+        job.cancel()
+        self.notify(job)
+
+    def pause(self, job):
+        """Stops a queued or running job, keeping what it downloaded so far; see resume."""
+        with self._lock:
+            if job.finished or job.state == JOB_PAUSED: return
+            if job in self._pending:
+                self._pending.remove(job)
+                job.state, job.status_text = JOB_PAUSED, "Paused before start."
+        job.pause()
+        self.notify(job)
+
+    def resume(self, job):
+        """Queues a paused job again; yt-dlp continues its partial files from where they stopped."""
+        with self._lock:
+            if job.state != JOB_PAUSED: return
+            job.cancel_event.clear()
+            job.pause_requested = False
+            job.error, job.failures, job.postprocessed = None, [], [] # The next run reports them again
+            job.state, job.status_text = JOB_QUEUED, "Queued to resume."
+            self._pending.append(job)
+            self._spawn_workers()
+            self._lock.notify()
+        self.notify(job)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            if not job.finished: self.cancel(job)
+
+    def clear_finished(self):
+        with self._lock:
+            self._jobs = [job for job in self._jobs if not job.finished]
+
+    def notify(self, job):
+        if self._on_update:
+            try: self._on_update(job)
+            except Exception as e: print(f"Warning: job update callback failed: {e}")
+
+    def _spawn_workers(self):
+        # Called with the lock held
+        while self._active_workers < min(self._max_workers, len(self._pending) + self._running - self._detached):
+            self._active_workers += 1
+            threading.Thread(target=self._worker_loop, daemon=True).start()
+
+    def _next_job(self):
+        with self._lock:
+            while True:
+                if self._active_workers > self._max_workers or not self._pending:
+                    self._active_workers -= 1
+                    return None
+                job = min(self._pending, key=lambda job: PRIORITIES.index(job.priority)) # First of the highest priority
+                self._pending.remove(job)
+                if job.cancel_event.is_set(): continue
+                self._running += 1
+                return job
+
+    def _detach(self, job, detached):
+        # The job's thread stops being one of the max_workers; another takes the next job
+        with self._lock:
+            if detached: return
+            detached.append(job)
+            self._active_workers -= 1
+            self._detached += 1
+            self._spawn_workers()
+            self._lock.notify_all()
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None: return
+            detached = []
+            job.on_transfers_done = lambda: self._detach(job, detached)
+            job.state, job.status_text = JOB_RUNNING, "Starting..."
+            self.notify(job)
+            try:
+                self._worker(job)
+                if job.cancel_event.is_set():
+                    self._stopped(job)
+                else:
+                    job.state, job.progress = JOB_DONE, 100.0
+                    if job.status_text == "Starting...": job.status_text = "Done."
+            except Exception as e:
+                job.error = str(e)
+                if job.cancel_event.is_set():
+                    self._stopped(job)
+                else:
+                    job.state, job.status_text = JOB_FAILED, f"Failed: {e}"
+            finally:
+                job.on_transfers_done = None
+                with self._lock:
+                    self._running -= 1
+                    self._detached -= len(detached)
+                    self._lock.notify_all()
+            self.notify(job)
+            if detached: return
+
+    @staticmethod
+    def _stopped(job):
+        if job.pause_requested: job.state, job.status_text = JOB_PAUSED, f"Paused at {job.progress:.0f}%."
+        else: job.state, job.status_text = JOB_CANCELLED, "Cancelled by user."
@@ -0,0 +1,224 @@
+"""Headless batch mode: downloads a list of URLs without loading Tk.
+
+    python downloader_cli.py urls.txt -o ~/Downloads -j 4 > results.jsonl
+    cat urls.txt | python downloader_cli.py - -t Audio
+    python downloader_cli.py urls.txt -N 8 --auto-tune   # faster fragment downloads
+    python downloader_cli.py archive.txt --limit-rate "08:00-18:00=1M, 0" --priority Low
+    python downloader_cli.py urls.txt --classify   # which extractor takes each URL, no downloads
+    python downloader_cli.py playlists.txt -q 720p --dry-run   # formats, sizes and disk fit, no downloads
+    python downloader_cli.py urls.txt --metrics-port 9464 --metrics-log metrics.jsonl
+    python downloader_cli.py channels.txt -j 4 --processes   # extractions on several cores
+    python downloader_cli.py mirror.txt -q 1080p --time-budget 120   # up to 1080p, lower where that would take over 2 minutes
+
+One JSON object per finished job is written to stdout (or --results).
+Exit status: 0 all jobs done, 1 at least one job or playlist item failed
+(with --classify: a URL only the generic extractor takes; with --dry-run: a
+job that would not fit on disk or could not be planned), 2 bad usage or
+empty URL list, 130 interrupted.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from download_queue import DownloadQueue, DownloadJob, DEFAULT_MAX_WORKERS, DEFAULT_PLAYLIST_WORKERS, MAX_WORKERS_LIMIT, PRIORITIES, JOB_DONE
+from downloader_core import DOWNLOAD_TYPES, QUALITIES, AUDIO_FORMATS, DownloadEngine, classify_url, find_ffmpeg, get_archive_path, get_info_cache_dir
+from info_cache import InfoCache, DEFAULT_TTL, DEFAULT_MAX_BYTES
+from download_archive import DownloadArchive
+from connection_tuner import ConnectionTuner, MAX_CONNECTIONS, DEFAULT_HTTP_CHUNK_SIZE
+from bandwidth import BandwidthLimiter, parse_limit
+from postprocess_pool import PostProcessPool
+from ydl_session import SessionPool
+from process_workers import ProcessWorkers
+from disk_space import DiskBudget
+from adaptive_quality import QualityAdvisor
+from metrics import MetricsRegistry, MetricsServer
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+def read_urls(stream):
+    """One URL per line; blank lines and #comments are skipped."""
+    urls = []
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith("#"): urls.append(line)
+    return urls
+
+
+def job_result(job, elapsed):
+    return {
+        "url": job.url, "title": job.title, "type": job.download_type, "quality": job.quality,
+        "output_path": job.output_path, "state": job.state, "status": job.status_text, "error": job.error,
+        "failures": [{"index": idx, "title": title, "error": err} for idx, title, err in job.failures],
+        "postprocessed": [{"path": path, "action": action} for path, action in job.postprocessed],
+        "metrics": job.metrics.as_dict() if job.metrics else None,
+        "elapsed": round(elapsed, 3),
+    }
+
+
+def classify_urls(urls, out):
+    """Writes {"url", "extractor", "id"} per URL. Returns True if every URL has a specific extractor."""
+    all_known = True
+    for url in urls:
+        ie = classify_url(url)
+        video_id = None
+        if ie is not None and ie.ie_key() != "Generic":
+            try: video_id = ie.get_temp_id(url)
+            except Exception: pass
+        else:
+            all_known = False
+        out.write(json.dumps({"url": url, "extractor": ie.ie_key() if ie else None, "id": video_id}) + "\n")
+    out.flush()
+    return all_known
+
+
+def dry_run_urls(engine, jobs, out):
+    """Writes the engine's dry-run plan per job. Returns True if every job was planned and fits on disk."""
+    all_fit = True
+    for job in jobs:
+        try:
+            plan = engine.dry_run(job)
+        except Exception as e:
+            plan = {"url": job.url, "error": str(e), "fits": False}
+        all_fit = all_fit and plan["fits"] and not plan.get("failed")
+        out.write(json.dumps(plan) + "\n")
+        out.flush()
+    return all_fit
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch-download URLs without the GUI.")
+    parser.add_argument("input", help="File with one URL per line, or - for stdin")
+    parser.add_argument("-o", "--output", default=os.path.join(os.getcwd(), "AboulNasr_YT_Downloads"), help="Download folder")
+    parser.add_argument("-t", "--type", dest="download_type", choices=DOWNLOAD_TYPES, default="Video")
+    parser.add_argument("-q", "--quality", choices=QUALITIES, default="Best")
+    parser.add_argument("-a", "--audio-format", choices=AUDIO_FORMATS, default="MP3", help="Audio jobs: target format; the source is only re-encoded when its codec differs")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_MAX_WORKERS, help=f"Parallel jobs (1-{MAX_WORKERS_LIMIT})")
+    parser.add_argument("--playlist-workers", type=int, default=DEFAULT_PLAYLIST_WORKERS, help="Playlist items downloaded at once")
+    parser.add_argument("--results", help="Write JSON lines here instead of stdout")
+    parser.add_argument("--info-cache-ttl", type=int, default=DEFAULT_TTL, help="Reuse extracted video info for this many seconds (0 disables the cache)")
+    parser.add_argument("--archive", default=get_archive_path(), help="Download archive shared with the GUI; videos in it are skipped")
+    parser.add_argument("--no-archive", action="store_true", help="Neither skip nor record downloads")
+    parser.add_argument("--info-cache-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Size limit of the info cache in MB")
+    parser.add_argument("-N", "--connections", type=int, default=1, help=f"Fragments of a DASH/HLS download fetched at once (1-{MAX_CONNECTIONS})")
+    parser.add_argument("--auto-tune", action="store_true", help="Adjust the connection count between downloads from measured throughput, starting at -N")
+    parser.add_argument("--http-chunk-mb", type=float, help=f"Request progressive files in ranges of this size (default {DEFAULT_HTTP_CHUNK_SIZE // (1024 * 1024)} when -N > 1 or --auto-tune, 0 disables)")
+    parser.add_argument("--limit-rate", default="", help='Total speed limit, e.g. "2M", with optional time-of-day rules: "09:00-18:00=1M, 8M"')
+    parser.add_argument("--priority", choices=PRIORITIES, default="Normal", help="Priority of these jobs: start order and share of the speed limit")
+    parser.add_argument("--convert-workers", type=int, default=os.cpu_count() or 1, help="Parallel MP3 conversions, beside the downloads (0 converts inline, inside yt-dlp)")
+    parser.add_argument("--time-budget", type=float, help="Adaptive quality: each video gets the highest quality up to -q that downloads in this many seconds at the measured speed")
+    parser.add_argument("--processes", action="store_true", help="Run each job in a worker process, so extractions use several cores")
+    parser.add_argument("--classify", action="store_true", help="Only print the extractor for each URL; nothing is downloaded")
+    parser.add_argument("--metrics-log", help="Append per-job timings (phases, bytes, throughput, retries) here as JSON lines")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics while downloading")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the chosen formats, expected sizes and whether each job fits on disk")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Let yt-dlp print its own output to stderr")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.input == "-":
+            urls = read_urls(sys.stdin)
+        else:
+            with open(args.input, encoding="utf-8") as f: urls = read_urls(f)
+    except OSError as e:
+        print(f"Error: cannot read {args.input}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not urls:
+        print("Error: no URLs given.", file=sys.stderr)
+        return EXIT_USAGE
+    if not 1 <= args.connections <= MAX_CONNECTIONS:
+        print(f"Error: --connections must be between 1 and {MAX_CONNECTIONS}.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.time_budget is not None and args.time_budget <= 0:
+        print("Error: --time-budget must be more than 0 seconds.", file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        cap, schedule = parse_limit(args.limit_rate)
+    except ValueError as e:
+        print(f"Error: --limit-rate: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.classify:
+        out = open(args.results, "a", encoding="utf-8") if args.results else sys.stdout
+        try: return EXIT_OK if classify_urls(urls, out) else EXIT_FAILURES
+        finally:
+            if out is not sys.stdout: out.close()
+
+    # stdout carries the JSON lines, so yt-dlp must not print there
+    extra_opts = {"quiet": True, "no_warnings": True, "noprogress": True}
+    if args.verbose: extra_opts = {"logtostderr": True}
+    info_cache = None
+    if args.info_cache_ttl > 0: info_cache = InfoCache(get_info_cache_dir(), args.info_cache_ttl, args.info_cache_mb * 1024 * 1024)
+    archive = None if args.no_archive else DownloadArchive(args.archive)
+    accelerated = args.connections > 1 or args.auto_tune
+    http_chunk_size = int(args.http_chunk_mb * 1024 * 1024) if args.http_chunk_mb is not None else (DEFAULT_HTTP_CHUNK_SIZE if accelerated else None)
+    tuner = ConnectionTuner(initial=args.connections) if args.auto_tune else None
+    registry = MetricsRegistry(args.metrics_log)
+    if args.metrics_port is not None:
+        try: MetricsServer(registry, args.metrics_port).start()
+        except OSError as e:
+            print(f"Error: --metrics-port: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    engine = DownloadEngine(ffmpeg_path=find_ffmpeg()[0], extra_opts=extra_opts, info_cache=info_cache, archive=archive,
+                            connections=args.connections, http_chunk_size=http_chunk_size or None, tuner=tuner,
+                            bandwidth=BandwidthLimiter(cap, schedule) if cap or schedule else None,
+                            postprocess=PostProcessPool(args.convert_workers) if args.convert_workers > 0 else None, metrics=registry,
+                            sessions=SessionPool(), disk=DiskBudget(),
+                            adaptive=QualityAdvisor(args.time_budget) if args.time_budget else None)
+
+    quality = args.audio_format if args.download_type == "Audio" else args.quality
+    jobs = [DownloadJob(url, args.output, args.download_type, quality, args.playlist_workers, args.priority) for url in urls]
+    out = open(args.results, "a", encoding="utf-8") if args.results else sys.stdout
+    if args.dry_run:
+        try: return EXIT_OK if dry_run_urls(engine, jobs, out) else EXIT_FAILURES
+        finally:
+            if out is not sys.stdout: out.close()
+
+    write_lock = threading.Lock()
+    started = {}
+    reported = set()
+    all_reported = threading.Event()
+
+    def on_update(job):
+        if not job.finished or job.id in reported: return
+        with write_lock:
+            if job.id in reported: return
+            reported.add(job.id)
+            out.write(json.dumps(job_result(job, time.monotonic() - started[job.id])) + "\n")
+            out.flush()
+            if len(reported) == len(started): all_reported.set()
+
+    workers = ProcessWorkers(engine, enabled=args.processes)
+    queue = DownloadQueue(workers.download, args.jobs, on_update=on_update)
+    for job in jobs:
+        started[job.id] = time.monotonic()
+    for job in jobs:
+        queue.submit(job)
+
+    try:
+        while not all_reported.wait(0.5): pass
+    except KeyboardInterrupt:
+        queue.cancel_all()
+        while queue.is_busy(): time.sleep(0.2)
+        return EXIT_INTERRUPTED
+    finally:
+        if out is not sys.stdout: out.close()
+        engine.sessions.close() # Saves cookies and closes the kept connections
+        workers.close()
+
+    if any(job.state != JOB_DONE or job.failures for job in jobs):
+        return EXIT_FAILURES
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
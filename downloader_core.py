@@ -0,0 +1,599 @@
+"""GUI-free download engine shared by the Tk app and the headless CLI.
+
+Nothing in here may import tkinter: the CLI runs on headless workers.
+"""
+import glob
+import os
+import platform
+import shutil
+import threading
+
+from download_archive import format_key
+from bandwidth import PRIORITY_WEIGHTS
+from disk_space import free_space, same_filesystem
+from postprocess_pool import PostProcessCancelled, KEPT, COPIED, TRANSCODED
+
+APP_NAME = "YouTube Downloader by AboulNasr"
+FFMPEG_DOWNLOAD_URL_WINDOWS = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
+FFMPEG_SHA256_URL_WINDOWS = FFMPEG_DOWNLOAD_URL_WINDOWS + ".sha256"
+
+DOWNLOAD_TYPES = ("Video", "Audio", "Playlist")
+QUALITIES = ("Best", "1080p", "720p", "480p", "360p")
+AUDIO_FORMATS = ("MP3", "M4A", "Opus", "Original") # Audio jobs carry one of these as their quality; Original keeps the source codec
+
+# Sources each audio format can take without re-encoding come first
+_AUDIO_SOURCES = {"MP3": "bestaudio[acodec=mp3]/bestaudio/best", "M4A": "bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/best",
+                  "Opus": "bestaudio[acodec=opus]/bestaudio/best", "Original": "bestaudio/best"}
+
+
+# --- Deferred imports ---
+def load_yt_dlp():
+    """yt-dlp is a large package; import it on first use rather than at startup."""
+    import yt_dlp
+    return yt_dlp
+
+
+def warm_up_in_background():
+    """Starts importing yt-dlp on a daemon thread so it is ready when the first job runs."""
+    thread = threading.Thread(target=load_yt_dlp, daemon=True, name="yt-dlp-warmup")
+    thread.start()
+    return thread
+
+
+def classify_url(url):
+    """Returns the yt-dlp extractor class that would handle url, without any network access.
+
+    Uses the indexed dispatch in lazy_extractors when the installed yt-dlp has it,
+    otherwise tries every extractor in order like yt-dlp itself does.
+    """
+    load_yt_dlp()
+    try:
+        from yt_dlp.extractor.lazy_extractors import _find_extractor
+    except ImportError:
+        from yt_dlp.extractor import gen_extractor_classes
+        return next((ie for ie in gen_extractor_classes() if ie.suitable(url)), None)
+    return _find_extractor(url)
+
+
+# --- FFmpeg lookup ---
+def get_app_data_dir():
+    if platform.system() == "Windows":
+        path = os.path.join(os.getenv('LOCALAPPDATA', os.path.expanduser('~')), APP_NAME.replace(" ", "_"))
+    else:
+        path = os.path.join(os.path.expanduser('~/.local/share'), APP_NAME.replace(" ", "_"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_ffmpeg_local_dir_base():
+    path = os.path.join(get_app_data_dir(), "ffmpeg")
+    os.makedirs(os.path.join(path, "bin"), exist_ok=True)
+    return path
+
+
+def get_info_cache_dir():
+    return os.path.join(get_app_data_dir(), "info_cache")
+
+
+def get_archive_path():
+    return os.path.join(get_app_data_dir(), "download_archive.sqlite3")
+
+
+def get_journal_path():
+    return os.path.join(get_app_data_dir(), "job_journal.sqlite3")
+
+
+def get_metrics_path():
+    return os.path.join(get_app_data_dir(), "metrics.jsonl")
+
+
+def find_ffmpeg():
+    """Returns (path, source) where source is "system", "local" or None when FFmpeg is missing."""
+    system_ffmpeg = shutil.which("ffmpeg")
+    if system_ffmpeg: return system_ffmpeg, "system"
+    local_ffmpeg_exe = os.path.join(get_ffmpeg_local_dir_base(), "bin", "ffmpeg.exe" if platform.system() == "Windows" else "ffmpeg")
+    if os.path.exists(local_ffmpeg_exe): return local_ffmpeg_exe, "local"
+    return None, None
+
+
+# --- yt-dlp option building ---
+def build_format_string(quality_selection):
+    fmt = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo[ext=webm]+bestaudio[ext=webm]/best[vcodec!=none][acodec!=none]/bestvideo+bestaudio/best"
+    if quality_selection != "Best":
+        qv = quality_selection[:-1]
+        fmt = f"bestvideo[height<={qv}][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height<={qv}][ext=webm]+bestaudio[ext=webm]/bestvideo[height<={qv}][vcodec!=none][acodec!=none]/bestvideo[height<={qv}]+bestaudio/best[height<={qv}]"
+    return fmt
+
+
+def audio_format(quality):
+    # Audio jobs from before audio formats existed say "Best", which meant MP3
+    return quality if quality in AUDIO_FORMATS else "MP3"
+
+
+def build_format_spec(download_type, quality):
+    """The yt-dlp format string for a job's type and quality (or audio format)."""
+    if download_type == "Audio": return _AUDIO_SOURCES[audio_format(quality)]
+    return build_format_string(quality)
+
+
+def build_ydl_opts(job, progress_hook, ffmpeg_path=None, outtmpl="%(title)s.%(ext)s", extra_opts=None, extract_audio=True):
+    # extract_audio=False leaves Audio downloads in their original format, for a PostProcessPool to convert
+    ydl_opts = {
+        "outtmpl": os.path.join(job.output_path, outtmpl),
+        "progress_hooks": [progress_hook],
+        "nocheckcertificate": True, "ignoreerrors": False,
+    }
+    if ffmpeg_path: ydl_opts['ffmpeg_location'] = ffmpeg_path
+    ydl_opts["format"] = build_format_spec(job.download_type, job.quality)
+    if job.download_type == "Audio":
+        target = audio_format(job.quality)
+        if extract_audio: # FFmpegExtractAudio also stream-copies when the codec already matches
+            codec = "best" if target == "Original" else target.lower()
+            ydl_opts.update({"postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": codec, "preferredquality": "192"}], "keepvideo": False})
+    if extra_opts: ydl_opts.update(extra_opts)
+    return ydl_opts
+
+
+def _percent(d):
+    percent_str = d.get("_percent_str", "0%").strip().replace('%', '')
+    return float(percent_str) if percent_str and percent_str.replace('.', '', 1).isdigit() else None
+
+
+def _remove_fragment_leftovers(d):
+    # A fragment that was half done when a job paused is fetched again on resume, and yt-dlp
+    # leaves the old "<file>.part-FragN.part" behind; drop those once the file is complete
+    if d.get("status") != "finished" or not d.get("filename"): return
+    for path in glob.glob(glob.escape(d["filename"]) + ".part-Frag*"):
+        try: os.remove(path)
+        except OSError: pass
+
+
+def _remove_partial_download(filename):
+    # Only what yt-dlp writes while `filename` is incomplete; never the file itself or others sharing its prefix
+    paths = [filename + ".part", filename + ".ytdl"] + glob.glob(glob.escape(filename) + ".part-Frag*")
+    for path in paths:
+        try: os.remove(path)
+        except OSError: pass # Already gone, or locked (Windows); a leftover is better than a failed job
+
+
+class DownloadEngine:
+    """Runs DownloadJobs with yt-dlp. Plug `download` into a DownloadQueue as its worker.
+
+    `on_update(job)` is called from worker threads whenever a job's progress or
+    status text changes. `extra_opts` are merged into every YoutubeDL options dict.
+    With an `info_cache` (see info_cache.InfoCache), single videos reuse an
+    earlier extraction instead of extracting again. With an `archive` (see
+    download_archive.DownloadArchive), videos already downloaded in the same
+    format are skipped before any network access.
+
+    `connections` fragments of DASH / HLS downloads are fetched at once and, with
+    `http_chunk_size`, progressive files are requested in ranges of that many
+    bytes. With a `tuner` (see connection_tuner.ConnectionTuner) the tuner picks
+    the connection count for each download instead. All three may be changed
+    while jobs run; they apply from the next download on. With a `bandwidth`
+    limiter (see bandwidth.BandwidthLimiter) every job draws from it with the
+    weight of its priority; `set_priority` changes that while the job runs.
+    With a `postprocess` pool (see postprocess_pool.PostProcessPool), audio
+    conversion runs there instead of inside yt-dlp, so the next item of an
+    audio playlist downloads while the previous one converts, and once a job
+    has only conversions left it calls job.transfers_done(), so the queue
+    starts the next job meanwhile; job.postprocessed then records whether
+    each file was kept, stream-copied or transcoded. Video merges still run
+    inside yt-dlp.
+    `dry_run` plans a job's formats and size without downloading anything.
+    Every job gets job.metrics (see metrics.JobMetrics): time per phase,
+    bytes, throughput and retries; with a `metrics` registry (see
+    metrics.MetricsRegistry) finished jobs are also added up there.
+    A job stops at its next progress update once job.cancel_event is set.
+    That is not a time bound: while an extraction, a stalled connection (up
+    to yt-dlp's socket_timeout per attempt) or an FFmpeg merge runs, no update
+    comes and the job's thread keeps running; a thread cannot be stopped from
+    outside. Run jobs through process_workers.ProcessWorkers for a bound: a
+    worker that has not stopped after CANCEL_GRACE seconds is terminated.
+    yt-dlp keeps the .part files and fragment state, so a paused job (see
+    DownloadQueue.pause) picks up from there when it runs again.
+    With `sessions` (see ydl_session.SessionPool), downloads reuse warm
+    YoutubeDL instances, with their connections and extractor caches, instead
+    of building a new one per item.
+    With a `disk` budget (see disk_space.DiskBudget), an item only starts
+    once its formats' size fits in the free space left by the downloads
+    already running; otherwise it fails with disk_space.NotEnoughSpace before
+    a byte is written. Temporary files stay on the output's filesystem, so
+    finishing a download or merge is a rename.
+    With an `adaptive` advisor (see adaptive_quality.QualityAdvisor), a video
+    job's quality is a ceiling: each item gets the highest quality that
+    downloads within the advisor's time budget at the measured speed, and an
+    item that turns out too slow is started again lower.
+    """
+
+    def __init__(self, ffmpeg_path=None, on_update=None, extra_opts=None, info_cache=None, archive=None, connections=1, http_chunk_size=None, tuner=None, bandwidth=None, postprocess=None, metrics=None, sessions=None, disk=None, adaptive=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.on_update = on_update
+        self.extra_opts = extra_opts or {}
+        self.info_cache = info_cache
+        self.archive = archive
+        self.connections = connections
+        self.http_chunk_size = http_chunk_size
+        self.tuner = tuner
+        self.bandwidth = bandwidth
+        self.postprocess = postprocess
+        self.metrics = metrics
+        self.sessions = sessions
+        self.disk = disk
+        self.adaptive = adaptive
+        self._channels = {} # job.id -> bandwidth.Channel of running jobs
+
+    def _notify(self, job):
+        if self.on_update: self.on_update(job)
+
+    def progress_hook(self, job, d):
+        if job.cancel_event.is_set():
+            # This is a way to tell yt-dlp to stop. It will raise an error.
+            raise load_yt_dlp().utils.DownloadCancelled("Download cancelled by user.")
+
+        status = d.get("status")
+        if status == "downloading":
+            item_title = d.get('info_dict', {}).get('title', os.path.basename(d.get('filename', d.get('tmpfilename', 'item'))))[:40]
+            pl_idx, pl_count = d.get('playlist_index'), d.get('playlist_count')
+            text = f"Item {pl_idx}/{pl_count} " if pl_idx else ""
+            text += f"({item_title}...): {d.get('_percent_str', '0%')}" if len(item_title) == 40 else f"({item_title}): {d.get('_percent_str', '0%')}"
+            percent = _percent(d)
+            if percent is not None: job.progress = percent
+            job.title = d.get('info_dict', {}).get('title', job.title)
+            job.status_text = text
+            self._notify(job)
+
+        elif status == "finished":
+            item_title = d.get('info_dict', {}).get('title', os.path.basename(d.get('filename', 'item')))[:50]
+            text = f"Finished: {item_title}" + ("..." if len(item_title) == 50 else "")
+            if d.get('type') == 'playlist' and d.get('playlist_index') is None:
+                 text = f"Playlist finished: {d.get('info_dict',{}).get('title', 'playlist')}"
+            job.status_text, job.progress = text, 100.0
+            self._notify(job)
+
+        elif status == "error":
+            job.status_text = "Error during an item download."
+            self._notify(job)
+
+    def download(self, job):
+        """Queue worker: downloads one job, raising on failure so the queue marks it failed."""
+        from metrics import JobMetrics
+        yt_dlp = load_yt_dlp()
+        job.metrics = JobMetrics()
+        if self.metrics is not None: self.metrics.start(job)
+        outcome = "failed"
+        os.makedirs(job.output_path, exist_ok=True)
+        if self.bandwidth is not None: self._channels[job.id] = self.bandwidth.channel(PRIORITY_WEIGHTS[job.priority])
+        try:
+            listed = job.download_type == "Playlist" and self._download_playlist(job)
+            if not listed: # A single video in Playlist mode downloads like Video mode, as yt-dlp did it
+                ydl_opts = build_ydl_opts(job, lambda d: self.progress_hook(job, d), self.ffmpeg_path, extra_opts=self.extra_opts, extract_audio=self.postprocess is None)
+                if not self._run_ydl(job, ydl_opts, job.url):
+                    job.progress, job.status_text = 100.0, "Already downloaded (in the download archive), skipped."
+                    outcome = "done"
+                    return
+        except yt_dlp.utils.DownloadCancelled: # Our custom cancel, or a pause
+            job.status_text = "Download Paused." if job.pause_requested else "Download Cancelled by User."
+            outcome = "paused" if job.pause_requested else "cancelled"
+        except yt_dlp.utils.DownloadError as e:
+            if "ffmpeg" in str(e).lower() and ("not found" in str(e).lower() or "is not installed" in str(e).lower()):
+                raise Exception("FFmpeg needed but not found. Use FFmpeg Utility section.") from e
+            raise
+        else:
+            outcome = ("paused" if job.pause_requested else "cancelled") if job.cancel_event.is_set() else "done"
+            if job.cancel_event.is_set() or listed: return
+            job.status_text = f"Download Process Complete: {job.title}"
+            if job.postprocessed:
+                actions = [action for _, action in job.postprocessed]
+                job.status_text += " (" + ", ".join(f"{actions.count(a)} {a}" for a in (KEPT, COPIED, TRANSCODED) if a in actions) + ")"
+        finally:
+            self._channels.pop(job.id, None)
+            job.metrics.finish()
+            if self.metrics is not None: self.metrics.record(job, outcome)
+
+    def set_priority(self, job, priority):
+        """Changes a job's priority; a running job's share of the bandwidth limit follows at once."""
+        job.priority = priority
+        channel = self._channels.get(job.id)
+        if channel is not None: channel.weight = PRIORITY_WEIGHTS[priority]
+
+    def dry_run(self, job):
+        """Plans a job without downloading: the formats each item would get, sizes and whether it fits on disk.
+
+        Only extracts (reusing and filling the info cache); no media is fetched.
+        Returns a JSON-safe dict. `needed_bytes` also counts the largest merge,
+        since FFmpeg writes the merged file while both parts still exist.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from format_planner import plan_formats
+        from playlist_stream import PlaylistStream
+        yt_dlp = load_yt_dlp()
+        with PlaylistStream(job.url, self.extra_opts) as stream:
+            opts = stream.opts
+            listed = stream.info.get("_type") in ("playlist", "multi_video")
+            entries = stream if listed else [stream.info]
+
+            def plan_entry(index, entry):
+                entry_url = entry.get("webpage_url") or entry.get("url") or entry.get("id")
+                item = {"index": index, "title": entry.get("title"), "url": entry_url, "id": entry.get("id")}
+                try:
+                    if not entry.get("formats"):
+                        item_key = (entry["ie_key"], entry["id"]) if entry.get("ie_key") and entry.get("id") else self._item_key(entry_url)
+                        cached = self.info_cache.get(*item_key) if self.info_cache is not None and item_key else None
+                        if cached is None:
+                            with yt_dlp.YoutubeDL(opts) as entry_ydl: # Extractors keep state; one YoutubeDL per thread
+                                entry = entry_ydl.extract_info(entry_url, download=False, process=False)
+                                if self.info_cache is not None and item_key and entry.get("_type", "video") == "video":
+                                    self.info_cache.put(*item_key, entry_ydl.sanitize_info(entry, remove_private_keys=True))
+                        else:
+                            entry = cached
+                    item.update(title=entry.get("title") or item["title"], id=entry.get("id") or item["id"])
+                    item.update(plan_formats(entry.get("formats") or [entry], job.quality, job.download_type, entry.get("duration")).as_dict())
+                except Exception as e: # One unavailable item should not sink the plan of a whole playlist
+                    item["error"] = str(e)
+                return item
+
+            with ThreadPoolExecutor(max_workers=job.playlist_workers if listed else 1) as pool:
+                items = list(pool.map(lambda args: plan_entry(*args), entries if listed else enumerate(entries, start=1)))
+            title = stream.title
+
+        planned = [item for item in items if "error" not in item]
+        total = sum(item["size"] or 0 for item in planned)
+        merge = max((item["size"] or 0 for item in planned if item["needs_merge"]), default=0)
+        free = free_space(job.output_path) - (self.disk.claimed(job.output_path) if self.disk is not None else 0) # Running downloads will take that
+        return {
+            "url": job.url, "title": title, "type": job.download_type, "quality": job.quality, "items": items,
+            "total_bytes": total, "unknown_sizes": sum(item["size"] is None for item in planned),
+            "merges": sum(item["needs_merge"] for item in planned), "failed": len(items) - len(planned),
+            "needed_bytes": total + merge, "free_bytes": free, "fits": total + merge <= free,
+        }
+
+    def _item_key(self, url):
+        ie = classify_url(url)
+        if ie is None or ie.ie_key() == "Generic": return None
+        video_id = ie.get_temp_id(url)
+        return (ie.ie_key(), video_id) if video_id else None
+
+    def _run_ydl(self, job, ydl_opts, url, item_key=None):
+        """ydl.download([url]), reusing a cached extraction of the video when there is a fresh one.
+
+        `item_key` is (extractor key, video ID) when the caller already knows it.
+        Returns False if the video (or every video of a playlist URL) was skipped because the archive has it.
+        """
+        from metrics import ItemTimer
+        from adaptive_quality import Downshift
+        quality = job.quality
+        timer = ItemTimer(job.metrics) # One item, however many qualities it takes
+        try:
+            while True:
+                claim = self.disk.claim() if self.disk is not None else None
+                try: return self._run_timed_ydl(job, ydl_opts, url, item_key, timer, claim, quality)
+                except Downshift as e:
+                    # Too slow for the time budget: drop what this attempt fetched and start again lower
+                    for filename in e.filenames: _remove_partial_download(filename)
+                    quality = e.quality
+                    job.metrics.add_retry()
+                    job.status_text = f"Too slow for the time budget, switching to {quality}..."
+                    self._notify(job)
+                    timer.mark("extract") # The next attempt extracts again
+                finally:
+                    if claim is not None: claim.release()
+        finally: timer.close()
+
+    def _run_timed_ydl(self, job, ydl_opts, url, item_key, timer, claim, quality):
+        yt_dlp = load_yt_dlp()
+        if item_key is None and (self.info_cache is not None or self.archive is not None): item_key = self._item_key(url)
+        fmt = format_key(job.download_type, quality)
+        finished = [] # [(extractor key, video ID), path, format key] of each video downloaded, for the archive
+        skipped = [] # Keys of the videos the archive already had
+        if self.archive is not None:
+            # Only ever a single video's key: a playlist URL's key would hide the entries added to it later
+            if item_key is not None and self.archive.has(*item_key, fmt): return False
+            ydl_opts = dict(ydl_opts, match_filter=self._archive_filter(fmt, skipped, ydl_opts.get("match_filter")))
+        ydl_opts = self._with_transfer_opts(job, ydl_opts)
+        conversions = []
+        if self.postprocess is not None and job.download_type == "Audio":
+            def convert_later(path):
+                # Runs in the download thread once a file is complete; blocks only while the pool is full
+                try: conversions.append(self.postprocess.convert_audio(self.ffmpeg_path, path, audio_format(job.quality), job.cancel_event))
+                except PostProcessCancelled: raise yt_dlp.utils.DownloadCancelled("Download cancelled by user.")
+            ydl_opts["post_hooks"] = list(ydl_opts.get("post_hooks", [])) + [convert_later]
+        ydl_opts["progress_hooks"] = list(ydl_opts.get("progress_hooks", [])) + [timer.progress_hook, _remove_fragment_leftovers]
+        ydl_opts["postprocessor_hooks"] = list(ydl_opts.get("postprocessor_hooks", [])) + [timer.postprocessor_hook]
+        if claim is not None: ydl_opts["progress_hooks"].append(claim.progress_hook)
+        adaptive = self.adaptive.item(job.download_type, quality) if self.adaptive is not None and job.download_type != "Audio" else None
+        if adaptive is not None:
+            ydl_opts["format"] = adaptive.select_formats
+            ydl_opts["progress_hooks"].append(adaptive.progress_hook)
+        temp_dir = (ydl_opts.get("paths") or {}).get("temp")
+        if temp_dir and not same_filesystem(temp_dir, job.output_path):
+            # .part and merge files next to the output, so moving them into place is a rename, not a copy
+            ydl_opts["paths"] = {key: value for key, value in ydl_opts["paths"].items() if key != "temp"}
+
+        with (self.sessions.session(ydl_opts) if self.sessions is not None else yt_dlp.YoutubeDL(ydl_opts)) as ydl:
+            timer.attach(ydl)
+            if claim is not None: self._attach_admission(ydl, job, claim)
+            if self.archive is not None:
+                # Under the quality each video actually got: one fetched lower than the ceiling is tried again next time
+                used = (lambda: format_key(job.download_type, adaptive.quality or quality)) if adaptive is not None else (lambda: fmt)
+                self._attach_archive_record(ydl, finished, used)
+            if adaptive is not None: adaptive.attach(ydl)
+            if self.info_cache is None or item_key is None:
+                ydl.download([url])
+            else:
+                info = self.info_cache.get(*item_key)
+                if info is not None:
+                    try:
+                        ydl.process_ie_result(info, download=True)
+                    except yt_dlp.utils.DownloadError:
+                        # Probably a stream URL went stale early; extract again, like --load-info-json does
+                        self.info_cache.invalidate(*item_key)
+                        job.metrics.add_retry()
+                        timer.mark("extract")
+                        info = None
+                if info is None:
+                    ie_result = ydl.extract_info(url, download=False, process=False)
+                    if ie_result and ie_result.get("_type", "video") == "video":
+                        self.info_cache.put(*item_key, ydl.sanitize_info(ie_result, remove_private_keys=True))
+                    ydl.process_ie_result(ie_result, download=True)
+
+        if conversions:
+            timer.mark("postprocess")
+            job.transfers_done() # Audio jobs end here: only the conversions are left
+            converted = self._wait_for_conversions(job, conversions)
+            if len(converted) == len(finished): # One conversion per video, in the same order
+                for record, path in zip(finished, converted): record[1] = path
+        timer.mark("finalize")
+        if not job.cancel_event.is_set():
+            for key, path, used_fmt in finished: self.archive.add(*key, used_fmt, path, title=os.path.splitext(os.path.basename(path))[0])
+        return bool(finished) or not skipped
+
+    def _archive_filter(self, fmt, skipped, match_filter=None):
+        # A yt-dlp match_filter: skips each video (single or a playlist entry) the archive already has
+        def archive_filter(info, *args, **kwargs):
+            key = (info.get("extractor_key") or info.get("ie_key"), info.get("id"))
+            if all(key) and self.archive.has(*key, fmt):
+                skipped.append(key)
+                return f"{info.get('title') or key[1]} is already in the download archive"
+            return match_filter(info, *args, **kwargs) if match_filter is not None else None
+        return archive_filter
+
+    def _attach_archive_record(self, ydl, finished, used_fmt):
+        # Collects each video's own key, final path and format key (from used_fmt()) once it is in place
+        yt_dlp = load_yt_dlp()
+
+        class ArchiveRecordPP(yt_dlp.postprocessor.PostProcessor):
+            def run(self, info):
+                if info.get("extractor_key") and info.get("id") and info.get("filepath"):
+                    finished.append([(info["extractor_key"], info["id"]), info["filepath"], used_fmt()])
+                return [], info
+
+        ydl.add_post_processor(ArchiveRecordPP(ydl), when="after_move")
+
+    def _attach_admission(self, ydl, job, claim):
+        # Runs once the formats are chosen and the file name is known, before the first byte is fetched
+        from format_planner import format_size
+        yt_dlp = load_yt_dlp()
+        converts = job.download_type == "Audio"
+
+        class DiskAdmissionPP(yt_dlp.postprocessor.PostProcessor):
+            def run(self, info):
+                formats = info.get("requested_formats") or [info]
+                needed = sum(format_size(f, info.get("duration"))[0] or 0 for f in formats) # Unknown sizes only get MIN_FREE
+                if len(formats) > 1 or converts: needed *= 2 # The merged or converted file is written while the download still exists
+                stem = os.path.splitext(info["_filename"])[0]
+                needed -= sum(os.path.getsize(path) for path in glob.glob(glob.escape(stem) + "*.part")) # Already there when resuming
+                claim.reserve(info["_filename"], max(0, needed), info.get("title"))
+                return [], info
+
+        ydl.add_post_processor(DiskAdmissionPP(ydl), when="before_dl")
+
+    def _wait_for_conversions(self, job, conversions):
+        """Waits for a run's audio conversions and returns their paths; raises the first failure."""
+        from concurrent.futures import wait
+        yt_dlp = load_yt_dlp()
+        pending = [future for future in conversions if not future.done()]
+        if pending:
+            job.status_text = f"Converting audio to {audio_format(job.quality)} ({len(conversions) - len(pending)}/{len(conversions)} done)..."
+            self._notify(job)
+        wait(conversions)
+        if job.cancel_event.is_set(): raise yt_dlp.utils.DownloadCancelled("Download cancelled by user.")
+        results = [future.result() for future in conversions]
+        job.postprocessed.extend(results)
+        return [path for path, _ in results]
+
+    def _with_transfer_opts(self, job, ydl_opts):
+        # Options already in ydl_opts (e.g. from extra_opts) win over the engine settings
+        tuner, channel = self.tuner, self._channels.get(job.id)
+        connections = tuner.connections if tuner is not None else self.connections
+        opts = {"concurrent_fragment_downloads": max(1, connections)}
+        if self.http_chunk_size: opts["http_chunk_size"] = self.http_chunk_size
+        opts.update(ydl_opts)
+        if tuner is not None: opts["progress_hooks"] = list(opts.get("progress_hooks", [])) + [tuner.hook(opts["concurrent_fragment_downloads"])]
+        if channel is not None: opts["progress_hooks"] = list(opts.get("progress_hooks", [])) + [channel.hook(job.cancel_event)]
+        return opts
+
+    def _download_playlist(self, job):
+        # Up to job.playlist_workers threads take entries from the listing as they go, so the first
+        # item starts as soon as the first page is in, and later pages are only fetched when needed.
+        # Returns False, having downloaded nothing, if the URL is not a playlist
+        from playlist_stream import PlaylistStream
+        yt_dlp = load_yt_dlp()
+        job.status_text = "Listing playlist entries..."
+        self._notify(job)
+        entry_progress = {} # index -> percent, of entries taken so far
+        skipped = []
+        listing_failed = []
+        progress_lock = threading.Lock()
+
+        def total():
+            return max(stream.count or 0, stream.listed) or 1
+
+        def update_progress(index, percent):
+            with progress_lock:
+                entry_progress[index] = percent
+                job.progress = sum(entry_progress.values()) / total()
+
+        def download_entry(index, entry, width):
+            entry_url = entry.get("webpage_url") or entry.get("url") or entry.get("id")
+
+            def entry_hook(d):
+                if job.cancel_event.is_set():
+                    raise yt_dlp.utils.DownloadCancelled("Download cancelled by user.")
+                if d.get("status") == "downloading":
+                    percent = _percent(d)
+                    if percent is None: return
+                    update_progress(index, percent)
+                    item_title = d.get('info_dict', {}).get('title', entry.get('title') or entry_url)[:40]
+                    job.status_text = f"Item {index}/{stream.count or '?'} ({item_title}): {d.get('_percent_str', '0%').strip()}"
+                    self._notify(job)
+
+            # Keep the playlist order in the file names
+            ydl_opts = build_ydl_opts(job, entry_hook, self.ffmpeg_path, outtmpl=f"{index:0{width}d} - %(title)s.%(ext)s", extra_opts=self.extra_opts)
+            item_key = (entry["ie_key"], entry["id"]) if entry.get("ie_key") and entry.get("id") else None
+            try:
+                if not self._run_ydl(job, ydl_opts, entry_url, item_key):
+                    with progress_lock: skipped.append(index)
+            except yt_dlp.utils.DownloadCancelled:
+                return
+            except Exception as e: # Report per entry, like ignoreerrors does, and keep going
+                with progress_lock: job.failures.append((index, entry.get("title") or entry_url, str(e)))
+                return
+            update_progress(index, 100.0)
+            self._notify(job)
+
+        def worker(width):
+            while not job.cancel_event.is_set():
+                try:
+                    index, entry = next(stream)
+                except StopIteration:
+                    return
+                except Exception as e: # A listing page failed; what was listed still downloads
+                    with progress_lock:
+                        if not listing_failed: job.failures.append((stream.listed + 1, "(rest of the playlist)", f"Listing stopped: {e}"))
+                        listing_failed.append(e)
+                    stream.close()
+                    return
+                download_entry(index, entry, width)
+
+        with PlaylistStream(job.url, self.extra_opts) as stream:
+            if stream.info.get("_type") not in ("playlist", "multi_video"): return False
+            job.title = stream.title
+            self._notify(job)
+            # The number width must not change halfway; without a count, 5 digits keep channels of up to
+            # 99999 entries in order (a known limit: longer listings sort out of order past that)
+            width = max(2, len(str(stream.count))) if stream.count else 5
+            workers = [threading.Thread(target=worker, args=(width,), daemon=True, name=f"playlist-{job.id}-{i}") for i in range(job.playlist_workers)]
+            for thread in workers: thread.start()
+            for thread in workers: thread.join()
+
+        job.failures.sort()
+        if job.cancel_event.is_set(): return True
+        if listing_failed and not stream.listed: raise listing_failed[0]
+        count = stream.listed + bool(listing_failed) # The unlisted rest counts as one failed item
+        if not count: raise Exception("Playlist has no downloadable entries.")
+        if len(job.failures) >= count: raise Exception(f"All {count} playlist items failed.")
+        job.status_text = f"Playlist finished: {job.title} ({count - len(job.failures)}/{count} items"
+        if skipped: job.status_text += f", {len(skipped)} already downloaded"
+        job.status_text += f", {len(job.failures)} failed)" if job.failures else ")"
+        return True
@@ -0,0 +1,206 @@
+"""HTTP downloads used for the FFmpeg bootstrap. GUI-free like downloader_core.
+
+`SegmentedDownload` fetches a whole file into `<dest>.part` in `connections`
+byte ranges at once; `<dest>.part.json` records how far each range got, so
+an interrupted or cancelled download continues where it stopped instead of
+starting again. Servers that ignore Range requests get a plain single-stream
+download.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import requests
+
+from disk_space import NotEnoughSpace, free_space, preallocate, MB
+
+DEFAULT_CONNECTIONS = 4
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024 # Not worth a connection below this
+READ_SIZE = 256 * 1024
+STATE_SAVE_INTERVAL = 2 * 1024 * 1024 # Bytes between progress saves, per connection
+TIMEOUT = 30
+
+
+class FetchCancelled(Exception):
+    """Raised when the cancel event is set; the partial download is kept for next time."""
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class ChecksumUnavailable(Exception):
+    """The trusted digest could not be fetched; nothing is downloaded or installed without one."""
+
+
+def probe(session, url):
+    """(total size, supports ranges, validator) from a one-byte Range request."""
+    response = session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=TIMEOUT)
+    try:
+        response.raise_for_status()
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 206 and "/" in content_range and not content_range.endswith("/*"):
+            return int(content_range.rsplit("/", 1)[1]), True, validator
+        return int(response.headers.get("Content-Length") or 0), False, validator
+    finally:
+        response.close()
+
+
+def fetch_sha256(checksum_url):
+    """The hex digest from a `<file>.sha256` URL (first token of the body).
+
+    Raises ChecksumUnavailable when the URL cannot be fetched or holds no
+    digest: executables are never installed unverified.
+    """
+    try:
+        response = requests.get(checksum_url, timeout=TIMEOUT)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ChecksumUnavailable(f"Could not fetch the checksum from {checksum_url}: {e}") from e
+    token = response.text.strip().split()[0] if response.text.strip() else ""
+    if len(token) != 64 or not all(c in "0123456789abcdefABCDEF" for c in token):
+        raise ChecksumUnavailable(f"No SHA-256 digest at {checksum_url}.")
+    return token.lower()
+
+
+class SegmentedDownload:
+    """Downloads `url` to `dest_path` over up to `connections` parallel Range requests.
+
+    `progress(done, total)` is called from the download threads; `total` is 0
+    when the server does not say. Setting `cancel_event` stops all connections
+    within one read and raises FetchCancelled. With `sha256`, the finished file
+    is verified before it is renamed into place; a mismatch deletes it.
+    `throttle(nbytes)`, if given, is called after every read and may block to
+    slow the download down (see bandwidth.Channel.consume).
+    """
+
+    def __init__(self, url, dest_path, connections=DEFAULT_CONNECTIONS, progress=None, cancel_event=None, sha256=None, session=None, throttle=None):
+        self.url = url
+        self.dest_path = dest_path
+        self.part_path = dest_path + ".part"
+        self.state_path = dest_path + ".part.json"
+        self.connections = max(1, int(connections))
+        self.progress = progress
+        self.cancel_event = cancel_event or threading.Event()
+        self.sha256 = sha256.lower() if sha256 else None
+        self.session = session or requests.Session()
+        self.throttle = throttle
+        self.resumed_bytes = 0 # How much an earlier attempt had already fetched
+        self._lock = threading.Lock()
+        self._done = 0
+        self._total = 0
+
+    # --- State file ---
+    def _load_state(self, total, validator):
+        try:
+            with open(self.state_path, encoding="utf-8") as f: state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != self.url or state.get("total") != total or state.get("validator") != validator: return None
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) != total: return None
+        return state
+
+    def _save_state(self, state):
+        tmp_path = self.state_path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f: json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+
+    def _discard_partial(self):
+        for path in (self.part_path, self.state_path):
+            try: os.remove(path)
+            except OSError: pass
+
+    # --- Download ---
+    def _report(self, nbytes):
+        with self._lock:
+            self._done += nbytes
+            done = self._done
+        if self.progress: self.progress(done, self._total)
+        if self.throttle: self.throttle(nbytes)
+
+    def _fetch_segment(self, state, segment):
+        start, end = segment["start"], segment["end"]
+        position = start + segment["done"]
+        if position > end: return
+        headers = {"Range": f"bytes={position}-{end}"}
+        if state.get("validator"): headers["If-Range"] = state["validator"]
+        with self.session.get(self.url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            if response.status_code != 206: raise requests.exceptions.HTTPError("Server stopped honouring Range requests.")
+            with open(self.part_path, "r+b") as f:
+                f.seek(position)
+                for chunk in response.iter_content(chunk_size=READ_SIZE):
+                    if self.cancel_event.is_set(): break
+                    chunk = chunk[:end + 1 - position]
+                    f.write(chunk)
+                    position += len(chunk)
+                    self._report(len(chunk))
+                    if position > end: break
+                    if position - start - segment["done"] >= STATE_SAVE_INTERVAL:
+                        f.flush() # Only record what has reached the file
+                        segment["done"] = position - start
+                        self._save_state(state)
+                f.flush()
+                segment["done"] = position - start
+        self._save_state(state)
+        if self.cancel_event.is_set(): raise FetchCancelled("Download cancelled; it will resume next time.")
+        if position <= end: raise requests.exceptions.ConnectionError("Connection closed before the range was complete.")
+
+    def _download_ranged(self, total, validator):
+        from concurrent.futures import ThreadPoolExecutor
+        state = self._load_state(total, validator)
+        if state is None:
+            self._discard_partial()
+            count = max(1, min(self.connections, total // MIN_SEGMENT_SIZE))
+            bounds = [total * i // count for i in range(count + 1)]
+            state = {"url": self.url, "total": total, "validator": validator,
+                     "segments": [{"start": bounds[i], "end": bounds[i + 1] - 1, "done": 0} for i in range(count)]}
+            if free_space(self.part_path) < total: raise NotEnoughSpace(f"Not enough disk space for the FFmpeg download ({total / MB:.0f} MB).")
+            with open(self.part_path, "wb") as f: preallocate(f, total) # Sized up front; ranges are written in place
+            self._save_state(state)
+        self.resumed_bytes = self._done = sum(segment["done"] for segment in state["segments"])
+        if self.progress: self.progress(self._done, total)
+
+        with ThreadPoolExecutor(max_workers=len(state["segments"]), thread_name_prefix="ffmpeg-fetch") as pool:
+            futures = [pool.submit(self._fetch_segment, state, segment) for segment in state["segments"]]
+            errors = [future.exception() for future in futures]
+        errors = [e for e in errors if e is not None]
+        if errors: raise next((e for e in errors if isinstance(e, FetchCancelled)), errors[0])
+
+    def _download_single(self):
+        self._discard_partial() # Nothing to resume from without Range support
+        with self.session.get(self.url, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            with open(self.part_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=READ_SIZE):
+                    if self.cancel_event.is_set(): raise FetchCancelled("Download cancelled.")
+                    f.write(chunk)
+                    self._report(len(chunk))
+
+    def _verify(self):
+        if not self.sha256: return
+        digest = hashlib.sha256()
+        with open(self.part_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""): digest.update(block)
+        if digest.hexdigest() != self.sha256:
+            self._discard_partial()
+            raise ChecksumMismatch(f"Checksum mismatch for {os.path.basename(self.dest_path)}; the download was discarded.")
+
+    def run(self):
+        """Downloads (or finishes downloading) the file and returns dest_path."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.dest_path)), exist_ok=True)
+        total, ranged, validator = probe(self.session, self.url)
+        self._total = total
+        if ranged and total > 0:
+            self._download_ranged(total, validator)
+        else:
+            self._download_single()
+        self._verify()
+        os.replace(self.part_path, self.dest_path)
+        try: os.remove(self.state_path)
+        except OSError: pass
+        return self.dest_path
+
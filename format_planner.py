@@ -0,0 +1,75 @@
+"""Decides formats locally, before anything is downloaded.
+
+    plan = plan_formats(info["formats"], "720p", duration=info.get("duration"))
+    plan.format_id, plan.size, plan.needs_merge
+
+Hands an already extracted formats list, with the format string the
+download would use (build_format_spec), to yt-dlp's own processing
+(process_ie_result without downloading), so the answer matches what the
+download will pick, without any network access.
+"""
+import threading
+
+from downloader_core import load_yt_dlp, build_format_spec
+
+_local = threading.local() # Per thread: format string -> YoutubeDL; selection keeps state on the instance
+
+
+def _ydl(format_spec):
+    planners = getattr(_local, "planners", None)
+    if planners is None: planners = _local.planners = {}
+    if format_spec not in planners:
+        planners[format_spec] = load_yt_dlp().YoutubeDL(
+            {"quiet": True, "no_warnings": True, "simulate": True, "check_formats": False, "format": format_spec},
+            auto_init=False) # No extractors: it only processes results it is given
+    return planners[format_spec]
+
+
+def format_size(fmt, duration=None):
+    """(bytes, estimated) for one format; bytes is None when nothing hints at the size."""
+    if fmt.get("filesize"): return int(fmt["filesize"]), False
+    if fmt.get("filesize_approx"): return int(fmt["filesize_approx"]), True
+    if fmt.get("tbr") and duration: return int(fmt["tbr"] * 1000 / 8 * duration), True
+    return None, True
+
+
+class FormatPlan:
+    """What a download will fetch: the chosen formats, their size and whether FFmpeg has to merge them."""
+
+    def __init__(self, formats, duration=None):
+        self.formats = formats # Chosen format dicts, video first
+        # An unknown codec (a direct file link) may be either, as far as yt-dlp is concerned too
+        self.video = next((f for f in formats if f.get("vcodec") != "none"), None)
+        self.audio = next((f for f in reversed(formats) if f.get("acodec") != "none"), None)
+        self.format_id = "+".join(f["format_id"] for f in formats)
+        self.needs_merge = len(formats) > 1
+        sizes = [format_size(f, duration) for f in formats]
+        self.size = None if any(size is None for size, _ in sizes) else sum(size for size, _ in sizes)
+        self.size_estimated = any(estimated for _, estimated in sizes)
+
+    def as_dict(self):
+        def describe(fmt):
+            if fmt is None: return None
+            return {key: fmt.get(key) for key in ("format_id", "ext", "height", "fps", "vcodec", "acodec", "tbr")}
+        return {"format_id": self.format_id, "video": describe(self.video), "audio": describe(self.audio),
+                "size": self.size, "size_estimated": self.size_estimated, "needs_merge": self.needs_merge}
+
+
+def plan_formats(formats, quality="Best", download_type="Video", duration=None):
+    """Picks formats from an extracted `formats` list like the download would; returns a FormatPlan.
+
+    Raises ValueError when nothing matches (the download would fail with
+    "Requested format is not available").
+    """
+    yt_dlp = load_yt_dlp()
+    # Processing fills in and sorts the formats in place; leave the caller's (possibly cached) dicts alone
+    candidates = [dict(fmt) for fmt in formats or [] if fmt.get("url")]
+    if not candidates: raise ValueError("Requested format is not available.")
+    info = {"id": "plan", "title": "plan", "extractor": "planner", "extractor_key": "Planner", "webpage_url": candidates[0]["url"],
+            "duration": duration, "formats": candidates}
+    try:
+        chosen = _ydl(build_format_spec(download_type, quality)).process_ie_result(info, download=False)
+    except yt_dlp.utils.ExtractorError as e:
+        raise ValueError("Requested format is not available.") from e
+    return FormatPlan(chosen.get("requested_formats") or [chosen], duration)
+
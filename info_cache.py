@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+DEFAULT_TTL = 6 * 3600 # Seconds; YouTube stream URLs are signed for about this long anyway
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+EXPIRY_MARGIN = 15 * 60 # Treat URLs that expire this soon as expired: the download still has to run
+
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d{9,})")
+
+
+def url_expiry(info):
+    """Earliest expiry timestamp found in the info dict's format URLs, or None."""
+    stamps = []
+    for fmt in info.get("formats") or [info]:
+        for key in ("url", "manifest_url", "fragment_base_url"):
+            mobj = _EXPIRE_RE.search(fmt.get(key) or "")
+            if mobj: stamps.append(int(mobj.group(1)))
+    return min(stamps, default=None)
+
+
+def _file_size(path):
+    try: return os.path.getsize(path)
+    except OSError: return 0
+
+
+class InfoCache:
+    """On-disk cache of extracted info dicts, keyed by (extractor key, video ID).
+
+    Entries are gzipped JSON files, one per video. An entry is stale once it is
+    older than `ttl` seconds or once any of its format URLs is about to expire,
+    whichever comes first. The directory is kept under `max_bytes` by evicting
+    the least recently used entries; its size is tracked in memory, so the
+    directory is only scanned once at first and then whenever it goes over.
+    Safe to share between threads and between processes (GUI and CLI): files
+    are replaced atomically.
+    """
+
+    def __init__(self, directory, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0 # Counters, handy for benchmarks and debugging
+        self.misses = 0
+        self._size = None # Bytes of entries as far as this instance knows; None until the first scan
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, ie_key, video_id):
+        digest = hashlib.sha1(f"{ie_key}\0{video_id}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{ie_key}-{digest[:20]}.json.gz")
+
+    def _is_fresh(self, entry, now):
+        if now - entry.get("stored_at", 0) > self.ttl: return False
+        expires = entry.get("expires")
+        return expires is None or now < expires - EXPIRY_MARGIN
+
+    def get(self, ie_key, video_id):
+        """The cached info dict, or None when missing or stale (stale entries are removed)."""
+        path = self._path(ie_key, video_id)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f: entry = json.load(f)
+        except (OSError, ValueError, EOFError):
+            self.misses += 1
+            return None
+        if entry.get("key") != [ie_key, video_id] or not self._is_fresh(entry, time.time()):
+            self.invalidate(ie_key, video_id)
+            self.misses += 1
+            return None
+        try: os.utime(path) # Mark as recently used for eviction
+        except OSError: pass
+        self.hits += 1
+        return entry["info"]
+
+    def put(self, ie_key, video_id, info):
+        """Stores a JSON-safe info dict (see YoutubeDL.sanitize_info)."""
+        if self.ttl <= 0: return
+        entry = {"key": [ie_key, video_id], "stored_at": time.time(), "expires": url_expiry(info), "info": info}
+        if not self._is_fresh(entry, entry["stored_at"]): # Already too close to expiry to be useful
+            self.invalidate(ie_key, video_id)
+            return
+        path = self._path(ie_key, video_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f: json.dump(entry, f)
+            replaced = _file_size(path)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: could not cache info for {ie_key} {video_id}: {e}")
+            try: os.remove(tmp_path)
+            except OSError: pass
+            return
+        self._grow(_file_size(path) - replaced)
+        if self._size is None or self._size > self.max_bytes: self.evict()
+
+    def _grow(self, nbytes):
+        with self._lock:
+            if self._size is not None: self._size += nbytes
+
+    def invalidate(self, ie_key, video_id):
+        path = self._path(ie_key, video_id)
+        size = _file_size(path)
+        try: os.remove(path)
+        except OSError: return
+        self._grow(-size)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json.gz"):
+                try: os.remove(os.path.join(self.directory, name))
+                except OSError: pass
+        with self._lock: self._size = None # Another process may have added some meanwhile; count again
+
+    def evict(self):
+        """Drops least recently used entries until the directory fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".json.gz"): continue
+                try: stat = entry.stat()
+                except OSError: continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes: break
+                try: os.remove(path)
+                except OSError: continue
+                total -= size
+            self._size = total # Also picks up what other processes added
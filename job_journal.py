@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+import time
+
+from download_queue import DownloadJob, JOB_QUEUED, JOB_RUNNING, JOB_PAUSED, FINISHED_STATES
+
+UNFINISHED_STATES = (JOB_QUEUED, JOB_RUNNING, JOB_PAUSED)
+KEEP_FINISHED = 7 * 24 * 3600 # Seconds finished jobs stay in the journal, for the record
+
+
+class JobJournal:
+    """Durable record of the queue, so a crash or reboot does not lose it.
+
+    `record(job)` writes a job's row whenever its state, priority or title
+    changed since the last write; progress ticks in between cost a dict
+    lookup. Each write is its own SQLite transaction in WAL mode with
+    synchronous=FULL, so it is on disk before `record` returns and a torn
+    write rolls back to the previous state. On the next start `restore()`
+    hands back the jobs that were queued, running or paused as new
+    DownloadJobs; running them again continues their partial files, since
+    yt-dlp resumes the .part files left under the same names.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._rows = {} # job.id -> row id
+        self._written = {} # job.id -> (state, priority, title) last written
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=FULL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, url TEXT NOT NULL, output_path TEXT NOT NULL, download_type TEXT,"
+                " quality TEXT, playlist_workers INTEGER, priority TEXT, title TEXT, state TEXT, progress REAL, error TEXT,"
+                " created_at REAL, updated_at REAL)")
+            self._db.execute("DELETE FROM jobs WHERE state IN (?, ?, ?) AND updated_at < ?", FINISHED_STATES + (time.time() - KEEP_FINISHED,))
+
+    def record(self, job):
+        """Writes the job if anything worth keeping changed; safe to call on every update."""
+        key = (job.state, job.priority, job.title)
+        if self._written.get(job.id) == key: return
+        now = time.time()
+        with self._lock, self._db:
+            if self._written.get(job.id) == key: return
+            row = self._rows.get(job.id)
+            if row is None:
+                self._rows[job.id] = self._db.execute(
+                    "INSERT INTO jobs (url, output_path, download_type, quality, playlist_workers, priority, title, state, progress, error, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.url, job.output_path, job.download_type, job.quality, job.playlist_workers, job.priority, job.title, job.state,
+                     job.progress, job.error, now, now)).lastrowid
+            else:
+                self._db.execute("UPDATE jobs SET priority=?, title=?, state=?, progress=?, error=?, updated_at=? WHERE id=?",
+                                 (job.priority, job.title, job.state, job.progress, job.error, now, row))
+            self._written[job.id] = key
+
+    def restore(self):
+        """New DownloadJobs for the journal's unfinished jobs, oldest first, ready to submit to a DownloadQueue.
+
+        Jobs that were paused come back paused (see DownloadQueue.submit),
+        the rest queued. Their rows are updated from then on.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, url, output_path, download_type, quality, playlist_workers, priority, title, state, progress FROM jobs"
+                f" WHERE state IN ({', '.join('?' * len(UNFINISHED_STATES))}) ORDER BY id", UNFINISHED_STATES).fetchall()
+            jobs = []
+            for row_id, url, output_path, download_type, quality, playlist_workers, priority, title, state, progress in rows:
+                job = DownloadJob(url, output_path, download_type, quality, playlist_workers, priority)
+                job.title, job.progress = title or url, progress or 0.0
+                if state == JOB_PAUSED: job.state, job.status_text = JOB_PAUSED, f"Paused at {job.progress:.0f}% (last session)."
+                self._rows[job.id] = row_id
+                jobs.append(job)
+            return jobs
+
+    def close(self):
+        with self._lock: self._db.close()
@@ -1,6 +1,12 @@
+import atexit
+import hashlib
 import importlib
+import marshal
+import os
 import random
 import re
+import sys
+import threading
 
 from ..utils import (
     age_restricted,
@@ -68,7 +74,7 @@ class LazyLoadExtractor(metaclass=LazyLoadMetaClass):
         # we have cached the regexp for *this* class, whereas getattr would also
         # match the superclass
         if '_VALID_URL_RE' not in cls.__dict__:
-            cls._VALID_URL_RE = tuple(map(re.compile, variadic(cls._VALID_URL)))
+            cls._VALID_URL_RE = tuple(map(_compile_cached, variadic(cls._VALID_URL)))
         return next(filter(None, (regex.match(url) for regex in cls._VALID_URL_RE)), None)
 
     @classmethod
@@ -374,3 +380,416 @@ class GenericIE(LazyLoadExtractor):
 
 
 _CLASS_LOOKUP = { 'YoutubeClipIE': YoutubeClipIE, 'YoutubeConsentRedirectIE': YoutubeConsentRedirectIE, 'YoutubeFavouritesIE': YoutubeFavouritesIE, 'YoutubeHistoryIE': YoutubeHistoryIE, 'YoutubeIE': YoutubeIE, 'YoutubeLivestreamEmbedIE': YoutubeLivestreamEmbedIE, 'YoutubeMusicSearchURLIE': YoutubeMusicSearchURLIE, 'YoutubeNotificationsIE': YoutubeNotificationsIE, 'YoutubePlaylistIE': YoutubePlaylistIE, 'YoutubeRecommendedIE': YoutubeRecommendedIE, 'YoutubeSearchDateIE': YoutubeSearchDateIE, 'YoutubeSearchIE': YoutubeSearchIE, 'YoutubeSearchURLIE': YoutubeSearchURLIE, 'YoutubeShortsAudioPivotIE': YoutubeShortsAudioPivotIE, 'YoutubeSubscriptionsIE': YoutubeSubscriptionsIE, 'YoutubeTabIE': YoutubeTabIE, 'YoutubeTruncatedIDIE': YoutubeTruncatedIDIE, 'YoutubeTruncatedURLIE': YoutubeTruncatedURLIE, 'YoutubeWatchLaterIE': YoutubeWatchLaterIE, 'YoutubeWebArchiveIE': YoutubeWebArchiveIE, 'YoutubeYtBeIE': YoutubeYtBeIE, 'YoutubeYtUserIE': YoutubeYtUserIE,  'GenericIE': GenericIE}
+
+
+# --- URL dispatch index ---
+# Picking an extractor means calling suitable() on every class above in turn,
+# which compiles and runs some very large patterns. The index below is derived
+# from the _VALID_URL patterns themselves: for URLs of the form
+# scheme://host/... it maps the last two host labels to the classes that could
+# possibly match; hosts that are only partly literal in a pattern are kept as
+# small regexes instead. Only those classes (plus any class whose pattern
+# cannot be analysed) are tried, still in _CLASS_LOOKUP order. The result is the same
+# as the linear scan; it only skips classes that cannot match.
+
+try:
+    from re import _constants as _sre_c, _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants as _sre_c
+    import sre_parse as _sre_parse
+
+_SCHEMES = ('http://', 'https://', '//')
+_HOST_END = '/?#:'
+# Wildcard tokens used while enumerating pattern prefixes
+_ANY = '\0'  # any string at all
+_ONE = '\1'  # exactly one char of a host label
+_MANY = '\2'  # one or more chars of a host label
+_LABEL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789_-')
+_MAX_PREFIXES = 20000
+_NON_HOST, _UNKNOWN = 'nonhost', 'unknown'
+_URL_HOST_RE = re.compile(r'(?:https?:)?//([^/?#:]*)')
+_PLAIN_HOST_RE = re.compile(r'[a-z0-9._-]*')
+_DISPATCH_INDEX = None
+
+
+class _TooComplex(Exception):
+    pass
+
+
+def _host_key(host):
+    """Last two labels of a host, the granularity the index works at."""
+    return '.'.join(host.split('.')[-2:])
+
+
+def _scheme_ends(prefix, scheme):
+    """Where `scheme` can end inside `prefix`: (end offsets, still partial, hit a wildcard)"""
+    ends, state = set(), {'partial': False, 'unknown': False}
+
+    def step(i, j):
+        if j == len(scheme):
+            ends.add(i)
+        elif i == len(prefix):
+            state['partial'] = True
+        elif prefix[i] == _ANY:
+            state['unknown'] = True
+        elif prefix[i] == _ONE:
+            if scheme[j] in _LABEL_CHARS:
+                step(i + 1, j + 1)
+        elif prefix[i] == _MANY:
+            k = j
+            while k < len(scheme) and scheme[k] in _LABEL_CHARS:
+                k += 1
+                step(i + 1, k)
+        elif prefix[i] == scheme[j]:
+            step(i + 1, j + 1)
+
+    step(0, 0)
+    return ends, state['partial'], state['unknown']
+
+
+def _host_regex(host, complete):
+    """Source of a regex for the hosts a token string stands for (lowercased, plain hosts only)"""
+    source = ''.join(
+        '[a-z0-9_-]' if c == _ONE else '[a-z0-9_-]+' if c == _MANY else re.escape(c) for c in host)
+    return source + r'\Z' if complete else source
+
+
+def _classify_prefix(prefix, at_end=False, pattern_end=False):
+    """None while undecided, else a set of results: host keys, ('re', host regex), _NON_HOST or _UNKNOWN
+
+    `at_end`: the pattern requires the URL to end here.
+    `pattern_end`: the pattern is exhausted, so anything may follow the prefix.
+    """
+    results, undecided = set(), False
+    literal_head = not any(c in prefix[:8] for c in (_ANY, _ONE, _MANY))
+    for scheme in _SCHEMES:
+        if literal_head:  # The common case needs no wildcard matching
+            ends = {len(scheme)} if prefix.startswith(scheme) else set()
+            partial, unknown = len(prefix) < len(scheme) and scheme.startswith(prefix), False
+        else:
+            ends, partial, unknown = _scheme_ends(prefix, scheme)
+        if unknown or (partial and pattern_end):
+            return {_UNKNOWN}
+        undecided = undecided or (partial and not at_end)
+        for end in ends:
+            host = prefix[end:]
+            cut = min((host.find(c) for c in _HOST_END if c in host), default=-1)
+            if cut >= 0:
+                host = host[:cut]
+            if _ANY in host:
+                return {_UNKNOWN}
+            if cut < 0 and pattern_end:  # Only the start of the host is known
+                results.add(('re', _host_regex(host, complete=False)))
+                continue
+            elif cut < 0 and not at_end:
+                undecided = True
+                continue
+            key = _host_key(host)
+            if _ONE in key or _MANY in key:
+                results.add(('re', _host_regex(host, complete=True)))
+            else:
+                results.add(key)
+    if undecided:
+        return None
+    return results or {_NON_HOST}
+
+
+class _PatternAnalyzer:
+    """Enumerates what a pattern can match up to the end of the URL host."""
+
+    def __init__(self):
+        self.results = set()
+
+    def analyze(self, pattern):
+        try:
+            leftover = self._walk(list(_sre_parse.parse(pattern)), {''})
+        except (_TooComplex, re.error, RecursionError):
+            return {_UNKNOWN}
+        for prefix in leftover:  # The pattern ended before the host did
+            self.results |= _classify_prefix(prefix, pattern_end=True)
+        return self.results
+
+    def _append(self, prefixes, tokens, at_end=False):
+        out = set()
+        for prefix in prefixes:
+            for token in tokens:
+                result = _classify_prefix(prefix + token, at_end)
+                if result is None:
+                    out.add(prefix + token)
+                else:
+                    self.results |= result
+        if len(out) > _MAX_PREFIXES:
+            raise _TooComplex
+        return out
+
+    @staticmethod
+    def _charset_tokens(items):
+        chars, label_class = set(), False
+        for op, av in items:
+            if op == _sre_c.NEGATE:
+                return [_ANY]
+            elif op == _sre_c.LITERAL:
+                chars.add(chr(av).lower())
+            elif op == _sre_c.RANGE:
+                lo, hi = av
+                if hi - lo < 4:
+                    chars.update(chr(c).lower() for c in range(lo, hi + 1))
+                elif all(chr(c).lower() in _LABEL_CHARS for c in range(lo, hi + 1)):
+                    label_class = True
+                else:
+                    return [_ANY]
+            elif op == _sre_c.CATEGORY and av in (_sre_c.CATEGORY_WORD, _sre_c.CATEGORY_DIGIT):
+                label_class = True
+            else:
+                return [_ANY]
+        if label_class:
+            return [_ONE] if chars <= _LABEL_CHARS else [_ANY]
+        return sorted(chars) if len(chars) <= 8 else [_ANY]
+
+    def _single_char_tokens(self, op, av):
+        if op == _sre_c.LITERAL:
+            return [chr(av).lower()]
+        elif op == _sre_c.IN:
+            return self._charset_tokens(av)
+        return [_ANY]
+
+    def _walk(self, items, prefixes):
+        literal_run = ''
+        for op, av in items:
+            if not prefixes:
+                break
+            if op == _sre_c.LITERAL:  # Append runs of literals in one go
+                literal_run += chr(av).lower()
+                continue
+            if literal_run:
+                prefixes, literal_run = self._append(prefixes, [literal_run]), ''
+            prefixes = self._node(op, av, prefixes)
+        if literal_run and prefixes:
+            prefixes = self._append(prefixes, [literal_run])
+        return prefixes
+
+    def _node(self, op, av, prefixes):
+        if op in (_sre_c.LITERAL, _sre_c.IN, _sre_c.NOT_LITERAL, _sre_c.ANY):
+            return self._append(prefixes, self._single_char_tokens(op, av))
+        elif op == _sre_c.BRANCH:
+            return set().union(*(self._walk(list(branch), prefixes) for branch in av[1]))
+        elif op == _sre_c.SUBPATTERN:
+            return self._walk(list(av[-1]), prefixes)
+        elif op in (_sre_c.MAX_REPEAT, _sre_c.MIN_REPEAT, getattr(_sre_c, 'POSSESSIVE_REPEAT', None)):
+            lo, hi, item = av
+            item = list(item)
+            if len(item) == 1 and item[0][0] in (_sre_c.LITERAL, _sre_c.IN, _sre_c.NOT_LITERAL, _sre_c.ANY):
+                tokens = self._single_char_tokens(*item[0])
+                if tokens == [_ONE]:
+                    prefixes = self._append(prefixes, [_ONE * lo]) if lo else prefixes
+                    return prefixes | self._append(prefixes, [_MANY]) if hi > lo else prefixes
+            if lo > 4:
+                return self._append(prefixes, [_ANY])
+            for _ in range(lo):
+                prefixes = self._walk(item, prefixes)
+            if hi == lo:
+                return prefixes
+            if hi - lo == 1:
+                return prefixes | self._walk(item, prefixes)
+            return prefixes | self._append(prefixes, [_ANY])
+        elif op == _sre_c.AT:
+            if av in (_sre_c.AT_END, _sre_c.AT_END_STRING):
+                self._append(prefixes, [''], at_end=True)
+                return set()
+            return prefixes
+        elif op in (_sre_c.ASSERT, _sre_c.ASSERT_NOT):
+            return prefixes  # Ignoring an assertion only widens the match
+        elif op == _sre_c.GROUPREF_EXISTS:
+            _, yes, no = av
+            return self._walk(list(yes), prefixes) | (self._walk(list(no), prefixes) if no else prefixes)
+        return self._append(prefixes, [_ANY])
+
+
+def _build_dispatch_index():
+    """Host key -> class names, plus host regexes for classes whose host is only partly literal"""
+    by_host, host_res, any_host, non_host = {}, {}, [], []
+    for name, cls in _CLASS_LOOKUP.items():
+        if cls._VALID_URL is False:
+            continue
+        results = set()
+        for pattern in variadic(cls._VALID_URL):
+            results |= _PatternAnalyzer().analyze(pattern) if isinstance(pattern, str) else {_UNKNOWN}
+        if _UNKNOWN in results:
+            any_host.append(name)
+        else:
+            for result in results - {_NON_HOST}:
+                if isinstance(result, tuple):
+                    host_res.setdefault(name, set()).add(result[1])
+                else:
+                    by_host.setdefault(result, []).append(name)
+        if results & {_NON_HOST, _UNKNOWN}:
+            non_host.append(name)
+    return {
+        'by_host': by_host,
+        'host_res': {name: '|'.join(sorted(f'(?:{source})' for source in sources)) for name, sources in host_res.items()},
+        'any_host': any_host,
+        'non_host': non_host,
+    }
+
+
+def _get_dispatch_index():
+    global _DISPATCH_INDEX
+    if _DISPATCH_INDEX is None:
+        cache = _load_pattern_cache()
+        index = cache.get('index')
+        if index is None:
+            index = cache['index'] = _build_dispatch_index()
+            _mark_pattern_cache_dirty()
+        order = {name: i for i, name in enumerate(_CLASS_LOOKUP)}
+
+        def classes(names):
+            return tuple(_CLASS_LOOKUP[name] for name in sorted(set(names), key=order.get))
+
+        _DISPATCH_INDEX = {
+            'by_host': {key: classes(names + index['any_host']) for key, names in index['by_host'].items()},
+            'host_res': [(_compile_cached(source), _CLASS_LOOKUP[name]) for name, source in index['host_res'].items()],
+            'any_host': classes(index['any_host']),
+            'non_host': classes(index['non_host']),
+            'order': order,
+        }
+    return _DISPATCH_INDEX
+
+
+def _dispatch_candidates(url):
+    """The classes that may be suitable for url, in _CLASS_LOOKUP order."""
+    index = _get_dispatch_index()
+    mobj = _URL_HOST_RE.match(url.lower())
+    if not mobj:
+        return index['non_host']
+    host = mobj.group(1)
+    if not _PLAIN_HOST_RE.fullmatch(host):
+        return tuple(_CLASS_LOOKUP.values())  # userinfo, IDNs etc.: not worth indexing
+    candidates = index['by_host'].get(_host_key(host), index['any_host'])
+    extra = [cls for regex, cls in index['host_res'] if regex.match(host) and cls not in candidates]
+    if extra:
+        candidates = tuple(sorted(candidates + tuple(extra), key=lambda cls: index['order'][cls.__name__]))
+    return candidates
+
+
+def _find_extractor(url):
+    """First class in _CLASS_LOOKUP order that is suitable for url, or None."""
+    return next((cls for cls in _dispatch_candidates(url) if cls.suitable(url)), None)
+
+
+def _find_extractor_linear(url):
+    """Reference implementation of _find_extractor: try every class in turn."""
+    return next((cls for cls in _CLASS_LOOKUP.values() if cls.suitable(url)), None)
+
+
+# --- Persisted pattern cache ---
+# Compiling _VALID_URL patterns is paid again by every process; YoutubeIE's
+# alone takes tens of milliseconds. re.compile() is parse + code generation +
+# _sre.compile(); the first two are pure functions of the pattern, so their
+# output (the SRE code list and group tables) is stored on disk together with
+# the dispatch index, and later processes hand it straight to _sre.compile().
+# The cache key covers the Python version, the SRE engine version, the yt-dlp
+# version, _PATTERN_CACHE_FORMAT and every pattern in this module, so an
+# upgrade simply starts a new file. Bump _PATTERN_CACHE_FORMAT whenever
+# _PatternAnalyzer or _build_dispatch_index change what they produce. _sre
+# validates the code it is given; anything unexpected falls back to
+# re.compile(), and so does a Python without the private compiler functions
+# used here. Set YTDLP_NO_PATTERN_CACHE=1 to disable.
+
+from ..version import __version__ as _YTDLP_VERSION
+
+_PATTERN_CACHE_FORMAT = 2
+
+try:
+    from re import _compiler as _sre_compile
+except ImportError:  # Python < 3.11
+    try:
+        import sre_compile as _sre_compile
+    except ImportError:
+        _sre_compile = None
+try:
+    import _sre
+except ImportError:  # Not CPython
+    _sre = None
+
+_PATTERN_CACHE = None
+_PATTERN_CACHE_DIRTY = False
+_PATTERN_CACHE_LOCK = threading.Lock()
+
+
+def _pattern_cache_enabled():
+    return (callable(getattr(_sre, 'compile', None)) and hasattr(_sre, 'MAGIC')
+            and callable(getattr(_sre_compile, '_code', None)) and not os.environ.get('YTDLP_NO_PATTERN_CACHE'))
+
+
+def _pattern_cache_path():
+    patterns = '\0'.join(
+        pattern for cls in _CLASS_LOOKUP.values() if cls._VALID_URL
+        for pattern in variadic(cls._VALID_URL) if isinstance(pattern, str))
+    key = hashlib.sha256(
+        f'{sys.version}\0{_sre.MAGIC}\0{_YTDLP_VERSION}\0{_PATTERN_CACHE_FORMAT}\0{patterns}'.encode()).hexdigest()[:16]
+    cache_dir = os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_dir, 'yt-dlp', 'lazy_extractors', f'patterns-{key}.marshal')
+
+
+def _load_pattern_cache():
+    global _PATTERN_CACHE
+    with _PATTERN_CACHE_LOCK:
+        if _PATTERN_CACHE is None:
+            _PATTERN_CACHE = {'patterns': {}}
+            if _pattern_cache_enabled():
+                try:
+                    with open(_pattern_cache_path(), 'rb') as f:
+                        data = marshal.loads(f.read())  # marshal.load() reads a file object piecemeal
+                    if isinstance(data, dict) and isinstance(data.get('patterns'), dict):
+                        _PATTERN_CACHE = data
+                except (OSError, EOFError, ValueError, TypeError):
+                    pass
+                atexit.register(_save_pattern_cache)
+    return _PATTERN_CACHE
+
+
+def _mark_pattern_cache_dirty():
+    global _PATTERN_CACHE_DIRTY
+    _PATTERN_CACHE_DIRTY = True
+
+
+def _save_pattern_cache():
+    if not _PATTERN_CACHE_DIRTY or not _pattern_cache_enabled():
+        return
+    path = _pattern_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(marshal.dumps(_PATTERN_CACHE))
+        os.replace(tmp_path, path)  # Readers never see a half-written file
+        for name in os.listdir(os.path.dirname(path)):  # Files from older versions
+            if name.startswith('patterns-') and name != os.path.basename(path):
+                os.remove(os.path.join(os.path.dirname(path), name))
+    except OSError:
+        pass
+
+
+def _compile_cached(pattern):
+    """re.compile(pattern), reusing the SRE code stored by an earlier process when there is one"""
+    if not isinstance(pattern, str) or not _pattern_cache_enabled():
+        return re.compile(pattern)
+    patterns = _load_pattern_cache()['patterns']
+    entry = patterns.get(pattern)
+    if entry is None:
+        try:
+            parsed = _sre_parse.parse(pattern, 0)
+            code = list(map(int, _sre_compile._code(parsed, 0)))
+        except Exception:
+            return re.compile(pattern)  # Raises the usual re.error for bad patterns
+        entry = patterns[pattern] = (parsed.state.flags, code, parsed.state.groups - 1, dict(parsed.state.groupdict))
+        _mark_pattern_cache_dirty()
+    try:
+        flags, code, groups, groupindex = entry
+        indexgroup = [None] * (groups + 1)
+        for name, i in groupindex.items():
+            indexgroup[i] = name
+        return _sre.compile(pattern, flags, code, groups, groupindex, tuple(indexgroup))
+    except (RuntimeError, TypeError, ValueError, IndexError):  # Written by an incompatible build
+        patterns.pop(pattern, None)
+        return re.compile(pattern)
@@ -0,0 +1,244 @@
+"""Where the time of each download goes, for logs and monitoring.
+
+    registry = MetricsRegistry("metrics.jsonl")
+    engine = DownloadEngine(metrics=registry)
+    MetricsServer(registry, port=9464).start() # http://127.0.0.1:9464/metrics
+
+Every job gets a JobMetrics (job.metrics) with the seconds spent in each of
+PHASES, the bytes transferred, average and peak throughput and the number
+of retries yt-dlp made. Each item of a job is timed by an ItemTimer, which
+follows yt-dlp through its hooks: extraction runs until the first
+pre_process post-processor, format selection until the first before_dl
+one, then transfer until the post-processors take over. Playlist items run
+side by side, so a playlist's phase times add up to more than its wall
+time. Finished jobs are appended to a JSON lines file and summed into
+counters that MetricsServer serves in the Prometheus text format.
+"""
+import collections
+import json
+import threading
+import time
+
+from downloader_core import load_yt_dlp
+
+PHASES = ("extract", "select", "transfer", "merge", "postprocess", "finalize")
+PEAK_WINDOW = 1.0 # Seconds of transfer the peak throughput is averaged over
+DEFAULT_METRICS_PORT = 9464
+
+# yt-dlp post-processors -> phase; the rest count as "postprocess"
+_PP_PHASES = {"Merger": "merge", "MoveFilesAfterDownload": "finalize"}
+
+
+class JobMetrics:
+    """Timings and transfer figures of one job; items of a playlist add up here from several threads."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.bytes = 0
+        self.peak_rate = 0.0
+        self.retries = 0
+        self.items = 0
+        self._window = collections.deque() # (monotonic time, bytes so far) over the last PEAK_WINDOW
+        self._lock = threading.Lock()
+
+    def add_phase(self, phase, seconds):
+        with self._lock: self.phases[phase] += seconds
+
+    def add_bytes(self, nbytes):
+        now = time.monotonic()
+        with self._lock:
+            self.bytes += nbytes
+            self._window.append((now, self.bytes))
+            while now - self._window[0][0] > PEAK_WINDOW: self._window.popleft()
+            span = now - self._window[0][0]
+            if span >= PEAK_WINDOW / 2: self.peak_rate = max(self.peak_rate, (self.bytes - self._window[0][1]) / span)
+
+    def add_item(self):
+        with self._lock: self.items += 1
+
+    def add_retry(self):
+        with self._lock: self.retries += 1
+
+    def finish(self):
+        self.finished = time.time()
+
+    def load(self, figures):
+        """Takes over the figures of an as_dict() made elsewhere, e.g. in a worker process."""
+        with self._lock:
+            self.started, self.finished = figures["started"], figures["started"] + figures["elapsed"]
+            self.phases.update(figures["phases"])
+            self.bytes, self.retries, self.items = figures["bytes"], figures["retries"], figures["items"]
+            self.peak_rate = figures["peak_rate"] or 0.0
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def as_dict(self):
+        with self._lock:
+            transfer = self.phases["transfer"]
+            return {
+                "started": round(self.started, 3), "elapsed": round(self.elapsed, 3),
+                "phases": {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+                "bytes": self.bytes, "avg_rate": round(self.bytes / transfer) if transfer else None,
+                "peak_rate": round(self.peak_rate) or None, "retries": self.retries, "items": self.items,
+            }
+
+
+class ItemTimer:
+    """Splits the time of one yt-dlp run into PHASES and feeds bytes and retries to a JobMetrics.
+
+    The clock always runs for exactly one phase; `mark` hands it to the next.
+    Plug `progress_hook` and `postprocessor_hook` into the YoutubeDL options
+    and call `attach(ydl)` on the instance before it extracts anything.
+    """
+
+    def __init__(self, metrics, phase="extract"):
+        self.metrics = metrics
+        self.phase = phase
+        self._since = time.monotonic()
+        self._seen = {} # filename -> downloaded_bytes already counted
+        self._lock = threading.Lock()
+
+    def mark(self, phase, only_from=None):
+        """Switches the clock to `phase`; with `only_from`, only if the current phase is one of those."""
+        with self._lock:
+            if only_from is not None and self.phase not in only_from: return
+            now = time.monotonic()
+            if self.phase: self.metrics.add_phase(self.phase, now - self._since)
+            self.phase, self._since = phase, now
+
+    def close(self):
+        self.mark(None)
+        self.metrics.add_item()
+
+    def progress_hook(self, d):
+        if d.get("status") != "downloading": return
+        if self.phase != "transfer": self.mark("transfer")
+        done = d.get("downloaded_bytes") or 0
+        with self._lock: # Concurrent fragments report from several threads
+            last = self._seen.get(d.get("filename"))
+            self._seen[d.get("filename")] = max(done, last or 0)
+        if last is not None and done > last: self.metrics.add_bytes(done - last) # The first report is a baseline; after a resume it holds the .part
+
+    def postprocessor_hook(self, d):
+        if d.get("postprocessor") in ("PhaseMarker", "DiskAdmission", "AdaptiveQuality", "ArchiveRecord"): return # Ours; markers and checks, no work
+        if d.get("status") == "started": self.mark(_PP_PHASES.get(d.get("postprocessor"), "postprocess"))
+        elif d.get("status") == "finished": self.mark("finalize")
+
+    def attach(self, ydl):
+        """Adds phase markers to `ydl` and counts the retries it reports."""
+        yt_dlp = load_yt_dlp()
+        timer = self
+
+        class PhaseMarkerPP(yt_dlp.postprocessor.PostProcessor):
+            def __init__(self, phase, only_from):
+                super().__init__(ydl)
+                self.marks = phase, only_from
+
+            def run(self, info):
+                timer.mark(*self.marks)
+                return [], info
+
+        ydl.add_post_processor(PhaseMarkerPP("select", ("extract",)), when="pre_process")
+        ydl.add_post_processor(PhaseMarkerPP("transfer", ("extract", "select", "finalize")), when="before_dl")
+
+        # Retries are only reported as messages ("... Retrying (1/10)..."), to the screen or as warnings
+        for name in ("to_screen", "report_warning"):
+            def counting(message, *args, _report=getattr(ydl, name), **kwargs):
+                if "Retrying" in str(message): self.metrics.add_retry()
+                return _report(message, *args, **kwargs)
+            setattr(ydl, name, counting)
+
+
+class MetricsRegistry:
+    """Totals over finished jobs, plus the running ones; optionally appends each finished job to `jsonl_path`."""
+
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = jsonl_path
+        self.jobs = collections.Counter() # outcome -> finished jobs
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.bytes = 0
+        self.retries = 0
+        self.peak_rate = 0.0
+        self.running = {} # job.id -> job
+        self._lock = threading.Lock()
+
+    def start(self, job):
+        with self._lock: self.running[job.id] = job
+
+    def record(self, job, outcome):
+        """Adds a finished job ("done", "failed", "cancelled" or "paused")."""
+        figures = job.metrics.as_dict()
+        with self._lock:
+            self.running.pop(job.id, None)
+            self.jobs[outcome] += 1
+            for phase, seconds in job.metrics.phases.items(): self.phases[phase] += seconds
+            self.bytes += job.metrics.bytes
+            self.retries += job.metrics.retries
+            self.peak_rate = max(self.peak_rate, job.metrics.peak_rate)
+            if self.jsonl_path:
+                line = {"id": job.id, "url": job.url, "title": job.title, "type": job.download_type, "quality": job.quality, "outcome": outcome}
+                try:
+                    with open(self.jsonl_path, "a", encoding="utf-8") as f: f.write(json.dumps(dict(line, **figures)) + "\n")
+                except OSError as e: print(f"Warning: could not write metrics to {self.jsonl_path}: {e}")
+
+    def prometheus(self):
+        """All figures in the Prometheus text exposition format."""
+        with self._lock:
+            running = list(self.running.values())
+            lines = ["# HELP ytdl_jobs_total Finished download jobs.", "# TYPE ytdl_jobs_total counter"]
+            lines += [f'ytdl_jobs_total{{outcome="{outcome}"}} {count}' for outcome, count in sorted(self.jobs.items())]
+            lines += ["# HELP ytdl_phase_seconds_total Time finished jobs spent in each phase.", "# TYPE ytdl_phase_seconds_total counter"]
+            lines += [f'ytdl_phase_seconds_total{{phase="{phase}"}} {seconds:.3f}' for phase, seconds in self.phases.items()]
+            bytes_total = self.bytes + sum(job.metrics.bytes for job in running)
+            lines += ["# HELP ytdl_bytes_total Bytes downloaded, including running jobs.", "# TYPE ytdl_bytes_total counter", f"ytdl_bytes_total {bytes_total}",
+                      "# HELP ytdl_retries_total Retries reported by yt-dlp.", "# TYPE ytdl_retries_total counter",
+                      f"ytdl_retries_total {self.retries + sum(job.metrics.retries for job in running)}",
+                      "# HELP ytdl_peak_rate_bytes Highest throughput of a single job so far, bytes/s.", "# TYPE ytdl_peak_rate_bytes gauge",
+                      f"ytdl_peak_rate_bytes {max([self.peak_rate] + [job.metrics.peak_rate for job in running]):.0f}",
+                      "# HELP ytdl_running_jobs Jobs downloading right now.", "# TYPE ytdl_running_jobs gauge", f"ytdl_running_jobs {len(running)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _metrics_handler_class():
+    """The request handler, built on first use: http.server (and the email package under it) is only loaded with --metrics-port."""
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = self.server.registry.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return _MetricsHandler
+
+
+class MetricsServer:
+    """Serves a MetricsRegistry at http://127.0.0.1:<port>/metrics; localhost only."""
+
+    def __init__(self, registry, port=DEFAULT_METRICS_PORT, host="127.0.0.1"):
+        from http.server import ThreadingHTTPServer
+        self._httpd = ThreadingHTTPServer((host, port), _metrics_handler_class())
+        self._httpd.daemon_threads = True
+        self._httpd.registry = registry
+        self.port = self._httpd.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True, name="metrics-http").start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,97 @@
+"""Lists playlists and channels lazily, one flat entry at a time.
+
+    with PlaylistStream(url) as stream:
+        stream.title, stream.count # count is None until known
+        for index, entry in stream: ...
+
+Only the playlist pages are fetched, never the videos: each entry is a flat
+{"url", "id", "title", "ie_key"} result that a worker resolves when it gets
+to it. Pages are requested as the iteration reaches them, so the first item
+can start while later pages of a large channel are still unlisted, and
+nothing but the current page is held in memory. Iterating from several
+threads is safe; each entry is handed out once.
+"""
+import itertools
+import threading
+
+from downloader_core import load_yt_dlp
+
+
+class PlaylistStream:
+    def __init__(self, url, extra_opts=None):
+        self.url = url
+        self.opts = dict({"extract_flat": "in_playlist", "nocheckcertificate": True, "quiet": True, "no_warnings": True}, **(extra_opts or {}))
+        self.info = None
+        self.title = None
+        self.count = None # Number of entries, once known (from the site, or when the listing is exhausted)
+        self.listed = 0 # Entries handed out so far
+        self._ydl = None
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Fetches the first page of the listing. Returns False if the URL is not a playlist."""
+        yt_dlp = load_yt_dlp()
+        self._ydl = yt_dlp.YoutubeDL(self.opts)
+        info = self._ydl.extract_info(self.url, download=False, process=False)
+        while info and info.get("_type") in ("url", "url_transparent"): # e.g. a channel URL pointing at its videos tab
+            info = self._ydl.extract_info(info["url"], download=False, process=False, ie_key=info.get("ie_key"))
+        self.info = info or {}
+        self.title = self.info.get("title") or self.url
+        if self.info.get("_type") not in ("playlist", "multi_video"): return False
+        entries = self.info.get("entries") or []
+        if isinstance(entries, list): self.count = len(entries)
+        elif self.info.get("playlist_count"): self.count = self.info["playlist_count"]
+        self._entries = self._flatten(entries)
+        return True
+
+    def _flatten(self, entries):
+        # Entries may be a list, a generator or a paged list; nested playlists (channel tabs) are walked in place
+        yt_dlp = load_yt_dlp()
+        if isinstance(entries, yt_dlp.utils.PagedList): entries = self._paged(entries)
+        for entry in entries:
+            if not entry: continue
+            if entry.get("_type") == "playlist":
+                nested = entry.get("entries")
+                if nested is not None:
+                    yield from self._flatten(nested)
+                    continue
+            yield entry
+
+    @staticmethod
+    def _paged(entries):
+        # One entry at a time through the public getslice(): only the page holding it is fetched, and the
+        # list caches it for the next entries; getslice() without an end would fetch every page first
+        for index in itertools.count():
+            found = entries.getslice(index, index + 1)
+            if not found: return
+            yield found[0]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """The next (index, flat entry), fetching the next page when needed."""
+        with self._lock:
+            if self._entries is None: raise StopIteration
+            try:
+                entry = next(self._entries)
+            except StopIteration:
+                self.count = self.listed
+                self._entries = None
+                raise
+            self.listed += 1
+            return self.listed, entry
+
+    def close(self):
+        with self._lock:
+            self._entries = None
+            if self._ydl is not None: self._ydl.close()
+            self._ydl = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,151 @@
+"""FFmpeg conversions as their own pipeline stage, next to the downloads.
+
+yt-dlp runs FFmpegExtractAudio inline, so a download thread sits idle while
+its CPU-bound transcode runs and the next item cannot start. PostProcessPool
+takes the finished download instead and converts it on one of `workers`
+FFmpeg processes, while the download thread goes on to the next item. At
+most `max_pending` conversions are queued or running; submitting more blocks
+the downloader until one finishes, so a fast link cannot pile up unconverted
+files.
+
+Audio is only re-encoded when the source codec differs from the target:
+an AAC download for an M4A target, or Opus for Opus, is remuxed with stream
+copy (or kept as it is), which takes milliseconds instead of a full decode
+and encode.
+"""
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Target -> (codec, extension, muxer, encoder options). "original" keeps whatever codec the source has
+AUDIO_TARGETS = {
+    "mp3": ("mp3", "mp3", "mp3", ["-codec:a", "libmp3lame", "-b:a", "192k"]),
+    "m4a": ("aac", "m4a", "ipod", ["-codec:a", "aac", "-b:a", "192k"]),
+    "opus": ("opus", "opus", "opus", ["-codec:a", "libopus", "-b:a", "160k"]),
+}
+# Codec -> (extension, muxer) of the container it is normally stored in on its own
+AUDIO_CONTAINERS = {"aac": ("m4a", "ipod"), "alac": ("m4a", "ipod"), "mp3": ("mp3", "mp3"), "opus": ("opus", "opus"),
+                    "vorbis": ("ogg", "ogg"), "flac": ("flac", "flac")}
+
+# How each file was produced, see convert_audio
+KEPT, COPIED, TRANSCODED = "kept", "copied", "transcoded"
+
+POLL_INTERVAL = 0.2 # Seconds between cancel checks while FFmpeg runs
+PROBE_TIMEOUT = 30
+
+_AUDIO_STREAM_RE = re.compile(r"Stream #\d+:\d+.*?: Audio: (\w+)")
+
+
+class PostProcessCancelled(Exception):
+    """Raised by a conversion whose cancel event was set; the partial output is removed."""
+
+
+def _run_ffmpeg(args, cancel_event=None):
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0) # No console window flashing up from the GUI on Windows
+    try:
+        process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, creationflags=creationflags)
+    except FileNotFoundError as e:
+        raise Exception("FFmpeg needed but not found. Use FFmpeg Utility section.") from e
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True) # Keeps the pipe from filling up
+    reader.start()
+    while True:
+        try:
+            process.wait(timeout=POLL_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel_event is not None and cancel_event.is_set():
+                process.kill()
+                process.wait()
+                reader.join()
+                raise PostProcessCancelled("Conversion cancelled.")
+    reader.join()
+    if process.returncode != 0:
+        message = b"".join(stderr).decode("utf-8", "replace").strip().splitlines()
+        raise Exception(f"FFmpeg failed ({process.returncode}): {message[-1] if message else 'no output'}")
+
+
+def probe_audio_codec(ffmpeg_path, path):
+    """Codec name of the first audio stream ("aac", "opus", ...), or None; from `ffmpeg -i`, so ffprobe is not needed."""
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    try:
+        result = subprocess.run([ffmpeg_path or "ffmpeg", "-hide_banner", "-nostdin", "-i", path], stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=PROBE_TIMEOUT, creationflags=creationflags)
+    except FileNotFoundError as e:
+        raise Exception("FFmpeg needed but not found. Use FFmpeg Utility section.") from e
+    except subprocess.TimeoutExpired:
+        return None
+    mobj = _AUDIO_STREAM_RE.search(result.stderr.decode("utf-8", "replace"))
+    return mobj.group(1).lower() if mobj else None
+
+
+def convert_audio(ffmpeg_path, src_path, target="mp3", cancel_event=None, keep_original=False):
+    """Turns a downloaded file into `target` audio; returns (path, KEPT / COPIED / TRANSCODED).
+
+    KEPT: the file already was what was asked for. COPIED: the audio stream was
+    moved into the target container unchanged. TRANSCODED: it had to be
+    re-encoded. The source is removed afterwards unless `keep_original`.
+    """
+    codec = probe_audio_codec(ffmpeg_path, src_path)
+    target = target.lower()
+    if target in AUDIO_TARGETS:
+        want_codec, ext, muxer, encode = AUDIO_TARGETS[target]
+    elif codec in AUDIO_CONTAINERS: # "original": just the audio, in its usual container
+        want_codec, (ext, muxer), encode = codec, AUDIO_CONTAINERS[codec], None
+    else:
+        return src_path, KEPT # Unknown codec; nothing sensible to do without re-encoding
+    dest_path = os.path.splitext(src_path)[0] + "." + ext
+    if codec == want_codec:
+        if os.path.normcase(dest_path) == os.path.normcase(src_path): return src_path, KEPT
+        action, codec_args = COPIED, ["-codec:a", "copy"]
+    else:
+        action, codec_args = TRANSCODED, encode
+    tmp_path = dest_path + ".part"
+    try:
+        _run_ffmpeg([ffmpeg_path or "ffmpeg", "-y", "-nostdin", "-loglevel", "error", "-i", src_path, "-vn", "-map_metadata", "0"]
+                    + codec_args + (["-movflags", "+faststart"] if muxer == "ipod" else []) + ["-f", muxer, tmp_path], cancel_event)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+    if not keep_original and os.path.normcase(dest_path) != os.path.normcase(src_path):
+        try: os.remove(src_path)
+        except OSError as e: print(f"Warning: could not remove {src_path}: {e}")
+    return dest_path, action
+
+
+class PostProcessPool:
+    """Bounded pool of FFmpeg workers shared by all jobs.
+
+    Each worker thread drives one FFmpeg process, so conversions run in
+    parallel on separate cores while the Python side only waits on them.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_pending = max(self.workers, max_pending or 2 * self.workers) # Running plus waiting
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="postprocess")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(self, func, *args, cancel_event=None):
+        """Queues func(*args), blocking while max_pending conversions are already queued or running.
+
+        Returns a Future, or raises PostProcessCancelled if `cancel_event` is set while waiting.
+        """
+        while not self._slots.acquire(timeout=POLL_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set(): raise PostProcessCancelled("Conversion cancelled.")
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def convert_audio(self, ffmpeg_path, src_path, target="mp3", cancel_event=None):
+        """Future of convert_audio(...): (path, KEPT / COPIED / TRANSCODED)."""
+        return self.submit(convert_audio, ffmpeg_path, src_path, target, cancel_event, cancel_event=cancel_event)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
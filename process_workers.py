@@ -0,0 +1,310 @@
+"""Runs each download in a worker process instead of a thread of the app.
+
+    workers = ProcessWorkers(engine)
+    queue = DownloadQueue(workers.download, max_workers=3)
+
+Extraction (JSON parsing, signature deciphering) and yt-dlp's hooks are
+CPU work; in threads they hold the GIL against the Tk main loop and each
+other. Here every running job gets its own process, so extractions use
+separate cores and the app's process only relays progress. The worker
+sends a small ("update", job id, progress, status, title, bytes) tuple at
+most every UPDATE_INTERVAL, the latest one winning, a ("detach", job id)
+once only conversions are left (see DownloadJob.transfers_done), and one
+"result" tuple at the end; no job or info dict crosses the pipe.
+
+Cancelling (or pausing) sets a multiprocessing.Event that is the worker's
+job.cancel_event, so it stops where the engine always checks. If the
+worker has not stopped CANCEL_GRACE seconds later (stuck in an extraction,
+a stalled connection or a merge), it is terminated (SIGTERM), so a job
+always stops within that bound; .part files stay for yt-dlp to continue. Worker processes are kept for the next job, with their warm
+yt-dlp sessions.
+
+The engine's settings (connections, chunk size, info cache, archive,
+extra_opts) are read when a job starts. The bandwidth limit and priorities
+keep working: workers charge their bytes to the job's channel through the
+pipe. The connection tuner only picks each job's connection count, it does
+not learn from downloads in worker processes; the adaptive quality advisor
+does, from the speed samples each result carries. Each worker checks free disk
+space for its own downloads; it does not see what the others have claimed.
+"""
+import itertools
+import queue
+import threading
+import time
+
+UPDATE_INTERVAL = 0.05 # Seconds between progress messages of a worker
+POLL_INTERVAL = 0.1 # How often the relay checks for cancellation
+CANCEL_GRACE = 5.0 # Seconds a worker gets to stop on its own before it is terminated
+MAX_IDLE_WORKERS = 8
+
+
+class _Link:
+    """The worker's end of the pipe: latest-wins updates, bandwidth charges and incoming jobs."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.tasks = queue.Queue()
+        self.job_id = None
+        self._send_lock = threading.Lock()
+        self._latest = None
+        self._changed = threading.Condition()
+        self._grants = {} # token -> threading.Event
+        self._tokens = itertools.count()
+        threading.Thread(target=self._read, daemon=True, name="worker-link-read").start()
+        threading.Thread(target=self._flush_updates, daemon=True, name="worker-link-updates").start()
+
+    def send(self, *msg):
+        with self._send_lock: self.conn.send(msg)
+
+    def _read(self):
+        while True:
+            try: msg = self.conn.recv()
+            except (EOFError, OSError):
+                for granted in list(self._grants.values()): granted.set()
+                self.tasks.put(None)
+                return
+            if msg[0] == "grant":
+                granted = self._grants.get(msg[1])
+                if granted is not None: granted.set()
+            else:
+                self.tasks.put(msg)
+
+    def _flush_updates(self):
+        while True:
+            with self._changed:
+                while self._latest is None: self._changed.wait()
+                msg, self._latest = self._latest, None
+            self.send(*msg)
+            time.sleep(UPDATE_INTERVAL)
+
+    def post(self, job):
+        # The engine's on_update; only the latest state of the job is sent
+        with self._changed:
+            self._latest = ("update", job.id, job.progress, job.status_text, job.title, job.metrics.bytes if job.metrics else 0)
+            self._changed.notify()
+
+    def drop_updates(self):
+        with self._changed: self._latest = None
+
+    def charge(self, nbytes, cancel_event=None):
+        """Blocks until the app's bandwidth limiter grants `nbytes`, or `cancel_event` is set."""
+        token = next(self._tokens)
+        granted = self._grants[token] = threading.Event()
+        self.send("charge", token, nbytes)
+        while not granted.wait(POLL_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set(): break
+        self._grants.pop(token, None)
+
+
+class _PipeLimiter:
+    """Stands in for the app's bandwidth.BandwidthLimiter inside a worker."""
+
+    def __init__(self, link):
+        self.link = link
+
+    def channel(self, weight=1):
+        from bandwidth import Channel
+        return Channel(self, weight)
+
+    def consume(self, channel, nbytes, cancel_event=None):
+        self.link.charge(nbytes, cancel_event)
+
+
+class _Outcome:
+    """Stands in for a metrics.MetricsRegistry inside a worker; keeps the outcome the engine records."""
+
+    def __init__(self):
+        self.outcome = "failed"
+
+    def start(self, job):
+        self.outcome = "failed"
+
+    def record(self, job, outcome):
+        self.outcome = outcome
+
+
+def _worker_engine(config, link, outcome):
+    from downloader_core import DownloadEngine
+    from info_cache import InfoCache
+    from download_archive import DownloadArchive
+    from postprocess_pool import PostProcessPool
+    from ydl_session import SessionPool
+    from disk_space import DiskBudget
+    return DownloadEngine(
+        ffmpeg_path=config["ffmpeg_path"], on_update=link.post, extra_opts=config["extra_opts"],
+        info_cache=InfoCache(*config["info_cache"]) if config["info_cache"] else None,
+        archive=DownloadArchive(config["archive"]) if config["archive"] else None,
+        connections=config["connections"], http_chunk_size=config["http_chunk_size"],
+        bandwidth=_PipeLimiter(link) if config["bandwidth"] else None,
+        postprocess=PostProcessPool(1) if config["postprocess"] else None, # Other jobs convert in their own processes
+        metrics=outcome, sessions=SessionPool() if config["sessions"] else None,
+        disk=DiskBudget(config["disk"]) if config["disk"] is not None else None)
+
+
+def _worker_main(conn, cancel_event):
+    """Entry point of a worker process: runs jobs sent by ProcessWorkers until the pipe closes."""
+    from download_queue import DownloadJob
+    link = _Link(conn)
+    outcome = _Outcome()
+    engine, engine_config = None, None
+    while True:
+        task = link.tasks.get()
+        if task is None: return
+        _, config, spec = task
+        if config != engine_config:
+            if engine is not None and engine.sessions is not None: engine.sessions.close()
+            engine, engine_config = _worker_engine(config, link, outcome), config
+        job = DownloadJob(spec["url"], spec["output_path"], spec["download_type"], spec["quality"], spec["playlist_workers"], spec["priority"])
+        job.id, job.title, job.cancel_event = spec["id"], spec["title"], cancel_event
+        job.on_transfers_done = lambda job_id=job.id: link.send("detach", job_id)
+        if config["adaptive"] is not None: # Starts from the app's estimate; the samples taken here go back with the result
+            from adaptive_quality import QualityAdvisor
+            engine.adaptive = QualityAdvisor(config["adaptive"], spec["estimate"])
+        link.job_id = job.id
+        error = None
+        try: engine.download(job)
+        except Exception as e: error = str(e)
+        link.drop_updates() # The result carries the final state
+        link.send("result", job.id, outcome.outcome, error, {
+            "title": job.title, "progress": job.progress, "status_text": job.status_text, "failures": job.failures,
+            "postprocessed": job.postprocessed, "metrics": job.metrics.as_dict() if job.metrics else None,
+            "rates": list(engine.adaptive.recent) if engine.adaptive is not None else []})
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.cancel_event = context.Event()
+        self.process = context.Process(target=_worker_main, args=(child_conn, self.cancel_event), daemon=True, name="download-worker")
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        try: self.conn.close()
+        except OSError: pass
+        self.process.join(1)
+        if self.process.is_alive(): self.process.terminate()
+
+
+class ProcessWorkers:
+    """A DownloadQueue worker that runs `engine`'s downloads in worker processes.
+
+    With `enabled` False (it may be toggled at any time), jobs run in the
+    calling thread like `engine.download` does.
+    """
+
+    def __init__(self, engine, enabled=True):
+        self.engine = engine
+        self.enabled = enabled
+        self._context = None # multiprocessing is loaded with the first worker, not at startup
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _config(self):
+        engine = self.engine
+        info_cache = engine.info_cache
+        return {
+            "ffmpeg_path": engine.ffmpeg_path, "extra_opts": engine.extra_opts,
+            "info_cache": (info_cache.directory, info_cache.ttl, info_cache.max_bytes) if info_cache is not None else None,
+            "archive": engine.archive.path if engine.archive is not None else None,
+            "connections": engine.tuner.connections if engine.tuner is not None else engine.connections,
+            "http_chunk_size": engine.http_chunk_size, "bandwidth": engine.bandwidth is not None,
+            "postprocess": engine.postprocess is not None, "sessions": engine.sessions is not None,
+            "disk": engine.disk.min_free if engine.disk is not None else None,
+            "adaptive": engine.adaptive.budget if engine.adaptive is not None else None,
+        }
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive(): return worker
+        if self._context is None:
+            import multiprocessing
+            self._context = multiprocessing.get_context("spawn") # Forking a process with Tk and running threads is not safe
+        return _Worker(self._context)
+
+    def _put_back(self, worker):
+        with self._lock:
+            if len(self._idle) < MAX_IDLE_WORKERS:
+                self._idle.append(worker)
+                return
+        worker.stop()
+
+    def download(self, job):
+        """Queue worker: like DownloadEngine.download, in a worker process."""
+        if not self.enabled: return self.engine.download(job)
+        from bandwidth import PRIORITY_WEIGHTS
+        from metrics import JobMetrics
+        engine = self.engine
+        job.metrics = JobMetrics()
+        if engine.metrics is not None: engine.metrics.start(job)
+        outcome = "failed"
+        channel = engine.bandwidth.channel(PRIORITY_WEIGHTS[job.priority]) if engine.bandwidth is not None else None
+        if channel is not None: engine._channels[job.id] = channel
+        worker = self._checkout()
+        worker.cancel_event.clear()
+        try:
+            spec = {key: getattr(job, key) for key in ("id", "url", "output_path", "download_type", "quality", "playlist_workers", "priority", "title")}
+            spec["estimate"] = engine.adaptive.estimate if engine.adaptive is not None else None
+            worker.conn.send(("job", self._config(), spec))
+            result = self._relay(job, worker, channel)
+            if result is None: # Terminated after a cancel or pause
+                job.status_text = "Download Paused." if job.pause_requested else "Download Cancelled by User."
+                outcome = "paused" if job.pause_requested else "cancelled"
+                return
+            outcome, error, state = result
+            if outcome == "cancelled" and job.pause_requested: outcome = "paused" # The worker only sees its cancel flag
+            job.title, job.progress, job.status_text = state["title"], state["progress"], state["status_text"]
+            job.failures = [tuple(failure) for failure in state["failures"]]
+            job.postprocessed = [tuple(item) for item in state["postprocessed"]]
+            if state["metrics"]: job.metrics.load(state["metrics"])
+            if engine.adaptive is not None:
+                for rate in state["rates"]: engine.adaptive.record(rate)
+            self._put_back(worker)
+            worker = None
+            if error is not None: raise Exception(error)
+        finally:
+            if worker is not None: worker.stop()
+            engine._channels.pop(job.id, None)
+            if job.metrics.finished is None: job.metrics.finish()
+            if engine.metrics is not None: engine.metrics.record(job, outcome)
+
+    def _relay(self, job, worker, channel):
+        # Applies the worker's messages to `job` until its result; None if it had to be terminated
+        cancelled_at = None
+        while True:
+            if job.cancel_event.is_set():
+                if cancelled_at is None:
+                    worker.cancel_event.set()
+                    cancelled_at = time.monotonic()
+                elif time.monotonic() - cancelled_at > CANCEL_GRACE:
+                    worker.process.terminate()
+                    return None
+            try:
+                if not worker.conn.poll(POLL_INTERVAL):
+                    if not worker.process.is_alive(): raise EOFError
+                    continue
+                msg = worker.conn.recv()
+            except (EOFError, OSError):
+                if cancelled_at is not None: return None
+                raise Exception(f"The download worker process exited unexpectedly (exit code {worker.process.exitcode}).")
+            kind = msg[0]
+            if kind == "charge":
+                if channel is not None: channel.consume(msg[2], job.cancel_event)
+                worker.conn.send(("grant", msg[1]))
+            elif msg[1] != job.id:
+                continue # A late update from the worker's previous job
+            elif kind == "update":
+                job.progress, job.status_text, job.title, job.metrics.bytes = msg[2:]
+                self.engine._notify(job)
+            elif kind == "detach":
+                job.transfers_done()
+            elif kind == "result":
+                return msg[2:]
+
+    def close(self):
+        """Stops the idle worker processes."""
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers: worker.stop()
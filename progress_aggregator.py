@@ -0,0 +1,54 @@
+import threading
+
+DEFAULT_UI_FPS = 15
+
+
+class ProgressAggregator:
+    """Coalesces UI updates coming from worker threads.
+
+    Workers call `post(key, func, *args)` as often as they like; only the latest
+    call per key is kept, and pending calls are run on the Tk thread at a fixed
+    frame rate by a single recurring `root.after` timer. That keeps the Tk event
+    queue at `fps` callbacks a second no matter how fast progress hooks fire.
+    """
+
+    def __init__(self, root, fps=DEFAULT_UI_FPS):
+        self.root = root
+        self.interval_ms = max(1, int(1000 / fps))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self.posted = 0 # Counters, handy for benchmarks and debugging
+        self.flushed = 0
+
+    def post(self, key, func, *args):
+        with self._lock:
+            self._pending[key] = (func, args)
+            self.posted += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def start(self):
+        if self._running: return
+        self._running = True
+        self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+
+    def flush(self):
+        """Runs every pending update now. Must be called from the Tk thread."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for func, args in pending.values():
+            try: func(*args)
+            except Exception as e: print(f"Warning: UI update failed: {e}")
+        self.flushed += len(pending)
+
+    def _tick(self):
+        if not self._running: return
+        self.flush()
+        try: self.root.after(self.interval_ms, self._tick)
+        except Exception: self._running = False # Window destroyed
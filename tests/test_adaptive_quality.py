@@ -0,0 +1,134 @@
+import pytest
+
+from adaptive_quality import QualityAdvisor, Downshift, SMOOTHING, MIN_SAMPLE_BYTES
+
+MB = 1024 ** 2
+
+
+def probed_item(advisor, options, quality):
+    item = advisor.item("Video", "1080p")
+    item.options, item.quality = options, quality
+    return item
+
+
+def report(item, done, elapsed, status="downloading", filename="v.mp4"):
+    item.progress_hook({"status": status, "filename": filename, "downloaded_bytes": done, "elapsed": elapsed})
+
+
+def test_pick_highest_within_budget():
+    advisor = QualityAdvisor(budget=10)
+    sizes = [("1080p", 100 * MB), ("720p", 40 * MB), ("480p", 10 * MB)]
+    assert advisor.pick(sizes, rate=5 * MB) == "720p"
+    assert advisor.pick(sizes, rate=20 * MB) == "1080p"
+
+
+def test_pick_smallest_when_none_fits():
+    advisor = QualityAdvisor(budget=1)
+    assert advisor.pick([("1080p", 100 * MB), ("720p", 40 * MB), ("480p", 10 * MB)], rate=MB) == "480p"
+
+
+def test_pick_ceiling_without_estimate_or_sizes():
+    advisor = QualityAdvisor(budget=10)
+    assert advisor.pick([("1080p", 100 * MB), ("720p", 40 * MB)]) == "1080p"
+    assert advisor.pick([("1080p", None), ("720p", None)], rate=MB) == "1080p"
+
+
+def test_pick_skips_unknown_sizes():
+    advisor = QualityAdvisor(budget=10, estimate=MB)
+    assert advisor.pick([("1080p", None), ("720p", 40 * MB), ("480p", 5 * MB)]) == "480p"
+
+
+def test_record_smooths_the_estimate():
+    advisor = QualityAdvisor(budget=10)
+    advisor.record(100)
+    assert advisor.estimate == 100
+    advisor.record(200)
+    assert advisor.estimate == pytest.approx(SMOOTHING * 200 + (1 - SMOOTHING) * 100)
+    advisor.record(0)
+    assert list(advisor.recent) == [100, 200]
+
+
+def test_ladder_runs_down_from_the_ceiling():
+    item = QualityAdvisor(budget=10).item("Video", "720p")
+    assert item.ladder[0] == "720p"
+    assert "1080p" not in item.ladder
+
+
+def test_slow_probe_downshifts():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB), ("480p", 10 * MB)], "1080p")
+    report(item, 0, 0.0)
+    with pytest.raises(Downshift) as raised:
+        report(item, 16 * MB, 4.0) # 4 MB/s: 1080p would take 25 s, 720p 10 s
+    assert raised.value.quality == "720p"
+    assert raised.value.filenames == ["v.mp4"]
+    assert advisor.estimate == 4 * MB
+
+
+def test_no_downshift_within_slack():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB)], "1080p")
+    report(item, 0, 0.0)
+    report(item, 36 * MB, 4.0) # 11 s, within the budget's slack
+    report(item, 4 * MB, 4.0) # Probed once only
+    assert advisor.estimate == 9 * MB
+
+
+def test_fragments_end_the_probe_early():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB)], "1080p")
+    report(item, 0, 0.0)
+    with pytest.raises(Downshift):
+        item.progress_hook({"status": "downloading", "filename": "v.mp4", "downloaded_bytes": MB, "elapsed": 0.5, "fragment_index": 3})
+
+
+def test_no_downshift_before_the_probe():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB)], "1080p")
+    report(item, 0, 0.0)
+    report(item, MB, 0.5) # Too early to judge
+    assert advisor.estimate is None
+
+
+def test_resumed_bytes_do_not_count():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB)], "1080p")
+    report(item, 90 * MB, 0.0) # Resumed from a .part file
+    report(item, 90 * MB + 80 * MB, 4.0)
+    assert advisor.estimate == 20 * MB
+
+
+def test_resumed_item_is_judged_by_what_is_left():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB), ("480p", 10 * MB)], "1080p")
+    report(item, 90 * MB, 0.0) # Paused at 90 MB; at 2 MB/s the last 10 MB take 5 s
+    report(item, 98 * MB, 4.0)
+    assert advisor.estimate == 2 * MB
+
+
+def test_resumed_item_that_misses_the_budget_downshifts():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB), ("480p", 10 * MB)], "1080p")
+    report(item, 20 * MB, 0.0)
+    with pytest.raises(Downshift) as raised:
+        report(item, 28 * MB, 4.0) # 72 MB left at 2 MB/s
+    assert raised.value.quality == "480p"
+
+
+def test_no_downshift_when_starting_over_takes_longer():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB), ("720p", 40 * MB), ("480p", 30 * MB)], "1080p")
+    report(item, 70 * MB, 0.0)
+    report(item, 74 * MB, 4.0) # 26 MB left at 1 MB/s misses the budget, but all of 480p is 30 MB
+
+
+def test_finished_download_adds_a_sample():
+    advisor = QualityAdvisor(budget=10)
+    item = probed_item(advisor, [("1080p", 100 * MB)], "1080p")
+    report(item, 0, 0.0)
+    report(item, MIN_SAMPLE_BYTES - 1, 1.0, status="finished")
+    assert advisor.estimate is None
+    item = probed_item(advisor, [("1080p", 100 * MB)], "1080p")
+    report(item, 0, 0.0)
+    report(item, 8 * MB, 2.0, status="finished")
+    assert advisor.estimate == 4 * MB
@@ -0,0 +1,106 @@
+import hashlib
+import os
+
+import pytest
+
+from download_archive import DownloadArchive, format_key
+from download_queue import DownloadJob
+from downloader_core import DownloadEngine
+from local_http import LocalServer
+from stub_extractor import StubCatalog, register_stub_extractor
+
+QUIET = {"quiet": True, "no_warnings": True, "noprogress": True, "fixup": "never"}
+
+
+def test_format_key():
+    assert format_key("Audio", "Best") == "audio:mp3"
+    assert format_key("Audio", "M4A") == "audio:m4a"
+    assert format_key("Video", "720p") == "video:720p"
+    assert format_key("Playlist", "Best") == "video:best"
+
+
+def test_has_needs_the_file(tmp_path):
+    archive = DownloadArchive(str(tmp_path / "archive.db"))
+    path = tmp_path / "a.mp4"
+    archive.add("Youtube", "a", "video:best", str(path))
+    assert archive.lookup("Youtube", "a", "video:best") == str(path)
+    assert not archive.has("Youtube", "a", "video:best") # Recorded, but the file is gone
+    path.write_bytes(b"x")
+    assert archive.has("Youtube", "a", "video:best")
+    assert not archive.has("Youtube", "a", "audio:mp3")
+    archive.close()
+
+
+def test_rows_added_elsewhere_are_found(tmp_path):
+    path = str(tmp_path / "archive.db")
+    first, second = DownloadArchive(path), DownloadArchive(path)
+    first.add("Youtube", "a", "video:best", "a.mp4")
+    assert second.lookup("Youtube", "a", "video:best") == "a.mp4"
+    first.remove("Youtube", "a", "video:best")
+    assert len(first) == 0
+    first.close()
+    second.close()
+
+
+@pytest.fixture
+def stub():
+    register_stub_extractor()
+    catalog = StubCatalog()
+    for video_id in ("v1", "v2", "v3"): catalog.add_video(video_id, size=64 * 1024)
+    catalog.add_playlist("p1", ["v1", "v2"])
+    server = LocalServer(catalog.files(), content_types=catalog.content_types).start()
+    yield catalog, server
+    server.stop()
+
+
+def serve(server, catalog):
+    server.files.update(catalog.files())
+    server.etags = {path: f'"{hashlib.md5(data).hexdigest()}"' for path, data in server.files.items()}
+
+
+def run(engine, url, output_path, download_type):
+    job = DownloadJob(url, output_path, download_type)
+    engine.download(job)
+    return job
+
+
+def test_playlist_rerun_downloads_only_new_entries(tmp_path, stub):
+    catalog, server = stub
+    archive = DownloadArchive(str(tmp_path / "archive.db"))
+    engine = DownloadEngine(extra_opts=QUIET, archive=archive)
+    out = str(tmp_path / "out")
+    url = server.url("/stub/playlist/p1")
+
+    run(engine, url, out, "Playlist")
+    assert len(archive) == 2
+    downloads = server.requests
+
+    catalog.add_playlist("p1", ["v1", "v2", "v3"]) # A new upload
+    serve(server, catalog)
+    server.reset_counters()
+    run(engine, url, out, "Playlist")
+    assert len(archive) == 3
+    assert archive.has("StubMedia", "v3", format_key("Playlist", "Best"))
+    assert sorted(os.listdir(out)) == ["01 - Stub video v1.mp4", "02 - Stub video v2.mp4", "03 - Stub video v3.mp4"]
+
+    server.reset_counters()
+    run(engine, url, out, "Playlist")
+    assert server.requests < downloads # No media fetched, only the listing and entry pages
+    assert len(archive) == 3
+    archive.close()
+
+
+def test_single_video_rerun_is_skipped(tmp_path, stub):
+    _, server = stub
+    archive = DownloadArchive(str(tmp_path / "archive.db"))
+    engine = DownloadEngine(extra_opts=QUIET, archive=archive)
+    url = server.url("/stub/video/v1")
+    out = str(tmp_path / "out")
+
+    run(engine, url, out, "Video")
+    assert archive.has("StubMedia", "v1", "video:best")
+    server.reset_counters()
+    job = run(engine, url, out, "Video")
+    assert job.status_text.startswith("Already downloaded")
+    assert server.requests == 0
+    archive.close()
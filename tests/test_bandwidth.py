@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bandwidth import BandwidthLimiter, PRIORITY_WEIGHTS, MAX_DEBT_SECONDS, parse_rate, parse_limit, scheduled_cap
+
+MB = 1024 ** 2
+
+
+def at(hour, minute):
+    return time.struct_time((2026, 1, 1, hour, minute, 0, 3, 1, -1))
+
+
+def test_parse_rate_units():
+    assert parse_rate("500K") == 500 * 1024
+    assert parse_rate("2M") == 2 * 1024 ** 2
+    assert parse_rate("1.5MB/s") == int(1.5 * 1024 ** 2)
+    assert parse_rate("0") == 0
+
+
+@pytest.mark.parametrize("text", ["fast", "2X", "-1M", ""])
+def test_parse_rate_rejects(text):
+    with pytest.raises(ValueError):
+        parse_rate(text)
+
+
+def test_parse_limit_empty_is_unlimited():
+    assert parse_limit("") == (0, [])
+    assert parse_limit(None) == (0, [])
+
+
+def test_parse_limit_rules_and_default():
+    cap, schedule = parse_limit("09:00-18:00=1M, 8M")
+    assert cap == 8 * 1024 ** 2
+    assert schedule == [(9 * 60, 18 * 60, 1024 ** 2)]
+    assert scheduled_cap(schedule, cap, at(12, 0)) == 1024 ** 2
+    assert scheduled_cap(schedule, cap, at(18, 0)) == cap # The end is exclusive
+
+
+def test_parse_limit_wraps_past_midnight():
+    cap, schedule = parse_limit("22:00-06:00=500K")
+    assert cap == 0
+    assert scheduled_cap(schedule, cap, at(23, 30)) == 500 * 1024
+    assert scheduled_cap(schedule, cap, at(5, 59)) == 500 * 1024
+    assert scheduled_cap(schedule, cap, at(12, 0)) == 0
+
+
+def test_parse_limit_first_matching_rule_wins():
+    _, schedule = parse_limit("08:00-12:00=1M, 10:00-14:00=2M")
+    assert scheduled_cap(schedule, 0, at(11, 0)) == 1024 ** 2
+    assert scheduled_cap(schedule, 0, at(13, 0)) == 2 * 1024 ** 2
+
+
+@pytest.mark.parametrize("text", ["25:00-26:00=1M", "09:75-10:00=1M", "09:00-10:00=lots"])
+def test_parse_limit_rejects_bad_rules(text):
+    with pytest.raises(ValueError):
+        parse_limit(text)
+
+
+def test_hook_charges_what_each_report_adds(monkeypatch):
+    limiter = BandwidthLimiter()
+    channel = limiter.channel()
+    charged = []
+    monkeypatch.setattr(limiter, "consume", lambda channel, nbytes, cancel_event=None: charged.append(nbytes))
+    hook = channel.hook()
+    hook({"status": "downloading", "filename": "a.mp4", "downloaded_bytes": 10 * 1024 ** 2}) # Resumed: the .part was fetched before
+    hook({"status": "downloading", "filename": "a.mp4", "downloaded_bytes": 10 * 1024 ** 2 + 500})
+    hook({"status": "downloading", "filename": "a.mp4", "downloaded_bytes": 10 * 1024 ** 2 + 200}) # Out of order
+    hook({"status": "downloading", "filename": "b.mp4", "downloaded_bytes": 300})
+    hook({"status": "downloading", "filename": "b.mp4", "downloaded_bytes": 1300})
+    hook({"status": "finished", "filename": "a.mp4", "downloaded_bytes": 11 * 1024 ** 2})
+    assert charged == [500, 1000]
+
+
+def transfer(channel, chunk, until):
+    """Consumes `chunk`-byte blocks through `channel` until the `until` deadline; returns the bytes granted."""
+    granted = 0
+    while time.monotonic() < until:
+        channel.consume(chunk)
+        granted += chunk
+    return granted
+
+
+def test_consume_holds_the_cap():
+    limiter = BandwidthLimiter(cap=MB)
+    channel = limiter.channel()
+    start = time.monotonic()
+    for _ in range(48): channel.consume(32 * 1024) # 1.5 MB
+    assert 1.2 < time.monotonic() - start < 2.0
+
+
+def test_consume_splits_the_cap_by_weight():
+    limiter = BandwidthLimiter(cap=2 * MB)
+    channels = [limiter.channel(PRIORITY_WEIGHTS["High"]), limiter.channel(PRIORITY_WEIGHTS["Low"])]
+    until = time.monotonic() + 1.5
+    with ThreadPoolExecutor(2) as pool: high, low = pool.map(lambda channel: transfer(channel, 16 * 1024, until), channels)
+    assert 1.5 * MB < high + low < 4.5 * MB
+    assert 4 < high / low < 12 # Weights 8 and 1
+
+
+def test_consume_follows_a_cap_change():
+    limiter = BandwidthLimiter(cap=64 * 1024)
+    channel = limiter.channel()
+    threading.Timer(0.3, limiter.configure, args=(64 * MB,)).start()
+    start = time.monotonic()
+    for _ in range(16): channel.consume(64 * 1024) # 16 s at the first cap
+    assert time.monotonic() - start < 1.5
+
+
+def test_one_huge_request_does_not_stall_the_others():
+    limiter = BandwidthLimiter(cap=100 * 1024)
+    limiter.channel(PRIORITY_WEIGHTS["Low"]).consume(10 * MB)
+    start = time.monotonic()
+    limiter.channel(PRIORITY_WEIGHTS["High"]).consume(1024)
+    assert time.monotonic() - start < MAX_DEBT_SECONDS + 0.5
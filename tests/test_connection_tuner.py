@@ -0,0 +1,59 @@
+from connection_tuner import ConnectionTuner, MIN_SAMPLE_BYTES, SAMPLES_PER_STEP, REPROBE_AFTER
+
+MB = 1024 ** 2
+
+
+def run(tuner, rate, downloads):
+    """Feeds `downloads` samples from a link where `rate(connections)` is the throughput; returns the settings used."""
+    used = []
+    for _ in range(downloads):
+        connections = tuner.connections
+        used.append(connections)
+        tuner.record(connections, 20 * MB, 20 * MB / rate(connections))
+    return used
+
+
+def test_climbs_while_more_connections_pay_off():
+    tuner = ConnectionTuner(initial=1)
+    used = run(tuner, lambda n: min(n, 6) * MB, 10 * SAMPLES_PER_STEP)
+    assert used[::SAMPLES_PER_STEP][:6] == [1, 2, 3, 4, 6, 8]
+
+
+def test_backs_off_when_a_step_gains_too_little():
+    tuner = ConnectionTuner(initial=1)
+    used = run(tuner, lambda n: min(n, 6) * MB, 6 * SAMPLES_PER_STEP) # 8 connections are no faster than 6
+    assert used[-SAMPLES_PER_STEP:] == [8] * SAMPLES_PER_STEP
+    assert tuner.connections == 6
+    run(tuner, lambda n: min(n, 6) * MB, (REPROBE_AFTER - 1) * SAMPLES_PER_STEP)
+    assert tuner.connections == 6 # Settled
+
+
+def test_backs_off_when_more_connections_are_slower():
+    tuner = ConnectionTuner(initial=4)
+    run(tuner, lambda n: 4 * MB if n <= 4 else 2 * MB, 2 * SAMPLES_PER_STEP)
+    assert tuner.connections == 4
+    assert tuner.estimates()[6] < tuner.estimates()[4]
+
+
+def test_stays_within_bounds():
+    tuner = ConnectionTuner(initial=16, maximum=8)
+    assert tuner.connections == 8
+    run(tuner, lambda n: n * MB, 10 * SAMPLES_PER_STEP)
+    assert max(tuner.estimates()) <= 8
+
+
+def test_small_downloads_are_ignored():
+    tuner = ConnectionTuner(initial=4)
+    for _ in range(2 * SAMPLES_PER_STEP): tuner.record(4, MIN_SAMPLE_BYTES - 1, 0.1)
+    assert (tuner.connections, tuner.estimates()) == (4, {})
+
+
+def test_hook_records_fragmented_downloads_only():
+    tuner = ConnectionTuner(initial=4)
+    hook = tuner.hook(4)
+    hook({"status": "downloading", "filename": "plain.mp4", "downloaded_bytes": MB})
+    hook({"status": "finished", "filename": "plain.mp4", "total_bytes": 8 * MB, "elapsed": 1.0})
+    assert tuner.estimates() == {}
+    hook({"status": "downloading", "filename": "dash.mp4", "fragment_index": 1, "fragment_count": 10})
+    hook({"status": "finished", "filename": "dash.mp4", "total_bytes": 8 * MB, "elapsed": 2.0})
+    assert tuner.estimates() == {4: 4 * MB}
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import disk_space
+from disk_space import DiskBudget, NotEnoughSpace, same_filesystem, preallocate
+
+MB = disk_space.MB
+
+
+@pytest.fixture
+def free(monkeypatch):
+    space = {"free": 1000 * MB}
+    monkeypatch.setattr(disk_space, "free_space", lambda path: space["free"])
+    return space
+
+
+def test_reserve_within_free_space(tmp_path, free):
+    budget = DiskBudget(min_free=100 * MB)
+    claim = budget.claim()
+    claim.reserve(str(tmp_path / "a.mp4"), 900 * MB)
+    assert budget.claimed(str(tmp_path)) == 900 * MB
+
+
+def test_reserve_keeps_min_free(tmp_path, free):
+    with pytest.raises(NotEnoughSpace, match="keeping 100 MB spare"):
+        DiskBudget(min_free=100 * MB).claim().reserve(str(tmp_path / "a.mp4"), 901 * MB, "A")
+
+
+def test_running_claims_are_counted(tmp_path, free):
+    budget = DiskBudget(min_free=0)
+    budget.claim().reserve(str(tmp_path / "a.mp4"), 600 * MB)
+    with pytest.raises(NotEnoughSpace, match="needs 500 MB, 400 MB free"):
+        budget.claim().reserve(str(tmp_path / "b.mp4"), 500 * MB, "B")
+
+
+def test_written_bytes_stop_being_claimed(tmp_path, free):
+    budget = DiskBudget(min_free=0)
+    claim = budget.claim()
+    claim.reserve(str(tmp_path / "a.mp4"), 600 * MB)
+    claim.progress_hook({"status": "downloading", "filename": "a.mp4", "downloaded_bytes": 50 * MB}) # Resumed: the baseline
+    claim.progress_hook({"status": "downloading", "filename": "a.mp4", "downloaded_bytes": 250 * MB})
+    claim.progress_hook({"status": "downloading", "filename": "a.mp4", "downloaded_bytes": 200 * MB}) # Out of order
+    assert claim.remaining == 400 * MB
+    free["free"] -= 200 * MB # Free space counts what was written
+    budget.claim().reserve(str(tmp_path / "b.mp4"), 400 * MB)
+
+
+def test_release_frees_the_claim(tmp_path, free):
+    budget = DiskBudget(min_free=0)
+    claim = budget.claim()
+    claim.reserve(str(tmp_path / "a.mp4"), 600 * MB)
+    claim.release()
+    assert budget.claimed(str(tmp_path)) == 0
+    budget.claim().reserve(str(tmp_path / "b.mp4"), 1000 * MB)
+
+
+def test_same_filesystem_for_paths_not_yet_created(tmp_path):
+    assert same_filesystem(str(tmp_path / "new" / "a.mp4"), str(tmp_path))
+
+
+def test_preallocate_sets_the_size(tmp_path):
+    with open(tmp_path / "a.bin", "wb") as f: preallocate(f, 3 * MB)
+    assert os.path.getsize(tmp_path / "a.bin") == 3 * MB
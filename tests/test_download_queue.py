@@ -0,0 +1,185 @@
+import threading
+import time
+
+from download_queue import DownloadQueue, DownloadJob, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED, JOB_PAUSED
+
+TIMEOUT = 5
+
+
+def wait_for(condition):
+    for _ in range(TIMEOUT * 100):
+        if condition(): return
+        time.sleep(0.01)
+    raise AssertionError("Timed out")
+
+
+class Worker:
+    """Records the jobs it runs; jobs whose url starts with "block" wait for `release` (or their cancel_event).
+
+    "detach" jobs do the same after calling job.transfers_done(), like a job that only has conversions left.
+    """
+
+    def __init__(self):
+        self.ran = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.running = self.most = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, job):
+        with self._lock:
+            self.ran.append(job.url)
+            self.running += 1
+            self.most = max(self.most, self.running)
+        try:
+            if job.url.startswith("fail"): raise RuntimeError("boom")
+            if job.url.startswith("detach"): job.transfers_done()
+            if job.url.startswith(("block", "detach")):
+                self.started.set()
+                while not self.release.is_set() and not job.cancel_event.is_set(): job.cancel_event.wait(0.01)
+        finally:
+            with self._lock: self.running -= 1
+
+
+def test_runs_every_job():
+    worker, updates = Worker(), []
+    queue = DownloadQueue(worker, max_workers=2, on_update=updates.append)
+    jobs = [queue.submit(DownloadJob(f"job{i}", "/out")) for i in range(5)]
+    wait_for(lambda: not queue.is_busy())
+    assert all(job.state == JOB_DONE and job.progress == 100.0 for job in jobs)
+    assert sorted(worker.ran) == [f"job{i}" for i in range(5)]
+    assert set(updates) == set(jobs)
+
+
+def test_max_workers_bounds_concurrency():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=2)
+    for i in range(4): queue.submit(DownloadJob(f"block{i}", "/out"))
+    assert worker.started.wait(TIMEOUT)
+    time.sleep(0.1)
+    assert worker.running == 2
+    worker.release.set()
+    wait_for(lambda: not queue.is_busy())
+    assert worker.most == 2
+
+
+def test_failing_worker_fails_the_job():
+    queue = DownloadQueue(Worker(), max_workers=1)
+    job = queue.submit(DownloadJob("fail", "/out"))
+    wait_for(lambda: job.finished)
+    assert (job.state, job.error, job.status_text) == (JOB_FAILED, "boom", "Failed: boom")
+
+
+def test_cancel_pending_and_running_jobs():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    running = queue.submit(DownloadJob("block", "/out"))
+    assert worker.started.wait(TIMEOUT)
+    pending = queue.submit(DownloadJob("later", "/out"))
+    queue.cancel(pending)
+    assert (pending.state, pending.status_text) == (JOB_CANCELLED, "Cancelled before start.")
+    queue.cancel(running)
+    wait_for(lambda: running.finished)
+    assert (running.state, running.status_text) == (JOB_CANCELLED, "Cancelled by user.")
+    assert worker.ran == ["block"]
+
+
+def test_pending_jobs_start_by_priority():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    queue.submit(DownloadJob("block", "/out"))
+    assert worker.started.wait(TIMEOUT)
+    for url, priority in (("low", "Low"), ("normal", "Normal"), ("high", "High"), ("normal2", "Normal")):
+        queue.submit(DownloadJob(url, "/out", priority=priority))
+    worker.release.set()
+    wait_for(lambda: not queue.is_busy())
+    assert worker.ran == ["block", "high", "normal", "normal2", "low"]
+
+
+def test_unknown_priority_is_normal():
+    assert DownloadJob("x", "/out", priority="Urgent").priority == "Normal"
+
+
+def test_job_with_only_local_work_left_frees_its_slot():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    converting = queue.submit(DownloadJob("detach", "/out"))
+    assert worker.started.wait(TIMEOUT)
+    following = [queue.submit(DownloadJob(f"next{i}", "/out")) for i in range(2)]
+    wait_for(lambda: all(job.state == JOB_DONE for job in following))
+    assert converting.state == JOB_RUNNING and queue.is_busy()
+    worker.release.set()
+    wait_for(lambda: not queue.is_busy())
+    assert converting.state == JOB_DONE
+    assert worker.most == 2
+
+
+def test_detached_jobs_do_not_add_workers():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    for i in range(2): queue.submit(DownloadJob(f"detach{i}", "/out"))
+    queue.submit(DownloadJob("block", "/out"))
+    wait_for(lambda: worker.running == 3)
+    time.sleep(0.1)
+    assert worker.ran == ["detach0", "detach1", "block"] # One transferring job at a time
+    worker.release.set()
+    wait_for(lambda: not queue.is_busy())
+
+
+def test_pause_and_resume_pending_job():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    queue.submit(DownloadJob("block", "/out"))
+    assert worker.started.wait(TIMEOUT)
+    job = queue.submit(DownloadJob("later", "/out"))
+    queue.pause(job)
+    assert (job.state, job.status_text) == (JOB_PAUSED, "Paused before start.")
+    worker.release.set()
+    wait_for(lambda: not queue.is_busy())
+    assert worker.ran == ["block"]
+
+    queue.resume(job)
+    wait_for(lambda: job.state == JOB_DONE)
+    assert worker.ran == ["block", "later"]
+
+
+def test_pause_and_resume_running_job():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    job = queue.submit(DownloadJob("block", "/out"))
+    assert worker.started.wait(TIMEOUT)
+    queue.pause(job)
+    wait_for(lambda: job.state == JOB_PAUSED)
+    assert not queue.is_busy()
+
+    worker.release.set()
+    queue.resume(job)
+    assert not job.cancel_event.is_set() and not job.pause_requested
+    wait_for(lambda: job.state == JOB_DONE)
+    assert worker.ran == ["block", "block"]
+
+
+def test_cancel_paused_job():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    job = queue.submit(DownloadJob("block", "/out"))
+    assert worker.started.wait(TIMEOUT)
+    queue.pause(job)
+    wait_for(lambda: job.state == JOB_PAUSED)
+    queue.cancel(job)
+    assert (job.state, job.status_text) == (JOB_CANCELLED, "Cancelled while paused.")
+    queue.resume(job)
+    assert job.state == JOB_CANCELLED
+
+
+def test_submitted_paused_job_waits_for_resume():
+    worker = Worker()
+    queue = DownloadQueue(worker, max_workers=1)
+    job = DownloadJob("restored", "/out")
+    job.state = JOB_PAUSED
+    queue.submit(job)
+    assert not queue.is_busy()
+    assert job in queue.jobs()
+    queue.resume(job)
+    wait_for(lambda: job.state == JOB_DONE)
+    assert worker.ran == ["restored"]
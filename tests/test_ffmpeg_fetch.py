@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+import ffmpeg_fetch
+from ffmpeg_fetch import SegmentedDownload, FetchCancelled, ChecksumMismatch, ChecksumUnavailable, fetch_sha256
+from local_http import LocalServer
+
+SIZE = 2 * 1024 * 1024
+DATA = os.urandom(SIZE)
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    # Four ranges of a 2 MB file, saving progress every 64 KB
+    monkeypatch.setattr(ffmpeg_fetch, "MIN_SEGMENT_SIZE", SIZE // 4)
+    monkeypatch.setattr(ffmpeg_fetch, "STATE_SAVE_INTERVAL", 64 * 1024)
+    monkeypatch.setattr(ffmpeg_fetch, "READ_SIZE", 16 * 1024)
+
+
+@pytest.fixture
+def server():
+    server = LocalServer({"/ffmpeg.zip": DATA}, rate_per_conn=4 * 1024 * 1024).start()
+    yield server
+    server.stop()
+
+
+def test_segmented_download(tmp_path, server):
+    dest = str(tmp_path / "ffmpeg.zip")
+    assert SegmentedDownload(server.url("/ffmpeg.zip"), dest, connections=4).run() == dest
+    with open(dest, "rb") as f: assert f.read() == DATA
+    assert server.range_requests >= 4
+    assert sorted(os.listdir(tmp_path)) == ["ffmpeg.zip"]
+
+
+def test_cancel_keeps_the_partial_download_and_resumes(tmp_path, server):
+    dest = str(tmp_path / "ffmpeg.zip")
+    cancel = threading.Event()
+
+    def progress(done, total):
+        if done >= SIZE // 3: cancel.set()
+
+    with pytest.raises(FetchCancelled):
+        SegmentedDownload(server.url("/ffmpeg.zip"), dest, connections=4, progress=progress, cancel_event=cancel).run()
+    assert not os.path.exists(dest)
+    assert os.path.exists(dest + ".part") and os.path.exists(dest + ".part.json")
+
+    server.reset_counters()
+    download = SegmentedDownload(server.url("/ffmpeg.zip"), dest, connections=4)
+    download.run()
+    with open(dest, "rb") as f: assert f.read() == DATA
+    assert download.resumed_bytes > 0
+    assert server.bytes_sent < SIZE # Not fetched again from the start
+    assert sorted(os.listdir(tmp_path)) == ["ffmpeg.zip"]
+
+
+def test_changed_file_starts_over(tmp_path, server):
+    dest = str(tmp_path / "ffmpeg.zip")
+    cancel = threading.Event()
+    with pytest.raises(FetchCancelled):
+        SegmentedDownload(server.url("/ffmpeg.zip"), dest, progress=lambda done, total: done > SIZE // 3 and cancel.set(), cancel_event=cancel).run()
+
+    new_data = os.urandom(SIZE)
+    server.files["/ffmpeg.zip"], server.etags["/ffmpeg.zip"] = new_data, '"new"'
+    download = SegmentedDownload(server.url("/ffmpeg.zip"), dest)
+    download.run()
+    assert download.resumed_bytes == 0
+    with open(dest, "rb") as f: assert f.read() == new_data
+
+
+def test_checksum(tmp_path, server):
+    dest = str(tmp_path / "ffmpeg.zip")
+    SegmentedDownload(server.url("/ffmpeg.zip"), dest, sha256=hashlib.sha256(DATA).hexdigest().upper()).run()
+    with open(dest, "rb") as f: assert f.read() == DATA
+
+
+def test_checksum_mismatch_discards_the_download(tmp_path, server):
+    dest = str(tmp_path / "ffmpeg.zip")
+    with pytest.raises(ChecksumMismatch):
+        SegmentedDownload(server.url("/ffmpeg.zip"), dest, sha256="0" * 64).run()
+    assert os.listdir(tmp_path) == []
+
+
+def test_server_without_ranges(tmp_path):
+    server = LocalServer({"/ffmpeg.zip": DATA}, ranges=False).start()
+    try:
+        dest = str(tmp_path / "ffmpeg.zip")
+        SegmentedDownload(server.url("/ffmpeg.zip"), dest, connections=4).run()
+        with open(dest, "rb") as f: assert f.read() == DATA
+        assert server.range_requests == 0
+    finally:
+        server.stop()
+
+
+def publish(server, path, data):
+    server.files[path], server.etags[path] = data, f'"{hashlib.md5(data).hexdigest()}"'
+
+
+def test_fetch_sha256(server):
+    digest = hashlib.sha256(DATA).hexdigest()
+    publish(server, "/ffmpeg.zip.sha256", f"{digest.upper()}  ffmpeg.zip\n".encode())
+    assert fetch_sha256(server.url("/ffmpeg.zip.sha256")) == digest
+
+
+@pytest.mark.parametrize("body", [None, b"", b"<html>Not found</html>", b"abc123  ffmpeg.zip"])
+def test_missing_sha256_is_an_error(server, body):
+    if body is not None: publish(server, "/ffmpeg.zip.sha256", body)
+    with pytest.raises(ChecksumUnavailable):
+        fetch_sha256(server.url("/ffmpeg.zip.sha256"))
+
@@ -0,0 +1,118 @@
+import os
+import threading
+
+import pytest
+
+import disk_space
+import downloader_core
+import format_planner
+from disk_space import DiskBudget
+from download_queue import DownloadJob
+from downloader_core import DownloadEngine
+from format_planner import plan_formats, format_size
+from local_http import LocalServer
+from stub_extractor import StubCatalog, register_stub_extractor
+
+MB = 1024 * 1024
+FORMATS = [
+    {"format_id": "18", "ext": "mp4", "height": 360, "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "filesize": 10 * MB},
+    {"format_id": "136", "ext": "mp4", "height": 720, "vcodec": "avc1.4d401f", "acodec": "none", "filesize": 50 * MB},
+    {"format_id": "137", "ext": "mp4", "height": 1080, "vcodec": "avc1.640028", "acodec": "none", "filesize": 100 * MB},
+    {"format_id": "248", "ext": "webm", "height": 1080, "vcodec": "vp9", "acodec": "none", "filesize": 80 * MB},
+    {"format_id": "140", "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 129, "filesize": 5 * MB},
+    {"format_id": "251", "ext": "webm", "vcodec": "none", "acodec": "opus", "abr": 135, "filesize": 4 * MB},
+]
+for fmt in FORMATS: fmt["url"] = f"https://example.com/{fmt['format_id']}"
+
+
+@pytest.mark.parametrize("quality, format_id, size", [
+    ("Best", "137+140", 105 * MB),
+    ("720p", "136+140", 55 * MB),
+    ("360p", "18", 10 * MB),
+])
+def test_video_selection(quality, format_id, size):
+    plan = plan_formats(FORMATS, quality)
+    assert (plan.format_id, plan.size, plan.size_estimated) == (format_id, size, False)
+    assert plan.needs_merge == ("+" in format_id)
+    assert plan.as_dict()["video"]["format_id"] == format_id.split("+")[0]
+
+
+def test_audio_selection():
+    plan = plan_formats(FORMATS, "M4A", "Audio")
+    assert (plan.format_id, plan.needs_merge, plan.video) == ("140", False, None)
+
+
+def test_does_not_change_the_callers_formats():
+    formats = [dict(fmt) for fmt in FORMATS]
+    plan_formats(formats, "720p")
+    assert formats == FORMATS
+
+
+def test_nothing_matches():
+    with pytest.raises(ValueError, match="not available"):
+        plan_formats([fmt for fmt in FORMATS if fmt.get("height", 0) > 360], "360p")
+    with pytest.raises(ValueError):
+        plan_formats([], "Best")
+    with pytest.raises(ValueError):
+        plan_formats([{"format_id": "x", "ext": "mp4"}], "Best") # No URL to download from
+
+
+def test_size_estimates():
+    assert format_size({"filesize": 1000}) == (1000, False)
+    assert format_size({"filesize_approx": 1000}) == (1000, True)
+    assert format_size({"tbr": 800}, duration=10) == (1_000_000, True)
+    assert format_size({"tbr": 800}) == (None, True)
+    plan = plan_formats([dict(FORMATS[0], filesize=None, tbr=800)], "Best", duration=10)
+    assert (plan.size, plan.size_estimated) == (1_000_000, True)
+
+
+def test_one_planner_per_thread_and_format():
+    ours = format_planner._ydl("best")
+    assert format_planner._ydl("best") is ours
+    assert format_planner._ydl("bestaudio") is not ours
+    theirs = []
+    thread = threading.Thread(target=lambda: theirs.append(format_planner._ydl("best")))
+    thread.start()
+    thread.join()
+    assert theirs[0] is not ours
+
+
+@pytest.fixture
+def stub():
+    register_stub_extractor()
+    catalog = StubCatalog()
+    catalog.add_video("v1", size=3 * MB)
+    catalog.add_video("v2", size=5 * MB)
+    catalog.add_playlist("p1", ["v1", "v2"])
+    server = LocalServer(catalog.files(), content_types=catalog.content_types).start()
+    yield server
+    server.stop()
+
+
+def test_dry_run_plans_without_downloading(tmp_path, stub, monkeypatch):
+    monkeypatch.setattr(downloader_core, "free_space", lambda path: 100 * MB)
+    engine = DownloadEngine(extra_opts={"quiet": True, "no_warnings": True})
+    plan = engine.dry_run(DownloadJob(stub.url("/stub/playlist/p1"), str(tmp_path), "Playlist"))
+    assert [(item["id"], item["format_id"], item["size"]) for item in plan["items"]] == [("v1", "mp4", 3 * MB), ("v2", "mp4", 5 * MB)]
+    assert (plan["total_bytes"], plan["needed_bytes"], plan["failed"], plan["fits"]) == (8 * MB, 8 * MB, 0, True)
+    assert stub.bytes_sent < MB # Listing and descriptions only, no media
+    assert os.listdir(tmp_path) == []
+
+
+def test_dry_run_reports_when_it_does_not_fit(tmp_path, stub, monkeypatch):
+    monkeypatch.setattr(downloader_core, "free_space", lambda path: 4 * MB)
+    engine = DownloadEngine(extra_opts={"quiet": True, "no_warnings": True})
+    plan = engine.dry_run(DownloadJob(stub.url("/stub/playlist/p1"), str(tmp_path), "Playlist"))
+    assert (plan["free_bytes"], plan["fits"]) == (4 * MB, False)
+    single = engine.dry_run(DownloadJob(stub.url("/stub/video/v1"), str(tmp_path), "Video"))
+    assert (single["total_bytes"], single["fits"]) == (3 * MB, True)
+
+
+def test_dry_run_counts_what_running_downloads_claim(tmp_path, stub, monkeypatch):
+    monkeypatch.setattr(downloader_core, "free_space", lambda path: 10 * MB)
+    monkeypatch.setattr(disk_space, "free_space", lambda path: 10 * MB)
+    disk = DiskBudget(min_free=0)
+    disk.claim().reserve(str(tmp_path), 6 * MB)
+    engine = DownloadEngine(extra_opts={"quiet": True, "no_warnings": True}, disk=disk)
+    plan = engine.dry_run(DownloadJob(stub.url("/stub/video/v2"), str(tmp_path), "Video"))
+    assert (plan["free_bytes"], plan["fits"]) == (4 * MB, False)
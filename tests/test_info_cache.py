@@ -0,0 +1,102 @@
+import gzip
+import os
+import types
+
+import pytest
+
+import info_cache
+from info_cache import InfoCache, url_expiry, EXPIRY_MARGIN
+
+INFO = {"id": "BaW_jenozKc", "title": "Test video", "formats": [{"format_id": "18", "url": "https://example.com/v.mp4"}]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_800_000_000.0]
+    monkeypatch.setattr(info_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_round_trip(tmp_path, clock):
+    cache = InfoCache(str(tmp_path))
+    cache.put("Youtube", "BaW_jenozKc", INFO)
+    assert cache.get("Youtube", "BaW_jenozKc") == INFO
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_keyed_by_extractor_and_id(tmp_path, clock):
+    cache = InfoCache(str(tmp_path))
+    cache.put("Youtube", "BaW_jenozKc", INFO)
+    assert cache.get("Vimeo", "BaW_jenozKc") is None
+    assert cache.get("Youtube", "other") is None
+    cache.put("Vimeo", "BaW_jenozKc", dict(INFO, title="Other site"))
+    assert cache.get("Youtube", "BaW_jenozKc")["title"] == "Test video"
+    assert cache.get("Vimeo", "BaW_jenozKc")["title"] == "Other site"
+
+
+def test_expires_after_ttl(tmp_path, clock):
+    cache = InfoCache(str(tmp_path), ttl=60)
+    cache.put("Youtube", "BaW_jenozKc", INFO)
+    clock[0] += 59
+    assert cache.get("Youtube", "BaW_jenozKc") == INFO
+    clock[0] += 2
+    assert cache.get("Youtube", "BaW_jenozKc") is None
+    assert os.listdir(tmp_path) == [] # Stale entries are removed
+
+
+def test_expires_with_its_urls(tmp_path, clock):
+    expire = int(clock[0]) + EXPIRY_MARGIN + 600
+    info = dict(INFO, formats=[{"format_id": "18", "url": f"https://r1.googlevideo.com/videoplayback?expire={expire}&id=1"}])
+    assert url_expiry(info) == expire
+    cache = InfoCache(str(tmp_path))
+    cache.put("Youtube", "BaW_jenozKc", info)
+    assert cache.get("Youtube", "BaW_jenozKc") == info
+    clock[0] += 601
+    assert cache.get("Youtube", "BaW_jenozKc") is None
+
+
+def test_urls_about_to_expire_are_not_stored(tmp_path, clock):
+    info = dict(INFO, formats=[{"format_id": "18", "url": f"https://r1.googlevideo.com/videoplayback?expire={int(clock[0]) + 60}"}])
+    cache = InfoCache(str(tmp_path))
+    cache.put("Youtube", "BaW_jenozKc", info)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("content", [b"", b"not gzip", gzip.compress(b"{not json"), gzip.compress(b'{"key": ["Youtube", "other"], "info": {}}')])
+def test_corrupt_entry_is_a_miss(tmp_path, clock, content):
+    cache = InfoCache(str(tmp_path))
+    cache.put("Youtube", "BaW_jenozKc", INFO)
+    with open(cache._path("Youtube", "BaW_jenozKc"), "wb") as f: f.write(content)
+    assert cache.get("Youtube", "BaW_jenozKc") is None
+    assert cache.misses == 1
+    cache.put("Youtube", "BaW_jenozKc", INFO)
+    assert cache.get("Youtube", "BaW_jenozKc") == INFO
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = InfoCache(str(tmp_path))
+    for i in range(3):
+        cache.put("Youtube", f"video{i}", dict(INFO, title="x" * 5000, id=f"video{i}"))
+        os.utime(cache._path("Youtube", f"video{i}"), (i, i))
+    cache.max_bytes = sum(entry.stat().st_size for entry in os.scandir(tmp_path)) - 1
+    cache.evict()
+    assert cache.get("Youtube", "video0") is None
+    assert cache.get("Youtube", "video2") is not None
+
+
+def test_scans_only_when_over_the_limit(tmp_path, clock, monkeypatch):
+    cache = InfoCache(str(tmp_path))
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(info_cache.os, "scandir", lambda path: scans.append(path) or scandir(path))
+    for i in range(5): cache.put("Youtube", f"video{i}", dict(INFO, id=f"video{i}"))
+    assert len(scans) == 1 # Counted once, then tracked
+    cache.put("Youtube", "video0", dict(INFO, id="video0")) # Replacing an entry does not grow the total
+    cache.invalidate("Youtube", "video1")
+    assert cache._size == sum(entry.stat().st_size for entry in scandir(tmp_path))
+
+    cache.max_bytes = cache._size + 1
+    cache.put("Youtube", "big", dict(INFO, title="x" * 5000))
+    assert len(scans) == 2
+    assert cache._size <= cache.max_bytes
+    assert cache.get("Youtube", "big") is not None
@@ -0,0 +1,66 @@
+import sqlite3
+
+from download_queue import DownloadJob, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_PAUSED
+from job_journal import JobJournal
+
+
+def job(url, state, **options):
+    job = DownloadJob(url, "/downloads", **options)
+    job.state, job.title = state, url.rsplit("/", 1)[-1]
+    return job
+
+
+def test_restores_unfinished_jobs_in_order(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    journal = JobJournal(path)
+    queued = job("https://example.com/a", JOB_QUEUED, download_type="Audio", quality="192 kbps", playlist_workers=2, priority="High")
+    running = job("https://example.com/b", JOB_RUNNING)
+    done = job("https://example.com/c", JOB_DONE)
+    for j in (queued, running, done): journal.record(j)
+    journal.close()
+
+    restored = JobJournal(path).restore()
+    assert [j.url for j in restored] == [queued.url, running.url]
+    first = restored[0]
+    assert (first.download_type, first.quality, first.playlist_workers, first.priority, first.title) == ("Audio", "192 kbps", 2, "High", "a")
+    assert all(j.state == JOB_QUEUED for j in restored) # Running jobs start over, continuing their partial files
+
+
+def test_paused_jobs_come_back_paused(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    journal = JobJournal(path)
+    paused = job("https://example.com/a", JOB_PAUSED)
+    paused.progress = 40.0
+    journal.record(paused)
+    journal.close()
+
+    [restored] = JobJournal(path).restore()
+    assert restored.state == JOB_PAUSED
+    assert restored.progress == 40.0
+    assert "last session" in restored.status_text
+
+
+def test_progress_alone_is_not_written(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    journal = JobJournal(path)
+    running = job("https://example.com/a", JOB_RUNNING)
+    journal.record(running)
+    running.progress = 70.0
+    journal.record(running)
+    with sqlite3.connect(path) as db: assert db.execute("SELECT progress FROM jobs").fetchall() == [(0.0,)]
+    journal.close()
+
+
+def test_restored_jobs_update_their_own_row(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    journal = JobJournal(path)
+    journal.record(job("https://example.com/a", JOB_QUEUED))
+    journal.close()
+
+    journal = JobJournal(path)
+    [restored] = journal.restore()
+    restored.state = JOB_DONE
+    journal.record(restored)
+    assert journal.restore() == []
+    with sqlite3.connect(path) as db: assert db.execute("SELECT COUNT(*) FROM jobs").fetchone() == (1,)
+    journal.close()
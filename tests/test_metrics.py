@@ -0,0 +1,139 @@
+import json
+import types
+
+import pytest
+
+import metrics
+from download_queue import DownloadJob
+from metrics import ItemTimer, JobMetrics, MetricsRegistry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metrics, "time", types.SimpleNamespace(time=lambda: now[0], monotonic=lambda: now[0]))
+    return now
+
+
+def downloading(filename, done):
+    return {"status": "downloading", "filename": filename, "downloaded_bytes": done}
+
+
+def test_item_timer_splits_the_time_into_phases(clock):
+    job_metrics = JobMetrics()
+    timer = ItemTimer(job_metrics)
+    clock[0] += 2
+    timer.mark("select", only_from=("extract",))
+    clock[0] += 1
+    timer.progress_hook(downloading("v.f137.mp4", 0))
+    clock[0] += 10
+    timer.postprocessor_hook({"status": "started", "postprocessor": "Merger"})
+    clock[0] += 3
+    timer.postprocessor_hook({"status": "finished", "postprocessor": "Merger"})
+    clock[0] += 1
+    timer.mark("select", only_from=("extract",)) # Not from finalize
+    timer.close()
+    assert job_metrics.phases == {"extract": 2, "select": 1, "transfer": 10, "merge": 3, "postprocess": 0, "finalize": 1}
+    assert job_metrics.items == 1
+
+
+def test_item_timer_ignores_our_own_postprocessors(clock):
+    timer = ItemTimer(JobMetrics(), phase="transfer")
+    timer.postprocessor_hook({"status": "started", "postprocessor": "DiskAdmission"})
+    assert timer.phase == "transfer"
+    timer.postprocessor_hook({"status": "started", "postprocessor": "FFmpegExtractAudio"})
+    assert timer.phase == "postprocess"
+
+
+def test_item_timer_counts_each_byte_once(clock):
+    job_metrics = JobMetrics()
+    timer = ItemTimer(job_metrics)
+    for report in (downloading("a", 0), downloading("b", 0), downloading("a", 300), downloading("b", 50), downloading("a", 200), {"status": "finished", "filename": "a", "downloaded_bytes": 300}):
+        timer.progress_hook(report)
+    assert job_metrics.bytes == 350
+
+
+def test_item_timer_does_not_count_resumed_bytes(clock):
+    job_metrics = JobMetrics()
+    timer = ItemTimer(job_metrics)
+    timer.progress_hook(downloading("a", 90 * 1024 ** 2)) # The .part left by a pause
+    clock[0] += 2
+    timer.progress_hook(downloading("a", 92 * 1024 ** 2))
+    timer.close()
+    assert job_metrics.bytes == 2 * 1024 ** 2
+    assert job_metrics.as_dict()["avg_rate"] == 1024 ** 2
+
+
+def test_peak_rate_needs_half_a_window(clock):
+    job_metrics = JobMetrics()
+    job_metrics.add_bytes(1000)
+    clock[0] += 0.25
+    job_metrics.add_bytes(1000)
+    assert job_metrics.peak_rate == 0
+    clock[0] += 0.25
+    job_metrics.add_bytes(1000)
+    assert job_metrics.peak_rate == 4000
+
+
+def finished_job(nbytes, seconds, clock):
+    job = DownloadJob("https://example.com/v", "/out")
+    job.metrics = JobMetrics()
+    job.metrics.add_phase("transfer", seconds)
+    job.metrics.add_bytes(nbytes)
+    job.metrics.add_retry()
+    clock[0] += seconds
+    job.metrics.finish()
+    return job
+
+
+def test_registry_adds_up_finished_jobs(tmp_path, clock):
+    registry = MetricsRegistry(str(tmp_path / "metrics.jsonl"))
+    first, second, third = (finished_job(nbytes, 2, clock) for nbytes in (1000, 3000, 500))
+    for job in (first, second, third): registry.start(job)
+    registry.record(first, "done")
+    registry.record(second, "done")
+    assert (registry.jobs, registry.bytes, registry.retries, registry.phases["transfer"]) == ({"done": 2}, 4000, 2, 4)
+    assert list(registry.running) == [third.id]
+    registry.record(third, "failed")
+    with open(tmp_path / "metrics.jsonl", encoding="utf-8") as f: lines = [json.loads(line) for line in f]
+    assert [(line["id"], line["outcome"], line["bytes"], line["avg_rate"]) for line in lines] == [
+        (first.id, "done", 1000, 500), (second.id, "done", 3000, 1500), (third.id, "failed", 500, 250)]
+
+
+def test_prometheus_text(clock):
+    registry = MetricsRegistry()
+    registry.record(finished_job(1000, 2, clock), "done")
+    running = finished_job(500, 1, clock)
+    registry.start(running)
+    text = registry.prometheus()
+    assert text.endswith("\n")
+    samples = dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+    assert samples['ytdl_jobs_total{outcome="done"}'] == "1"
+    assert samples['ytdl_phase_seconds_total{phase="transfer"}'] == "2.000"
+    assert samples["ytdl_bytes_total"] == "1500" # Running jobs count too
+    assert samples["ytdl_retries_total"] == "2"
+    assert samples["ytdl_running_jobs"] == "1"
+    for name in ("ytdl_jobs_total", "ytdl_phase_seconds_total", "ytdl_bytes_total", "ytdl_retries_total", "ytdl_peak_rate_bytes", "ytdl_running_jobs"):
+        assert f"# TYPE {name} " in text
+
+
+def test_downshifted_item_counts_once(clock, monkeypatch):
+    from adaptive_quality import Downshift
+    from downloader_core import DownloadEngine
+    engine = DownloadEngine()
+    job = DownloadJob("https://example.com/v", "/out")
+    job.metrics = JobMetrics()
+    qualities = []
+
+    def run(job, ydl_opts, url, item_key, timer, claim, quality):
+        qualities.append(quality)
+        timer.progress_hook(downloading(f"v.{quality}.mp4", 0))
+        timer.progress_hook(downloading(f"v.{quality}.mp4", 1000))
+        clock[0] += 4
+        if len(qualities) == 1: raise Downshift("720p", [])
+        return True
+    monkeypatch.setattr(engine, "_run_timed_ydl", run)
+    assert engine._run_ydl(job, {}, job.url) is True
+    assert qualities == ["Best", "720p"]
+    assert (job.metrics.items, job.metrics.retries, job.metrics.bytes) == (1, 1, 2000)
+    assert job.metrics.phases["transfer"] == 8
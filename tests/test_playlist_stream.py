@@ -0,0 +1,120 @@
+import os
+
+import pytest
+from yt_dlp.utils import InAdvancePagedList, OnDemandPagedList
+
+from download_queue import DownloadJob
+from downloader_core import DownloadEngine
+from local_http import LocalServer
+from playlist_stream import PlaylistStream
+from stub_extractor import StubCatalog, register_stub_extractor
+
+
+class Pages:
+    """A paged listing of `pages` pages of `size` entries that records which pages were fetched."""
+
+    def __init__(self, pages, size=3):
+        self.pages, self.size, self.fetched = pages, size, []
+
+    def __call__(self, number):
+        self.fetched.append(number)
+        if number >= self.pages: return [] # Past the end, as sites answer
+        return [{"_type": "url", "id": f"{number}-{i}", "url": f"https://example.com/{number}-{i}"} for i in range(self.size)]
+
+
+def stream_of(entries):
+    stream = PlaylistStream("https://example.com/playlist")
+    stream._entries = stream._flatten(entries)
+    return stream
+
+
+def take(stream, count):
+    return [next(stream)[1]["id"] for _ in range(count)]
+
+
+def test_on_demand_pages_are_fetched_as_consumed():
+    pages = Pages(4)
+    stream = stream_of(OnDemandPagedList(pages, pages.size))
+    assert pages.fetched == []
+    assert take(stream, 1) == ["0-0"]
+    assert pages.fetched == [0]
+    take(stream, 2)
+    assert pages.fetched == [0]
+    assert take(stream, 1) == ["1-0"]
+    assert pages.fetched == [0, 1]
+
+
+def test_short_last_page_ends_the_listing():
+    fetched = []
+
+    def page(number):
+        fetched.append(number)
+        return [{"_type": "url", "id": f"{number}-{i}"} for i in range(3 if number == 0 else 1)]
+
+    stream = stream_of(OnDemandPagedList(page, 3))
+    assert [entry["id"] for _, entry in stream] == ["0-0", "0-1", "0-2", "1-0"]
+    assert fetched == [0, 1]
+
+
+def test_in_advance_pages_are_fetched_as_consumed():
+    pages = Pages(4)
+    stream = stream_of(InAdvancePagedList(pages, pages.pages, pages.size))
+    take(stream, 4)
+    assert pages.fetched == [0, 1]
+    assert stream.count is None
+    assert len(list(stream)) == 8
+    assert pages.fetched == [0, 1, 2, 3]
+    assert (stream.listed, stream.count) == (12, 12)
+
+
+def test_nested_playlists_are_walked_in_place():
+    inner = Pages(3, size=2)
+    entries = [{"_type": "url", "id": "first"}, {"_type": "playlist", "entries": OnDemandPagedList(inner, inner.size)}, None, {"_type": "url", "id": "last"}]
+    stream = stream_of(entries)
+    assert take(stream, 2) == ["first", "0-0"]
+    assert inner.fetched == [0]
+    assert [entry["id"] for _, entry in stream] == ["0-1", "1-0", "1-1", "2-0", "2-1", "last"]
+    assert inner.fetched == [0, 1, 2, 3] # A full last page takes one more request to see the end
+
+
+def test_generators_are_not_drained_up_front():
+    produced = []
+
+    def entries():
+        for i in range(5):
+            produced.append(i)
+            yield {"_type": "url", "id": str(i)}
+
+    stream = stream_of(entries())
+    assert take(stream, 2) == ["0", "1"]
+    assert produced == [0, 1]
+
+
+def test_each_entry_is_handed_out_once_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    pages = Pages(20)
+    stream = stream_of(OnDemandPagedList(pages, pages.size))
+
+    def drain(_):
+        return [entry["id"] for _, entry in stream]
+
+    with ThreadPoolExecutor(4) as pool: ids = [i for chunk in pool.map(drain, range(4)) for i in chunk]
+    assert sorted(ids) == sorted(f"{page}-{i}" for page in range(20) for i in range(3))
+
+
+@pytest.fixture
+def stub():
+    register_stub_extractor()
+    catalog = StubCatalog()
+    catalog.add_video("v1", size=64 * 1024)
+    server = LocalServer(catalog.files(), content_types=catalog.content_types).start()
+    yield server
+    server.stop()
+
+
+def test_single_video_in_playlist_mode_is_downloaded(tmp_path, stub):
+    engine = DownloadEngine(extra_opts={"quiet": True, "no_warnings": True, "noprogress": True, "fixup": "never"})
+    job = DownloadJob(stub.url("/stub/video/v1"), str(tmp_path), "Playlist")
+    engine.download(job)
+    assert os.listdir(tmp_path) == ["Stub video v1.mp4"]
+    assert job.status_text == "Download Process Complete: Stub video v1"
@@ -0,0 +1,86 @@
+import os
+import threading
+
+import pytest
+
+import postprocess_pool
+from postprocess_pool import PostProcessPool, PostProcessCancelled, convert_audio, KEPT, COPIED, TRANSCODED
+
+TIMEOUT = 5
+
+
+def test_submit_blocks_while_max_pending_are_queued():
+    pool = PostProcessPool(workers=1, max_pending=2)
+    release = threading.Event()
+    futures = [pool.submit(release.wait, TIMEOUT) for _ in range(2)]
+    submitted = threading.Event()
+
+    def submit_third():
+        futures.append(pool.submit(lambda: "third"))
+        submitted.set()
+
+    threading.Thread(target=submit_third, daemon=True).start()
+    assert not submitted.wait(0.3) # Held back: one running, one waiting
+    release.set()
+    assert submitted.wait(TIMEOUT)
+    assert futures[2].result(TIMEOUT) == "third"
+    pool.shutdown()
+
+
+def test_cancel_while_waiting_for_a_slot():
+    pool = PostProcessPool(workers=1, max_pending=1)
+    release, cancel = threading.Event(), threading.Event()
+    running = pool.submit(release.wait, TIMEOUT)
+    threading.Timer(0.2, cancel.set).start()
+    with pytest.raises(PostProcessCancelled):
+        pool.submit(lambda: None, cancel_event=cancel)
+    release.set()
+    assert running.result(TIMEOUT)
+    pool.submit(lambda: None).result(TIMEOUT) # The slot came back
+    pool.shutdown()
+
+
+def test_failed_conversion_frees_its_slot():
+    pool = PostProcessPool(workers=1, max_pending=1)
+    failing = pool.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError): failing.result(TIMEOUT)
+    assert pool.submit(lambda: "next").result(TIMEOUT) == "next"
+    pool.shutdown()
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    """Stands in for the ffmpeg binary: `codec` is what probing reports, `runs` the argument lists run."""
+    fake = type("FakeFFmpeg", (), {"codec": None, "runs": []})()
+
+    def run(args, cancel_event=None):
+        fake.runs.append(args)
+        with open(args[-1], "wb") as f: f.write(b"converted")
+
+    monkeypatch.setattr(postprocess_pool, "probe_audio_codec", lambda ffmpeg_path, path: fake.codec)
+    monkeypatch.setattr(postprocess_pool, "_run_ffmpeg", run)
+    return fake
+
+
+@pytest.mark.parametrize("codec, source, target, result, action, codec_args", [
+    ("aac", "a.m4a", "M4A", "a.m4a", KEPT, None),
+    ("mp3", "a.mp3", "MP3", "a.mp3", KEPT, None),
+    ("aac", "a.mp4", "M4A", "a.m4a", COPIED, ["-codec:a", "copy"]),
+    ("opus", "a.webm", "Opus", "a.opus", COPIED, ["-codec:a", "copy"]),
+    ("opus", "a.webm", "Original", "a.opus", COPIED, ["-codec:a", "copy"]),
+    ("opus", "a.webm", "MP3", "a.mp3", TRANSCODED, ["-codec:a", "libmp3lame"]),
+    ("aac", "a.m4a", "Opus", "a.opus", TRANSCODED, ["-codec:a", "libopus"]),
+    (None, "a.bin", "Original", "a.bin", KEPT, None),
+])
+def test_reencodes_only_when_the_codec_differs(tmp_path, ffmpeg, codec, source, target, result, action, codec_args):
+    ffmpeg.codec = codec
+    (tmp_path / source).write_bytes(b"downloaded")
+    path, done = convert_audio("ffmpeg", str(tmp_path / source), target)
+    assert (path, done) == (str(tmp_path / result), action)
+    if codec_args is None:
+        assert ffmpeg.runs == []
+        assert (tmp_path / source).read_bytes() == b"downloaded"
+    else:
+        [args] = ffmpeg.runs
+        assert args[args.index("-codec:a"):args.index("-codec:a") + 2] == codec_args
+        assert os.listdir(tmp_path) == [result] # The source and the .part file are gone
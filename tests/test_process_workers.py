@@ -0,0 +1,96 @@
+import multiprocessing
+import threading
+import time
+import types
+
+import pytest
+
+import process_workers
+from download_queue import DownloadJob
+from downloader_core import DownloadEngine
+from process_workers import ProcessWorkers
+
+
+class FakeProcess:
+    def __init__(self):
+        self.alive, self.terminated, self.exitcode = True, False, None
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.alive, self.terminated = False, True
+
+    def join(self, timeout=None):
+        pass
+
+
+def fake_worker(respond=None):
+    """A worker whose process is `respond(job_id, conn, cancel_event)` in a thread; without it, a worker that never answers."""
+    conn, child_conn = multiprocessing.Pipe()
+    worker = types.SimpleNamespace(conn=conn, cancel_event=threading.Event(), process=FakeProcess(), stop=lambda: None)
+    if respond is not None:
+        def run():
+            _, _, spec = child_conn.recv()
+            respond(spec["id"], child_conn, worker.cancel_event)
+        threading.Thread(target=run, daemon=True).start()
+    worker.child_conn = child_conn # Kept open, so the pipe does not look closed
+    return worker
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    monkeypatch.setattr(process_workers, "CANCEL_GRACE", 0.5)
+    pool = ProcessWorkers(DownloadEngine())
+    pool.worker = None
+    monkeypatch.setattr(pool, "_checkout", lambda: pool.worker)
+    return pool
+
+
+def stop_later(job, pause=False, delay=0.2):
+    threading.Timer(delay, job.pause if pause else job.cancel).start()
+
+
+def test_stuck_worker_is_terminated_after_the_grace_period(workers):
+    workers.worker = fake_worker()
+    job = DownloadJob("https://example.com/v", "/out")
+    stop_later(job)
+    started = time.monotonic()
+    workers.download(job)
+    assert time.monotonic() - started < 0.2 + process_workers.CANCEL_GRACE + 2 * process_workers.POLL_INTERVAL + 0.5
+    assert workers.worker.cancel_event.is_set()
+    assert workers.worker.process.terminated
+    assert job.status_text == "Download Cancelled by User."
+
+
+def test_stuck_worker_is_terminated_on_pause(workers):
+    workers.worker = fake_worker()
+    job = DownloadJob("https://example.com/v", "/out")
+    stop_later(job, pause=True)
+    workers.download(job)
+    assert workers.worker.process.terminated
+    assert job.status_text == "Download Paused."
+
+
+def test_worker_that_stops_in_time_is_kept(workers):
+    def respond(job_id, conn, cancel_event):
+        conn.send(("update", job_id, 40.0, "Downloading...", "Video", 1000))
+        cancel_event.wait(5)
+        conn.send(("result", job_id, "cancelled", None, {
+            "title": "Video", "progress": 40.0, "status_text": "Download Cancelled by User.", "failures": [],
+            "postprocessed": [], "metrics": None, "rates": []}))
+    workers.worker = fake_worker(respond)
+    job = DownloadJob("https://example.com/v", "/out")
+    stop_later(job)
+    workers.download(job)
+    assert not workers.worker.process.terminated
+    assert workers._idle == [workers.worker]
+    assert (job.title, job.progress, job.status_text) == ("Video", 40.0, "Download Cancelled by User.")
+
+
+def test_worker_exiting_without_a_cancel_fails_the_job(workers):
+    workers.worker = fake_worker()
+    workers.worker.process.alive = False
+    workers.worker.process.exitcode = -9
+    with pytest.raises(Exception, match="exited unexpectedly"):
+        workers.download(DownloadJob("https://example.com/v", "/out"))
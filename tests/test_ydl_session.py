@@ -0,0 +1,58 @@
+import pytest
+
+import ydl_session
+from downloader_core import load_yt_dlp
+from ydl_session import SessionPool
+
+
+@pytest.fixture
+def tested(monkeypatch):
+    # Checks the installed release as if it were in TESTED_VERSIONS; these tests decide whether it may be added
+    version = load_yt_dlp().version.__version__
+    monkeypatch.setattr(ydl_session, "TESTED_VERSIONS", ydl_session.TESTED_VERSIONS | {".".join(version.split(".")[:3])})
+
+
+def opts(outtmpl, **extra):
+    return {"outtmpl": outtmpl, "format": "best", "quiet": True, "progress_hooks": [lambda d: None], **extra}
+
+
+def test_sessions_are_reused_with_the_job_options(tested):
+    pool = SessionPool()
+    hook = lambda d: None
+    with pool.session(opts("/a/%(id)s.%(ext)s")) as first: pass
+    with pool.session(opts("/b/%(title)s.%(ext)s", progress_hooks=[hook])) as second:
+        assert second is first
+        assert second.params["outtmpl"]["default"] == "/b/%(title)s.%(ext)s"
+        assert second._progress_hooks == [hook]
+    assert (pool.created, pool.reused, pool.disabled) == (1, 1, False)
+    pool.close()
+
+
+def test_session_options_are_not_shared(tested):
+    pool = SessionPool()
+    with pool.session(opts("/a/%(id)s.%(ext)s")) as first: pass
+    with pool.session(opts("/a/%(id)s.%(ext)s", proxy="http://127.0.0.1:1")) as second:
+        assert second is not first
+    assert (pool.created, pool.reused) == (2, 0)
+    pool.close()
+
+
+def test_missing_internals_fall_back_to_fresh_instances(tested, monkeypatch):
+    monkeypatch.setattr(ydl_session, "INTERNALS", ydl_session.INTERNALS + ("_renamed_in_a_later_release",))
+    pool = SessionPool()
+    with pool.session(opts("/a/%(id)s.%(ext)s")) as first: pass
+    with pool.session(opts("/a/%(id)s.%(ext)s")) as second: assert second is not first
+    assert (pool.created, pool.reused, pool.disabled) == (0, 0, True)
+
+
+def test_untested_versions_fall_back_to_fresh_instances(monkeypatch):
+    monkeypatch.setattr(ydl_session, "TESTED_VERSIONS", frozenset())
+    pool = SessionPool()
+    with pool.session(opts("/a/%(id)s.%(ext)s")) as ydl: assert ydl.params["outtmpl"]["default"] == "/a/%(id)s.%(ext)s"
+    assert (pool.created, pool.disabled) == (0, True)
+
+
+def test_nightly_builds_count_as_their_release(monkeypatch):
+    monkeypatch.setattr(ydl_session, "TESTED_VERSIONS", frozenset(("2026.08.19",)))
+    assert ydl_session.tested_version("2026.08.19.232758")
+    assert not ydl_session.tested_version("2026.09.01")
@@ -0,0 +1,181 @@
+"""Long-lived YoutubeDL instances, reused across jobs.
+
+    sessions = SessionPool()
+    with sessions.session(ydl_opts) as ydl:
+        ydl.download([url])
+
+Building a YoutubeDL costs more than downloading a short video: it sets up
+all extractors (about 100 ms of CPU), and dropping it throws away the HTTP
+keep-alive connections, the cookie jar and what the extractors have cached
+(player code, API tokens). The pool keeps each YoutubeDL after use and hands
+it to the next job whose options only differ in per-job settings (JOB_KEYS:
+output template, format, hooks, post-processors...). Those are applied to
+the instance in place. Every other option, such as proxy, certificates or
+headers, is part of the session key, so jobs never share a session built
+for other connection settings.
+
+One job uses a session at a time; concurrent jobs get separate sessions. A
+session is retired after MAX_USES jobs or MAX_AGE seconds, so extractor
+caches cannot grow without bound.
+
+Applying the job options means rewriting YoutubeDL internals (INTERNALS).
+Their presence does not prove they still mean what apply() assumes, so
+sessions are only reused on the yt-dlp releases in TESTED_VERSIONS, and a
+new session is still checked for all of them first. On any other release
+the pool stops reusing and every job gets a fresh YoutubeDL, as if there
+were no pool.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from downloader_core import load_yt_dlp
+
+# Options applied per job; the rest decide which sessions a job may use
+JOB_KEYS = frozenset((
+    "outtmpl", "format", "progress_hooks", "post_hooks", "postprocessor_hooks", "postprocessors", "keepvideo",
+    "concurrent_fragment_downloads", "http_chunk_size", "ratelimit", "playlist_items", "extract_flat", "match_filter",
+))
+HOOK_KEYS = ("progress_hooks", "post_hooks", "postprocessor_hooks", "postprocessors")
+# What YoutubeDL.__init__ sets per instance and apply() / release() reset; checked before a session is reused
+INTERNALS = ("_parse_outtmpl", "format_selector", "_pps", "_progress_hooks", "_post_hooks", "_postprocessor_hooks",
+             "_download_retcode", "_num_downloads", "_num_videos", "_playlist_level", "_playlist_urls")
+
+# yt-dlp releases apply() and release() were checked against; add one once tests/test_ydl_session.py passes with it
+TESTED_VERSIONS = frozenset(("2026.08.19",))
+
+MAX_IDLE = 8 # Idle sessions kept per set of session options
+MAX_USES = 200
+MAX_AGE = 3600
+
+
+def tested_version(version):
+    """True if sessions may be reused with this yt-dlp version; nightly builds count as their release."""
+    return ".".join(version.split(".")[:3]) in TESTED_VERSIONS
+
+
+class _Session:
+    def __init__(self, key, opts):
+        yt_dlp = load_yt_dlp()
+        self.key = key
+        self.ydl = yt_dlp.YoutubeDL({k: v for k, v in opts.items() if k not in JOB_KEYS})
+        self.base_params = dict(self.ydl.params) # As normalized by YoutubeDL.__init__
+        self.created = time.monotonic()
+        self.uses = 0
+        self._selectors = {} # Format string -> selector; selectors are bound to this YoutubeDL
+
+    def apply(self, opts):
+        """Sets the per-job options, like YoutubeDL.__init__ does for a fresh instance."""
+        from yt_dlp.postprocessor import get_postprocessor
+        from yt_dlp.utils import POSTPROCESS_WHEN
+        ydl = self.ydl
+        ydl.params.clear() # Clear in place: downloaders and extractors hold the same dict
+        ydl.params.update(self.base_params)
+        ydl.params.update({k: v for k, v in opts.items() if k in JOB_KEYS and k not in HOOK_KEYS})
+        ydl._parse_outtmpl()
+        fmt = ydl.params.get("format")
+        if fmt in (None, "-") or callable(fmt):
+            ydl.format_selector = fmt
+        else:
+            if fmt not in self._selectors: self._selectors[fmt] = ydl.build_format_selector(fmt)
+            ydl.format_selector = self._selectors[fmt]
+        ydl._progress_hooks, ydl._post_hooks, ydl._postprocessor_hooks = [], [], []
+        ydl._pps = {when: [] for when in POSTPROCESS_WHEN}
+        for ph in opts.get("progress_hooks", []): ydl.add_progress_hook(ph)
+        for ph in opts.get("post_hooks", []): ydl.add_post_hook(ph)
+        for ph in opts.get("postprocessor_hooks", []): ydl.add_postprocessor_hook(ph)
+        for pp_def in opts.get("postprocessors", []):
+            pp_def = dict(pp_def)
+            when = pp_def.pop("when", "post_process")
+            ydl.add_post_processor(get_postprocessor(pp_def.pop("key"))(ydl, **pp_def), when=when)
+        ydl._download_retcode = ydl._num_downloads = ydl._num_videos = ydl._playlist_level = 0
+        ydl._playlist_urls = set()
+        self.uses += 1
+
+    def release(self):
+        # Jobs may wrap methods on the instance (metrics.ItemTimer does); the next job starts clean,
+        # and an idle session keeps no references to the last job's hooks
+        ydl = self.ydl
+        for name in [name for name in vars(ydl) if callable(getattr(type(ydl), name, None))]:
+            delattr(ydl, name)
+        ydl._progress_hooks, ydl._post_hooks, ydl._postprocessor_hooks = [], [], []
+        ydl._pps = {when: [] for when in ydl._pps}
+
+    @property
+    def reusable(self):
+        """True if this is a tested yt-dlp release with every internal apply() resets, in the shape it expects."""
+        from yt_dlp.utils import POSTPROCESS_WHEN
+        ydl = self.ydl
+        return (tested_version(load_yt_dlp().version.__version__)
+                and all(hasattr(ydl, name) for name in INTERNALS) and callable(ydl._parse_outtmpl)
+                and isinstance(ydl._pps, dict) and set(ydl._pps) == set(POSTPROCESS_WHEN)
+                and all(isinstance(getattr(ydl, name), list) for name in ("_progress_hooks", "_post_hooks", "_postprocessor_hooks"))
+                and isinstance(ydl._playlist_urls, set))
+
+    @property
+    def expired(self):
+        return self.uses >= MAX_USES or time.monotonic() - self.created > MAX_AGE
+
+    def close(self):
+        try: self.ydl.close()
+        except Exception as e: print(f"Warning: closing a yt-dlp session failed: {e}")
+
+
+class SessionPool:
+    """Warm YoutubeDL sessions, shared by all jobs of an engine. Thread-safe."""
+
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self.created = 0 # Counters, handy for benchmarks and debugging
+        self.reused = 0
+        self.disabled = False # Set when this yt-dlp's internals do not match what _Session rewrites
+        self._idle = {} # session key -> [_Session]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def session_key(opts):
+        return json.dumps({k: v for k, v in opts.items() if k not in JOB_KEYS}, sort_keys=True, default=repr)
+
+    @contextmanager
+    def session(self, opts):
+        """A YoutubeDL set up with `opts`, for the duration of the with block."""
+        if self.disabled:
+            with load_yt_dlp().YoutubeDL(opts) as ydl: yield ydl
+            return
+        key = self.session_key(opts)
+        with self._lock:
+            idle = self._idle.get(key)
+            session = idle.pop() if idle else None
+            if session is not None: self.reused += 1
+        if session is None:
+            session = _Session(key, opts)
+            if not session.reusable:
+                print(f"Warning: sessions were not tested with yt-dlp {load_yt_dlp().version.__version__}, or it changed internals they rely on;"
+                      " not reusing YoutubeDL instances.")
+                self.disabled = True
+                session.close()
+                with load_yt_dlp().YoutubeDL(opts) as ydl: yield ydl
+                return
+            with self._lock: self.created += 1
+        try:
+            session.apply(opts)
+            yield session.ydl
+        finally:
+            session.release()
+            self._put_back(session)
+
+    def _put_back(self, session):
+        with self._lock:
+            idle = self._idle.setdefault(session.key, [])
+            if not session.expired and len(idle) < self.max_idle:
+                idle.append(session)
+                return
+        session.close()
+
+    def close(self):
+        """Closes all idle sessions (saving cookies, closing connections)."""
+        with self._lock:
+            sessions = [session for idle in self._idle.values() for session in idle]
+            self._idle.clear()
+        for session in sessions: session.close()